@@ -5,21 +5,38 @@ from __future__ import print_function
 
 import argparse
 import sys
-import os
-import code
-import readline
 
-from jinja2 import Environment, PackageLoader
-
-from pypp.parser import AstParser
-from pypp.generator import Generator
-from pypp.option import GeneratorType
-from pypp.option import GeneratorOption
-from pypp.utils import name2snake
 
 def main(argv):
+    # the daemon client doesn't import the generator at all
+    if argv and argv[0] == "serve":
+        from pypp import daemon
+        return daemon.serve(argv[1:])
+    elif argv and argv[0] == "client":
+        from pypp import daemon
+        return daemon.client(argv[1:])
+    return run(argv)
+
+
+def create_argument_parser():
+    from pypp import driver
+    from pypp import fragment
+
     parser = argparse.ArgumentParser()
-    parser.add_argument("input")
+    parser.add_argument("input", nargs="*", help="header files or glob patterns")
+    parser.add_argument("--input-list", default=None, help="file listing one input per line")
+    parser.add_argument("--output-dir", default=None, help="batch mode: write one <name>.cpp per input")
+    parser.add_argument("--jobs", "-j", default=1, type=driver.positive_int, help="batch mode: number of worker processes")
+    parser.add_argument("--shards", default=1, type=driver.positive_int, help="split the generated code into N files which can be compiled in parallel")
+    parser.add_argument("--build-fragment", choices=fragment.FORMATS, default=None,
+                        help="also write a build fragment of the generated files (<output>.cmake or <output>.ninja)")
+    parser.add_argument("--build-jobs", default=1, type=driver.positive_int, help="number of worker processes rendering the classes, functions and enums")
+    parser.add_argument("--output", "-o", default=None, help="write into the file instead of stdout")
+    parser.add_argument("--depfile", action="store_true", help="write a make-style <output>.d dependency file")
+    parser.add_argument("--skip-unchanged", action="store_true", help="don't regenerate when the inputs and flags are unchanged")
+    parser.add_argument("--umbrella", action="store_true", help="batch mode: parse every input in one translation unit (without --jobs)")
+    parser.add_argument("--dump-ir", default=None, help="also write the extracted declarations into the file")
+    parser.add_argument("--from-ir", default=None, help="generate from a file written by --dump-ir instead of parsing")
     parser.add_argument("--headers", nargs="+", default=[])
     parser.add_argument("--name", default=None)
     parser.add_argument("--strip-path", default=None)
@@ -31,76 +48,128 @@ def main(argv):
     parser.add_argument("--enable-protected", default=False, action="store_true")
     parser.add_argument("--after-shell", default=False, action="store_true")
     parser.add_argument("--verbose", action="store_true")
+    parser.add_argument("--profile", action="store_true", help="report the time and the peak memory of each phase, and counters")
+    parser.add_argument("--profile-format", choices=["text", "json"], default="text")
+    parser.add_argument("--profile-output", default=None, help="write the --profile report into the file instead of stderr")
+    parser.add_argument("--cprofile", default=None, help="write the cProfile statistics of the run into the file")
     parser.add_argument("--silence-errors", action="store_true", default=False)
     parser.add_argument("--generate-boost", action="store_true")
     parser.add_argument("--generate-embind", action="store_true")
-    parser.add_argument("--allow-all", action="store_true")
+    parser.add_argument("--generate", default=None, type=driver.parse_backends,
+                        help="comma separated backends (pybind11,boost,embind) rendered from one parse")
+    parser.add_argument("--allow-all", action="store_true", help="bind the declarations of every included file except system headers")
+    parser.add_argument("--allow-system-headers", action="store_true", help="with --allow-all, bind system headers too")
+    parser.add_argument("--allow-file", nargs="+", default=[], help="also bind the declarations of these files")
+    parser.add_argument("--allow-dir", nargs="+", default=[], help="also bind the declarations of files under these directories")
+    parser.add_argument("--deny-file", nargs="+", default=[], help="never bind the declarations of these files")
+    parser.add_argument("--deny-dir", nargs="+", default=[], help="never bind the declarations of files under these directories")
+    parser.add_argument("--allow-namespace", nargs="+", default=[], help="bind only these namespaces (e.g. ns::detail)")
+    parser.add_argument("--deny-namespace", nargs="+", default=[], help="never bind these namespaces")
+    parser.add_argument("--cache-dir", default=None, help="directory of the parsed translation unit cache")
+    parser.add_argument("--cache-size", default=512, type=int, help="cache size limit in MiB")
+    parser.add_argument("--config", default=None, help="binding rules (e.g. [release_gil]); see pypp.rules")
+    parser.add_argument("--template-dir", default=None, help="templates (pybind11.cpp, boost.cpp, embind.cpp) overriding the built-in ones")
+    parser.add_argument("--template-cache", default=None,
+                        help="directory of the compiled templates (default: <cache-dir>/templates or a temporary directory)")
+    parser.add_argument("--precompile-headers", action="store_true", help="build a precompiled header of --headers in --cache-dir")
+    parser.add_argument("--pch", default=None, help="use an existing precompiled header of --headers")
     # for linux
     parser.add_argument("--using-gcc-version", default="9")
 
-    args = parser.parse_args(argv)
+    return parser
 
-    env = Environment(
-        loader=PackageLoader("pypp", "templates"),
-    )
 
-    boost = args.generate_boost
-    embind = args.generate_embind
-    if boost and embind:
+def run(argv, session=None):
+    from pypp import batch
+    from pypp import driver
+    from pypp import ir
+
+    parser = create_argument_parser()
+    args = parser.parse_args(argv)
+
+    if args.generate_boost and args.generate_embind:
         print("can't enable both boost and embind", file=sys.stderr)
         return 1
-    if boost:
-        template = env.get_template("boost.cpp")
-    elif embind:
-        template = env.get_template("embind.cpp")
+    if args.generate and (args.generate_boost or args.generate_embind):
+        parser.error("--generate can't be used with --generate-boost/--generate-embind")
+
+    if args.output_dir and (args.dump_ir or args.from_ir):
+        parser.error("--dump-ir and --from-ir don't support --output-dir")
+    if args.output_dir and (args.profile or args.cprofile):
+        parser.error("--profile and --cprofile don't support --output-dir")
+    if args.umbrella and args.jobs > 1:
+        parser.error("--umbrella parses every input in one process and doesn't support --jobs")
+    if args.precompile_headers and not args.cache_dir:
+        parser.error("--precompile-headers requires --cache-dir")
+
+    try:
+        driver.load_rules(args)
+    except ValueError as e:
+        print("can't load {}: {}".format(args.config, e), file=sys.stderr)
+        return 1
+
+    ast_parser = None
+    if args.from_ir:
+        if args.input or args.input_list:
+            parser.error("--from-ir doesn't take inputs")
+        try:
+            ast_parser = ir.load(args.from_ir)
+        except (OSError, ValueError) as e:
+            print("can't load {}: {}".format(args.from_ir, e), file=sys.stderr)
+            return 1
+        sources = [ast_parser.source]
     else:
-        template = env.get_template("pybind11.cpp")
-
-    include_path = args.include_path
-    if os.name == "posix":
-        include_path.append("/usr/lib/gcc/x86_64-linux-gnu/{}/include/".format(args.using_gcc_version))
-
-    ast_parser = AstParser(headers=args.headers, include_path=include_path, defines=args.defines, allow_all=args.allow_all)
-    node = ast_parser.parse(args.input)
-
-    if args.verbose or not args.silence_errors:
-        if args.verbose or ast_parser.errors:
-            print("/*")
-            ast_parser.dump_errors(sys.stderr)
-            print(" */")
-
-    generator = Generator(
-        enable_defvisitor=args.install_defvisitor,
-        enable_protected=args.enable_protected,
-    )
-
-    type = GeneratorType.Pybind11
-    if boost:
-        type = GeneratorType.Boost
-    elif embind:
-        type = GeneratorType.Embind
-    option = GeneratorOption(type=type)
-
-    generated = generator.generate(node, option)
-
-    if args.strip_path:
-        if args.input.startswith(args.strip_path):
-            args.input = args.input[len(args.strip_path):]
-    ctx = {
-        "input": args.input,
-        "init_name": name2snake(args.input) if args.name is None else args.name,
-        "class_forward_declarations": generator.class_forward_declarations,
-        "install_common_h": args.install_common_h,
-        "common_h": args.common_h,
-        "install_defvisitor": args.install_defvisitor,
-        "def_visitors": generator.def_visitors(),
-        "has_decls": generator.has_decl_code(),
-        "decl_code": generator.decl_code(option),
-        "generated": generated,
-    }
-    print(template.render(ctx))
+        sources = batch.collect_inputs(args.input, args.input_list)
+    if args.output_dir:
+        return batch.run(args, sources)
+    if len(sources) != 1:
+        parser.error("exactly one input is required without --output-dir")
+
+    if session is not None:
+        if ast_parser is None:
+            ast_parser = session.parser(args)
+
+    if not args.output:
+        if args.depfile or args.skip_unchanged:
+            parser.error("--depfile and --skip-unchanged require --output or --output-dir")
+        if len(driver.generator_types(args)) > 1:
+            parser.error("--generate with several backends requires --output or --output-dir")
+        if args.shards > 1:
+            parser.error("--shards requires --output or --output-dir")
+        if args.build_fragment:
+            parser.error("--build-fragment requires --output or --output-dir")
+
+    profile = driver.NULL_PROFILE
+    if args.profile:
+        from pypp.profiling import Profile
+        profile = Profile()
+        if not args.from_ir:
+            profile.count_libclang_calls()
+    profiler = None
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        if args.output:
+            driver.generate_file(args, sources[0], args.output, ast_parser=ast_parser, profile=profile)
+        else:
+            generator = driver.generate(args, sources[0], ast_parser=ast_parser, profile=profile)
+    finally:
+        if profiler is not None:
+            profiler.disable()
+            profiler.dump_stats(args.cprofile)
+        if args.profile:
+            profile.stop()
+            if args.profile_output:
+                with open(args.profile_output, "w") as fp:
+                    profile.dump(fp, args.profile_format)
+            else:
+                profile.dump(sys.stderr, args.profile_format)
 
     if args.after_shell:
+        import code
+        import readline
         code.interact(local=locals())
 
     return 0
@@ -1,25 +1,65 @@
-from ast import iter_fields
-
-from .parser import AstNode
+from .node import AstNode
 
 
 class NodeVisitor(object):
+    """
+    visitor over AstNode trees
+
+    `visit_<KIND>` handlers are resolved once per kind into a table of the class.
+    `visit` walks the tree with an explicit stack: a handler returns the
+    nodes to descend into (or None), and `leave_<KIND>` is called after them.
+    kinds named in `prune_kinds` are skipped with their children.
+    """
+
+    prune_kinds = frozenset()
+    # number of nodes skipped by prune_kinds
+    pruned = 0
+
+    @classmethod
+    def _handlers(cls, kind):
+        # per class; subclasses don't share the parent's table
+        table = cls.__dict__.get("_handler_table")
+        if table is None:
+            table = {}
+            setattr(cls, "_handler_table", table)
+        if kind not in table:
+            name = kind.name
+            if name in cls.prune_kinds:
+                table[kind] = (None, None)
+            else:
+                table[kind] = (
+                    getattr(cls, "visit_" + name, cls.generic_visit),
+                    getattr(cls, "leave_" + name, None),
+                )
+        return table[kind]
+
+    def dispatch(self, node):
+        """call the handler of `node` and return its result"""
+        visitor, _ = self._handlers(node.ptr.kind)
+        if visitor is None:
+            return None
+        return visitor(self, node)
+
     def visit(self, node):
-        """Visit a node."""
-        if not isinstance(node, AstNode):
-            return super(NodeVisitor, self).visit(node)
-        method = 'visit_' + node.ptr.kind.name
-        #print("// [debug]:", method)
-        visitor = getattr(self, method, self.generic_visit)
-        return visitor(node)
+        """Visit a node and the children returned by the handlers."""
+        assert isinstance(node, AstNode)
+        stack = [(node, False)]
+        while stack:
+            node, leaving = stack.pop()
+            visitor, leave = self._handlers(node.ptr.kind)
+            if leaving:
+                leave(self, node)
+                continue
+            if visitor is None:
+                self.pruned += 1
+                continue
+            children = visitor(self, node)
+            if leave is not None:
+                stack.append((node, True))
+            if children is not None:
+                stack.extend((x, False) for x in reversed(list(children)))
 
     def generic_visit(self, node):
         """Called if no explicit visitor function exists for a node."""
-        for field, value in iter_fields(node):
-            if isinstance(value, list):
-                for item in value:
-                    if isinstance(item, AstNode):
-                        self.visit(item)
-            elif isinstance(value, AstNode):
-                self.visit(value)
+        return None
 #class NodeVisitor
@@ -0,0 +1,149 @@
+from __future__ import print_function
+
+import glob
+import io
+import os
+import sys
+import time
+import traceback
+
+from . import driver
+
+
+GLOB_CHARS = "*?["
+
+
+def collect_inputs(inputs, input_list=None):
+    """expand glob patterns and list files, keeping the given order without duplicates"""
+    result = []
+    patterns = list(inputs)
+    if input_list:
+        with open(input_list) as fp:
+            for line in fp:
+                line = line.strip()
+                if line and not line.startswith("#"):
+                    patterns.append(line)
+    for pattern in patterns:
+        if any(x in pattern for x in GLOB_CHARS):
+            matches = sorted(glob.glob(pattern, recursive=True))
+        else:
+            matches = [pattern]
+        for path in matches:
+            if path not in result:
+                result.append(path)
+    return result
+
+
+def output_path(args, source):
+    return os.path.join(args.output_dir, driver.init_name(args, source) + ".cpp")
+
+
+class BatchResult(object):
+    def __init__(self, source, output, elapsed, error=None, messages="", skipped=False):
+        self.source = source
+        self.output = output
+        self.elapsed = elapsed
+        self.error = error
+        self.messages = messages
+        self.skipped = skipped
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+# per worker process state
+_worker = {}
+
+
+def _init_worker(args):
+    _worker["args"] = args
+    _worker["parser"] = None
+    _worker["env"] = driver.environment(args)
+
+
+def _parser():
+    # created on demand; skipped files don't need libclang
+    if _worker["parser"] is None:
+        _worker["parser"] = driver.create_parser(_worker["args"])
+    return _worker["parser"]
+
+
+def _generate_file(source, node=None):
+    args = _worker["args"]
+    output = output_path(args, source)
+    err = io.StringIO()
+    start = time.perf_counter()
+    try:
+        if args.skip_unchanged and driver.is_up_to_date(args, source, output):
+            return BatchResult(source, output, time.perf_counter() - start, skipped=True)
+        ast_parser = _parser()
+        driver.generate_file(args, source, output, ast_parser=ast_parser, env=_worker["env"], err=err, node=node)
+        fatal = driver.fatal_errors(ast_parser)
+        if fatal:
+            error = "".join("{}\n".format(x) for x in fatal)
+            return BatchResult(source, output, time.perf_counter() - start, error=error, messages=err.getvalue())
+    except Exception:
+        return BatchResult(source, output, time.perf_counter() - start, error=traceback.format_exc(), messages=err.getvalue())
+    return BatchResult(source, output, time.perf_counter() - start, messages=err.getvalue())
+
+
+def _run_umbrella(args, sources, err):
+    # one translation unit for every source, generated in this process
+    _init_worker(args)
+    if args.skip_unchanged:
+        if all(driver.is_up_to_date(args, x, output_path(args, x)) for x in sources):
+            return [BatchResult(x, output_path(args, x), 0.0, skipped=True) for x in sources]
+    start = time.perf_counter()
+    ast_parser = _parser()
+    roots = ast_parser.parse_umbrella(sources)
+    print("{:>8.3f}s umbrella parse of {} files".format(time.perf_counter() - start, len(sources)), file=err)
+    results = []
+    for root in roots:
+        # a fatal error only fails the sources which include its file
+        ast_parser.errors = root.errors
+        results.append(_generate_file(root.source, node=root))
+    return results
+
+
+def run(args, sources, err=None):
+    """generate one output file per source into args.output_dir"""
+    if err is None:
+        # resolved per call; the daemon redirects sys.stderr to the client
+        err = sys.stderr
+    os.makedirs(args.output_dir, exist_ok=True)
+    outputs = {}
+    for source in sources:
+        for _, output in driver.output_paths(args, output_path(args, source)):
+            if output in outputs:
+                print("{} and {} are generated into the same file {}".format(outputs[output], source, output), file=err)
+                return 1
+            outputs[output] = source
+
+    start = time.perf_counter()
+    if args.umbrella:
+        results = _run_umbrella(args, sources, err)
+    elif args.jobs <= 1:
+        _init_worker(args)
+        results = [_generate_file(x) for x in sources]
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(max_workers=args.jobs, initializer=_init_worker, initargs=(args,)) as executor:
+            # map() keeps the input order
+            results = list(executor.map(_generate_file, sources))
+    total = time.perf_counter() - start
+
+    failed = 0
+    for result in results:
+        status = "ok" if result.ok else "FAILED"
+        if result.skipped:
+            status = "skip"
+        generated = ", ".join(x for _, x in driver.output_paths(args, result.output))
+        print("{:>8.3f}s {:6} {} -> {}".format(result.elapsed, status, result.source, generated), file=err)
+        if result.messages:
+            err.write(result.messages)
+        if not result.ok:
+            failed += 1
+            err.write(result.error)
+    print("{} files, {} failed, {:.3f}s (jobs={})".format(len(results), failed, total, args.jobs), file=err)
+    return 1 if failed else 0
@@ -0,0 +1,11 @@
+"""
+benchmarks of pypp on synthetic headers
+
+    $ python -m pypp.benchmark
+    $ python -m pypp.benchmark --classes 1000 --save-baseline baseline.json -- --using-gcc-version 12
+    $ python -m pypp.benchmark --classes 1000 --baseline baseline.json --threshold 0.2 -- --using-gcc-version 12
+
+the arguments after the benchmark options are passed to pypp.
+without --baseline, the results are compared with baseline.json of this package,
+which was measured with the default options; other options skip the comparison.
+"""
@@ -0,0 +1,101 @@
+#! /usr/bin/env python
+# -*- coding: utf-8 -*-
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+
+from pypp import driver
+from pypp.__main__ import create_argument_parser
+from pypp.benchmark import suite
+from pypp.benchmark import synthetic
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(prog="python -m pypp.benchmark")
+    parser.add_argument("--header", default=None, help="benchmark this header instead of a synthetic one")
+    parser.add_argument("--classes", default=100, type=int)
+    parser.add_argument("--methods", default=10, type=int, help="methods per class")
+    parser.add_argument("--overloads", default=0.2, type=float, help="fraction of the methods which are overloaded")
+    parser.add_argument("--default-args", default=0.3, type=float, help="fraction of the methods with a default argument")
+    parser.add_argument("--virtuals", default=0.1, type=float, help="fraction of the methods which are virtual")
+    parser.add_argument("--enums", default=10, type=int)
+    parser.add_argument("--namespaces", default=2, type=int, help="depth of the nested namespaces")
+    parser.add_argument("--template-includes", action="store_true", help="include and use template-heavy headers")
+    parser.add_argument("--backends", default=list(driver.BACKENDS), type=driver.parse_backends,
+                        help="comma separated backends to render")
+    parser.add_argument("--repeat", default=3, type=int, help="the best time of the repetitions is reported")
+    parser.add_argument("--json", default=None, help="also write the results into the file")
+    parser.add_argument("--baseline", default=None,
+                        help="fail if a phase regressed from the results in the file (default: the packaged baseline,"
+                             " compared only when it was measured with the same options)")
+    parser.add_argument("--no-baseline", action="store_true", help="don't compare with a baseline")
+    parser.add_argument("--threshold", default=0.2, type=float, help="allowed regression from --baseline (a fraction)")
+    parser.add_argument("--save-baseline", default=None, help="write the results as a baseline into the file")
+    parser.add_argument("--keep-header", default=None, help="also copy the synthetic header into the file")
+    args, pypp_argv = parser.parse_known_args(argv)
+    if pypp_argv and pypp_argv[0] == "--":
+        pypp_argv = pypp_argv[1:]
+
+    shape = synthetic.HeaderShape(
+        classes=args.classes,
+        methods=args.methods,
+        overloads=args.overloads,
+        default_args=args.default_args,
+        virtuals=args.virtuals,
+        enums=args.enums,
+        namespaces=args.namespaces,
+        template_includes=args.template_includes,
+    ).to_dict()
+    directory = None
+    header = args.header
+    if header is None:
+        directory = tempfile.mkdtemp(prefix="pypp-benchmark-")
+        header = synthetic.write(os.path.join(directory, "synthetic.hpp"), synthetic.HeaderShape(**shape))
+        if args.keep_header:
+            shutil.copyfile(header, args.keep_header)
+    else:
+        shape = {"header": header}
+    try:
+        pypp_args = create_argument_parser().parse_args([header] + pypp_argv)
+        phases = suite.measure(pypp_args, header, args.backends, repeat=args.repeat)
+    finally:
+        if directory is not None:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    shape["backends"] = list(args.backends)
+    shape["arguments"] = pypp_argv
+    print(json.dumps(shape))
+    suite.dump_text(phases, sys.stdout)
+    if args.json:
+        suite.save(args.json, shape, phases)
+    if args.save_baseline:
+        suite.save(args.save_baseline, shape, phases)
+    if args.no_baseline:
+        return 0
+    if args.baseline:
+        baseline = suite.load(args.baseline)
+        if baseline["shape"] != shape:
+            print("warning: the baseline was measured with {}".format(json.dumps(baseline["shape"])), file=sys.stderr)
+    else:
+        baseline = suite.load(suite.DEFAULT_BASELINE)
+        if baseline["shape"] != shape:
+            # the times of another header tell nothing
+            print("the packaged baseline was measured with {}; not compared".format(json.dumps(baseline["shape"])),
+                  file=sys.stderr)
+            return 0
+    regressions = suite.compare(baseline["phases"], phases, args.threshold)
+    for message in regressions:
+        print("regression: " + message, file=sys.stderr)
+    if regressions:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,114 @@
+"""
+time the phases of pypp on one header
+
+parse and visit run once per repetition and render once per backend.
+the times are the best of the repetitions, which run without tracemalloc;
+the peak memory comes from one more traced run.
+the cold start is the time of a new `python -m pypp --help` process.
+"""
+
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+
+import pypp
+from .. import driver
+from ..profiling import Profile
+
+
+# the results of `python -m pypp.benchmark` with the default options
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# smaller regressions are noise
+NOISE_SECONDS = 0.005
+
+
+def cold_start(repeat=3):
+    env = dict(os.environ)
+    # the pypp being measured
+    root = os.path.dirname(os.path.dirname(os.path.abspath(pypp.__file__)))
+    env["PYTHONPATH"] = os.pathsep.join(filter(None, [root, env.get("PYTHONPATH")]))
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        with open(os.devnull, "w") as out:
+            subprocess.check_call([sys.executable, "-m", "pypp", "--help"], stdout=out, env=env)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_once(args, source, ast_parser, backends, memory):
+    """phase -> (seconds, peak bytes or None)"""
+    result = OrderedDict()
+    profile = Profile(memory=memory)
+    try:
+        generator = driver.visit(args, source, ast_parser=ast_parser, profile=profile)
+    finally:
+        profile.stop()
+    result["parse"] = profile.phases["parse"]
+    result["visit"] = profile.phases["visit"]
+    env = driver.environment(args)
+    for name in backends:
+        profile = Profile(memory=memory)
+        try:
+            with open(os.devnull, "w") as out:
+                driver.render(args, source, generator, driver.BACKENDS[name], ast_parser, env=env, out=out, profile=profile)
+        finally:
+            profile.stop()
+        result["render " + name] = profile.phases["render"]
+    return result
+
+
+def measure(args, source, backends, repeat=3):
+    """phase -> {"seconds", "peak_bytes"} of `source` parsed with the pypp options `args`"""
+    best = OrderedDict()
+    best["cold start"] = cold_start(repeat)
+    ast_parser = driver.create_parser(args)
+    for _ in range(repeat):
+        for name, (elapsed, _) in run_once(args, source, ast_parser, backends, memory=False).items():
+            best[name] = min(elapsed, best.get(name, elapsed))
+    peaks = run_once(args, source, ast_parser, backends, memory=True)
+    peaks["cold start"] = (best["cold start"], None)
+    return OrderedDict(
+        (name, OrderedDict([("seconds", elapsed), ("peak_bytes", peaks[name][1])])) for name, elapsed in best.items()
+    )
+
+
+def compare(baseline, current, threshold):
+    """messages for the phases of `current` which regressed by more than `threshold` (a fraction) from `baseline`"""
+    regressions = []
+    for name, old in baseline.items():
+        new = current.get(name)
+        if new is None:
+            continue
+        limit = old["seconds"] * (1 + threshold)
+        if new["seconds"] > limit and new["seconds"] - old["seconds"] > NOISE_SECONDS:
+            regressions.append("{}: {:.3f}s -> {:.3f}s".format(name, old["seconds"], new["seconds"]))
+        if old.get("peak_bytes") and new.get("peak_bytes"):
+            if new["peak_bytes"] > old["peak_bytes"] * (1 + threshold):
+                regressions.append("{} peak: {} -> {} bytes".format(name, old["peak_bytes"], new["peak_bytes"]))
+    return regressions
+
+
+def load(path):
+    with open(path) as fp:
+        return json.load(fp)
+
+
+def save(path, shape, phases):
+    with open(path, "w") as fp:
+        json.dump(OrderedDict([("shape", shape), ("phases", phases)]), fp, indent=2)
+        print(file=fp)
+
+
+def dump_text(phases, fileobj):
+    print("{:<24}{:>10}{:>12}".format("phase", "time", "peak"), file=fileobj)
+    for name, value in phases.items():
+        peak = "-" if value["peak_bytes"] is None else "{:.1f}MiB".format(value["peak_bytes"] / 1024.0 / 1024.0)
+        print("{:<24}{:>9.3f}s{:>12}".format(name, value["seconds"], peak), file=fileobj)
@@ -0,0 +1,109 @@
+"""
+synthetic headers of a given shape
+
+the declarations are spread deterministically, so the same parameters
+always produce the same header.
+"""
+
+from collections import OrderedDict
+
+
+# included with template_includes
+TEMPLATE_INCLUDES = [
+    "functional",
+    "map",
+    "memory",
+    "tuple",
+    "unordered_map",
+]
+
+
+class HeaderShape(object):
+    """
+    parameters of a synthetic header
+
+    the densities are fractions (0.0 - 1.0) of the methods
+    """
+
+    def __init__(self, classes=100, methods=10, overloads=0.2, default_args=0.3, virtuals=0.1,
+                 enums=10, namespaces=2, template_includes=False):
+        self.classes = classes
+        self.methods = methods
+        self.overloads = overloads
+        self.default_args = default_args
+        self.virtuals = virtuals
+        self.enums = enums
+        self.namespaces = namespaces
+        self.template_includes = template_includes
+
+    def to_dict(self):
+        return OrderedDict([
+            ("classes", self.classes),
+            ("methods", self.methods),
+            ("overloads", self.overloads),
+            ("default_args", self.default_args),
+            ("virtuals", self.virtuals),
+            ("enums", self.enums),
+            ("namespaces", self.namespaces),
+            ("template_includes", self.template_includes),
+        ])
+
+
+def spread(index, density):
+    """whether the `index`-th item is one of the `density` fraction"""
+    return int((index + 1) * density) > int(index * density)
+
+
+def method_lines(shape, index):
+    lines = []
+    name = "method{}".format(index)
+    prefix = "virtual " if spread(index, shape.virtuals) else ""
+    default = " = 1.0" if spread(index, shape.default_args) else ""
+    lines.append("{}int {}(int a, double b{});".format(prefix, name, default))
+    if spread(index, shape.overloads):
+        lines.append("{}std::vector<std::string> {}(const std::string & s, std::size_t n) const;".format(prefix, name))
+    if shape.template_includes and index % 4 == 0:
+        lines.append("std::map<std::string, std::vector<int>> table{}(const std::shared_ptr<int> & p);".format(index))
+    return lines
+
+
+def generate(shape):
+    """the source of a header with the given HeaderShape"""
+    lines = [
+        "#pragma once",
+        "#include <cstddef>",
+        "#include <string>",
+        "#include <vector>",
+    ]
+    if shape.template_includes:
+        lines += ["#include <{}>".format(x) for x in TEMPLATE_INCLUDES]
+    lines.append("")
+    for depth in range(shape.namespaces):
+        lines.append("namespace bench{} {{".format(depth))
+    for index in range(shape.enums):
+        if index % 2:
+            lines.append("enum class Enum{0} {{ A{0}, B{0}, C{0} }};".format(index))
+        else:
+            lines.append("enum Enum{0} {{ X{0}, Y{0}, Z{0} }};".format(index))
+    for index in range(shape.classes):
+        lines.append("")
+        lines.append("class Class{} {{".format(index))
+        lines.append("public:")
+        lines.append("    Class{}();".format(index))
+        for method in range(shape.methods):
+            lines += ["    " + x for x in method_lines(shape, method)]
+        if shape.virtuals:
+            lines.append("    virtual ~Class{}();".format(index))
+        lines.append("    int value;")
+        lines.append("};")
+        lines.append("int function{}(const Class{} & c, int n = 0);".format(index, index))
+    lines.append("")
+    for depth in reversed(range(shape.namespaces)):
+        lines.append("}} // namespace bench{}".format(depth))
+    return "\n".join(lines) + "\n"
+
+
+def write(path, shape):
+    with open(path, "w") as fp:
+        fp.write(generate(shape))
+    return path
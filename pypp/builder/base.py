@@ -1,5 +1,8 @@
 # -*- coding: utf-8 -*-
 
+from .. import utils
+
+
 class BuilderBase:
     def __init__(self, option):
         self.option = option
@@ -16,10 +19,17 @@ class FunctionBuilder(BuilderBase):
     def make(self, func):
         raise NotImplementedError
 
+    def wrappers(self, func):
+        """declarations which `make` refers to; e.g. GIL release wrappers"""
+        return utils.CodeBlock([])
+
 class MethodBuilder(BuilderBase):
     def make(self, method, class_name):
         raise NotImplementedError
 
+    def wrappers(self, method):
+        return utils.CodeBlock([])
+
 class ClassBuilder(BuilderBase):
     def make(self, clss):
         raise NotImplementedError
@@ -27,6 +37,15 @@ class ClassBuilder(BuilderBase):
     def init(self, node):
         raise NotImplementedError
 
+class ModuleBuilder(BuilderBase):
+    """declarations and registrations of the whole module"""
+
+    def decl_code(self, generator):
+        return utils.CodeBlock([])
+
+    def make(self, generator):
+        return utils.CodeBlock([])
+
 class EnumBuilder(BuilderBase):
     def make(self, enum):
         raise NotImplementedError
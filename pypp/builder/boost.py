@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import clang.cindex
+from .. import decl
 
 from . import base
 
@@ -27,14 +27,59 @@ class BoostPythonOptionBuilder(base.OptionBuilder):
             return ""
 
 
+def release_gil_name(func, suffix):
+    return "{}_release_gil{}".format(utils.name2snake(func.qualified_name), suffix)
+
+
+def released(func, suffix, opt):
+    """whether the `suffix`-th overload is bound through a GIL release wrapper"""
+    if not func.release_gil(suffix, opt):
+        return False
+    if func.overload_decls[suffix]:
+        # the overloads of the default arguments refer to the function itself
+        opt.rules.refuse(func.qualified_name, "the default arguments can't be wrapped in Boost.Python")
+        return False
+    if func.name.startswith("operator"):
+        opt.rules.refuse(func.qualified_name, "operators can't be wrapped in Boost.Python")
+        return False
+    return True
+
+
+def release_gil_wrapper(func, suffix, call, self_type=None):
+    """a function which calls `call` without the GIL"""
+    node = func.functions[suffix]
+    result_type = func.result_type(node)
+    arg_types = func.arg_types(node)
+    params = ["{} a{}".format(x, i) for i, x in enumerate(arg_types)]
+    if self_type is not None:
+        params.insert(0, "{} & self".format(self_type))
+    args = ["std::move(a{})".format(i) if x.endswith("&&") else "a{}".format(i) for i, x in enumerate(arg_types)]
+    return utils.CodeBlock([
+        "static {} {}({}) {{".format(result_type, release_gil_name(func, suffix), ", ".join(params)),
+        utils.CodeBlock([
+            "struct release_gil {",
+            utils.CodeBlock([
+                "PyThreadState * state = PyEval_SaveThread();",
+                "~release_gil() { PyEval_RestoreThread(state); }",
+            ]),
+            "} release;",
+            "{}{}({});".format("" if result_type == "void" else "return ", call, ", ".join(args)),
+        ]),
+        "}",
+    ])
+
+
 class BoostPythonFunctionBuilder(base.FunctionBuilder):
     def make(self, func):
         if len(func.functions) == 1:
             option = func.option(0, self.option)
+            target = func.cpp_name
+            if released(func, 0, self.option):
+                target = release_gil_name(func, 0)
             result = utils.CodeBlock([
                 'boost::python::def("{pyfunc}", &{func}{opt});'.format(
                     pyfunc=utils.check_reserved(func.name),
-                    func=func.cpp_name,
+                    func=target,
                     opt=option
                 ),
             ])
@@ -52,6 +97,12 @@ class BoostPythonFunctionBuilder(base.FunctionBuilder):
                     args=", ".join(func.arg_types(func_cur)),
                     opt=option,
                 )
+                if released(func, i, self.option):
+                    def_ = 'boost::python::def("{pyfunc}", &{func}{opt});'.format(
+                        pyfunc=utils.check_reserved(func.name),
+                        func=release_gil_name(func, i),
+                        opt=option,
+                    )
                 if func.has_function_pointer(func_cur):
                     # TODO: wrap callable object
                     def_ = "//{}".format(def_)
@@ -62,6 +113,13 @@ class BoostPythonFunctionBuilder(base.FunctionBuilder):
             return utils.CodeBlock.wrap_inline_comment(result)
         return result
 
+    def wrappers(self, func):
+        result = utils.CodeBlock([])
+        for i in range(len(func.functions)):
+            if released(func, i, self.option):
+                result += release_gil_wrapper(func, i, func.cpp_name)
+        return result
+
 
 class BoostPythonMethodBuilder(base.MethodBuilder):
     def make(self, method, class_name=None):
@@ -71,6 +129,8 @@ class BoostPythonMethodBuilder(base.MethodBuilder):
             func_cur = method.functions[0]
             option = method.option(0, self.option)
             decl = "&{cls}::{func}".format(cls=class_name, func=method.name)
+            if released(method, 0, self.option):
+                decl = "&" + release_gil_name(method, 0)
             pyname = method.pyname()
             # operator special case
             if utils.is_convertible_operator_name(method.name):
@@ -100,6 +160,8 @@ class BoostPythonMethodBuilder(base.MethodBuilder):
                     const=" const" if func_cur.is_const_method() else "",
                     scope=cast_scope,
                 )
+                if released(method, i, self.option):
+                    decl = "&" + release_gil_name(method, i)
                 pyname = method.pyname()
                 # operator special case
                 if utils.is_convertible_operator_name(method.name):
@@ -119,6 +181,19 @@ class BoostPythonMethodBuilder(base.MethodBuilder):
                 return utils.CodeBlock.wrap_inline_comment(result)
         return result
 
+    def wrappers(self, method):
+        result = utils.CodeBlock([])
+        class_name = method.functions[0].semantic_parent.type.spelling
+        for i, func_cur in enumerate(method.functions):
+            if not released(method, i, self.option):
+                continue
+            if func_cur.is_static_method():
+                result += release_gil_wrapper(method, i, "{}::{}".format(class_name, method.name))
+            else:
+                self_type = "const " + class_name if func_cur.is_const_method() else class_name
+                result += release_gil_wrapper(method, i, "self." + method.name, self_type=self_type)
+        return result
+
 
 class BoostPythonClassBuilder(base.ClassBuilder):
     def make(self, clss):
@@ -141,7 +216,7 @@ class BoostPythonClassBuilder(base.ClassBuilder):
         if clss.noncopyable or clss.copy_disabled or clss.has_pure_virtual_method():  # TODO: `using Class::Class;` case
             noncopy = ", boost::noncopyable"
         opt = bases + held + noncopy
-        constructors = list(filter(lambda x: x.access_specifier == clang.cindex.AccessSpecifier.PUBLIC, clss.constructors))
+        constructors = list(filter(lambda x: x.access_specifier == decl.AccessSpecifier.PUBLIC, clss.constructors))
         def is_not_copy(x):
             return Function.arg_types(x) != ["const {} &".format(clss.decl)]
         constructors = list(filter(is_not_copy, constructors))
@@ -260,7 +335,7 @@ class BoostPythonClassBuilder(base.ClassBuilder):
         if class_.constructors:
             body .append("using {0}::{1};".format(class_.decl, class_.name))
         for method in class_.virtual_methods:
-            if method.kind == clang.cindex.CursorKind.DESTRUCTOR:
+            if method.kind == decl.CursorKind.DESTRUCTOR:
                 # special case for pure virtual destructor
                 if method.is_pure_virtual_method():
                     body += utils.CodeBlock([
@@ -272,7 +347,7 @@ class BoostPythonClassBuilder(base.ClassBuilder):
             result_type = Function.result_type(method)
             name = method.spelling
             pyname = utils.check_reserved(name)
-            if method.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
+            if method.access_specifier == decl.AccessSpecifier.PROTECTED:
                 if not name.startswith("_"):
                     pyname = utils.check_reserved("_" + name)
             const_type = ""
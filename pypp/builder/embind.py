@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import clang.cindex
+from .. import decl
 
 from . import base
 
@@ -129,7 +129,7 @@ class EmbindClassBuilder(base.ClassBuilder):
         # TODO: held class option
         noncopy = ""
         opt = held + noncopy
-        constructors = list(filter(lambda x: x.access_specifier == clang.cindex.AccessSpecifier.PUBLIC, clss.constructors))
+        constructors = list(filter(lambda x: x.access_specifier == decl.AccessSpecifier.PUBLIC, clss.constructors))
         def is_not_copy(x):
             return Function.arg_types(x) != ["const {} &".format(clss.decl)]
         constructors = list(filter(is_not_copy, constructors))
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 
-import clang.cindex
+from .. import decl
 
 from . import base
 
@@ -23,10 +23,19 @@ class Pybind11OptionBuilder(base.OptionBuilder):
         return ""
 
 
+CALL_GUARD = ", pybind11::call_guard<pybind11::gil_scoped_release>()"
+
+
+def call_guard(func, suffix, opt):
+    if func.release_gil(suffix, opt):
+        return CALL_GUARD
+    return ""
+
+
 class Pybind11FunctionBuilder(base.FunctionBuilder):
     def make(self, func):
         if len(func.functions) == 1:
-            option = func.option(0, self.option)
+            option = func.option(0, self.option) + call_guard(func, 0, self.option)
             result = utils.CodeBlock([
                 'scope.def("{pyfunc}", &{func}{opt});'.format(
                     pyfunc=utils.check_reserved(func.name),
@@ -40,7 +49,7 @@ class Pybind11FunctionBuilder(base.FunctionBuilder):
         else:
             result = utils.CodeBlock([])
             for i, func_cur in enumerate(func.functions):
-                option = func.option(i, self.option)
+                option = func.option(i, self.option) + call_guard(func, i, self.option)
                 def_ = 'scope.def("{pyfunc}", static_cast<{rtype}(*)({args})>(&{func}){opt});'.format(
                     pyfunc=utils.check_reserved(func.name),
                     func=func.cpp_name,
@@ -56,8 +65,27 @@ class Pybind11FunctionBuilder(base.FunctionBuilder):
         if func.name in CPP_OPERATORS:
             # global operator overload is not supported
             return utils.CodeBlock.wrap_inline_comment(result)
+        for i, func_cur in enumerate(func.functions):
+            if self.option.rules.vectorize(func, func_cur):
+                result.append(self.vectorized(func, i))
         return result
 
+    def vectorized(self, func, suffix):
+        """an overload of the `suffix`-th overload which broadcasts NumPy arrays"""
+        func_cur = func.functions[suffix]
+        pointer = "&" + func.cpp_name
+        if len(func.functions) > 1:
+            pointer = "static_cast<{rtype}(*)({args})>({pointer})".format(
+                rtype=func.result_type(func_cur),
+                args=", ".join(func.arg_types(func_cur)),
+                pointer=pointer,
+            )
+        # without call_guard; the arrays are allocated inside the call
+        return 'scope.def("{pyfunc}", pybind11::vectorize({pointer}));'.format(
+            pyfunc=utils.check_reserved(func.name),
+            pointer=pointer,
+        )
+
 
 class Pybind11MethodBuilder(base.MethodBuilder):
     def make(self, method, class_name=None):
@@ -65,7 +93,7 @@ class Pybind11MethodBuilder(base.MethodBuilder):
             class_name = method.functions[0].semantic_parent.type.spelling
         if len(method.functions) == 1:
             func_cur = method.functions[0]
-            option = method.option(0, self.option)
+            option = method.option(0, self.option) + call_guard(method, 0, self.option)
             decl = "&{cls}::{func}".format(cls=class_name, func=method.name)
             pyname = method.pyname()
             # operator special case
@@ -85,7 +113,7 @@ class Pybind11MethodBuilder(base.MethodBuilder):
         else:
             result = utils.CodeBlock([])
             for i, func_cur in enumerate(method.functions):
-                option = method.option(i, self.option)
+                option = method.option(i, self.option) + call_guard(method, i, self.option)
                 cast_scope = ""
                 if not func_cur.is_static_method():
                     cast_scope = "{}::".format(class_name)
@@ -136,11 +164,14 @@ class Pybind11ClassBuilder(base.ClassBuilder):
             class_ += ", " + ", ".join([x.type.get_canonical().spelling for x in clss.bases])
             if len(clss.bases) > 1:
                 bases = ", pybind11::multiple_inheritance()"
+        layout = self.option.rules.buffer_layout(clss)
+        if layout is not None:
+            bases += ", pybind11::buffer_protocol()"
         held = ", std::shared_ptr<{}>".format(clss.decl)
         # TODO: held class option
         noncopy = ""
         opt = held + noncopy
-        constructors = list(filter(lambda x: x.access_specifier == clang.cindex.AccessSpecifier.PUBLIC, clss.constructors))
+        constructors = list(filter(lambda x: x.access_specifier == decl.AccessSpecifier.PUBLIC, clss.constructors))
         def is_not_copy(x):
             return Function.arg_types(x) != ["const {} &".format(clss.decl)]
         constructors = list(filter(is_not_copy, constructors))
@@ -166,6 +197,8 @@ class Pybind11ClassBuilder(base.ClassBuilder):
         # def_visitor
         if clss.enable_defvisitor:
             defs.append(".def({}())".format(clss.defvisitor_name))
+        if layout is not None:
+            defs += self.def_buffer(clss, layout)
         for item in clss.methods.values():
             defs += item.to_code_block(self.option)
         for prop, node in clss.properties.items():
@@ -184,6 +217,38 @@ class Pybind11ClassBuilder(base.ClassBuilder):
         code.append(defs)
         return code
 
+    def def_buffer(self, clss, layout):
+        """the buffer of a generator.BufferLayout; the buffer refers to the storage of the object"""
+        itemsize = "sizeof({})".format(layout.type)
+        data = "self.data()"
+        if layout.readonly:
+            data = "const_cast<{} *>(self.data())".format(layout.type)
+        shape = ["self.{}()".format(x) for x in layout.shape]
+        strides = [itemsize]
+        if len(layout.shape) == 2:
+            strides.insert(0, "{} * self.{}()".format(itemsize, layout.row_stride or layout.shape[1]))
+        def ssize_t(values):
+            return "{{{}}}".format(", ".join("static_cast<pybind11::ssize_t>({})".format(x) for x in values))
+        args = [
+            data,
+            itemsize,
+            "pybind11::format_descriptor<{}>::format()".format(layout.type),
+            str(len(layout.shape)),
+            ssize_t(shape),
+            ssize_t(strides),
+        ]
+        if layout.readonly:
+            args.append("true")
+        return utils.CodeBlock([
+            ".def_buffer([]({} & self) {{".format(clss.decl),
+            utils.CodeBlock([
+                "return pybind11::buffer_info(",
+                utils.CodeBlock([x + "," for x in args[:-1]] + [args[-1]]),
+                ");",
+            ]),
+            "})",
+        ])
+
     def init(self, node):
         args = list(node.get_arguments())
         if len(args) == 0:
@@ -204,7 +269,7 @@ class Pybind11ClassBuilder(base.ClassBuilder):
         if class_.constructors:
             body .append("using {0}::{1};".format(class_.decl, class_.name))
         for method in class_.virtual_methods:
-            if method.kind == clang.cindex.CursorKind.DESTRUCTOR:
+            if method.kind == decl.CursorKind.DESTRUCTOR:
                 # special case for pure virtual destructor
                 if method.is_pure_virtual_method():
                     body += utils.CodeBlock([
@@ -216,7 +281,7 @@ class Pybind11ClassBuilder(base.ClassBuilder):
             result_type = Function.result_type(method)
             name = method.spelling
             pyname = utils.check_reserved(name)
-            if method.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
+            if method.access_specifier == decl.AccessSpecifier.PROTECTED:
                 if not name.startswith("_"):
                     pyname = utils.check_reserved("_" + name)
             const_type = ""
@@ -294,3 +359,64 @@ class Pybind11EnumBuilder(base.EnumBuilder):
             utils.CodeBlock(values + ([";"] if enum.scoped_enum else [".export_values()", ";"])),
         ])
         return block
+
+
+class Pybind11ModuleBuilder(base.ModuleBuilder):
+    def __init__(self, option):
+        super(Pybind11ModuleBuilder, self).__init__(option)
+        # id(generator) -> opaque containers
+        self.containers = {}
+        # id(generator) -> whether a function is vectorized
+        self.vectorized = {}
+
+    def opaque_containers(self, generator):
+        """the containers of the generator which are bound by reference (see pypp.rules)"""
+        if not self.option.rules.opaque_containers_rule:
+            return []
+        if id(generator) not in self.containers:
+            self.containers[id(generator)] = self.option.rules.opaque_containers(generator.stl_containers())
+        return self.containers[id(generator)]
+
+    def has_vectorized(self, generator):
+        rules = self.option.rules
+        if not rules.vectorize_rule:
+            return False
+        if id(generator) not in self.vectorized:
+            self.vectorized[id(generator)] = any(
+                rules.vectorize(func, node) for func in generator.functions.values() for node in func.functions
+            )
+        return self.vectorized[id(generator)]
+
+    def decl_code(self, generator):
+        includes = []
+        if self.has_vectorized(generator):
+            includes.append("#include <pybind11/numpy.h>")
+        containers = self.opaque_containers(generator)
+        if containers:
+            includes.append("#include <pybind11/stl_bind.h>")
+        if not includes:
+            return utils.CodeBlock([])
+        result = utils.CodeBlock(includes)
+        if containers:
+            result += [""] + ["PYBIND11_MAKE_OPAQUE({})".format(x) for x in containers]
+        return result
+
+    def make(self, generator):
+        """
+        bind the opaque containers
+
+        the init functions of several headers can share a container in one module,
+        so the type is registered once and the later init functions only add its name
+        """
+        result = utils.CodeBlock([])
+        for container in self.opaque_containers(generator):
+            bind = "bind_vector" if container.startswith("std::vector<") else "bind_map"
+            name = utils.container_pyname(container)
+            result += [
+                "if (pybind11::detail::get_type_info(typeid({}))) {{".format(container),
+                utils.CodeBlock(['scope.attr("{}") = pybind11::type::of<{}>();'.format(name, container)]),
+                "} else {",
+                utils.CodeBlock(['pybind11::{}<{}>(scope, "{}");'.format(bind, container, name)]),
+                "}",
+            ]
+        return result
@@ -0,0 +1,139 @@
+import json
+import os
+
+from clang.cindex import TranslationUnit
+from clang.cindex import TranslationUnitLoadError
+from clang.cindex import TranslationUnitSaveError
+
+from .depend import digest, fingerprint, is_fresh
+
+
+CACHE_VERSION = 1
+CACHE_SIZE_DEFAULT = 512 * 1024 * 1024  # bytes
+
+AST_SUFFIX = ".ast"
+MANIFEST_SUFFIX = ".json"
+PRELUDE_SUFFIX = ".hpp"
+
+
+class TranslationUnitCache(object):
+    """
+    on-disk cache of parsed translation units
+
+    <directory>/<key>.ast  : libclang serialized AST (TranslationUnit.save)
+    <directory>/<key>.json : manifest of the files the unit depends on
+    <directory>/<key>.hpp  : source of a precompiled header (see AstParser.build_pch)
+
+    a cached unit is reused only while every dependency still has the same
+    mtime/size, or the same content hash when only the mtime was touched.
+    """
+
+    def __init__(self, directory, max_size=CACHE_SIZE_DEFAULT):
+        self.directory = directory
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, *parts):
+        return digest(CACHE_VERSION, *parts)
+
+    def ast_path(self, key):
+        return os.path.join(self.directory, key + AST_SUFFIX)
+
+    def manifest_path(self, key):
+        return os.path.join(self.directory, key + MANIFEST_SUFFIX)
+
+    def prelude_path(self, key):
+        return os.path.join(self.directory, key + PRELUDE_SUFFIX)
+
+    def lookup(self, key):
+        manifest = self._read_manifest(key)
+        return manifest is not None and self._is_fresh(manifest)
+
+    def dependencies(self, key):
+        """the files of the manifest of `key`"""
+        manifest = self._read_manifest(key)
+        return list(manifest["dependencies"]) if manifest is not None else []
+
+    def load(self, index, key):
+        if not self.lookup(key):
+            self.misses += 1
+            return None
+        path = self.ast_path(key)
+        try:
+            unit = TranslationUnit.from_ast_file(path, index)
+        except TranslationUnitLoadError:
+            self.invalidate(key)
+            self.misses += 1
+            return None
+        # LRU order for eviction
+        os.utime(path)
+        self.hits += 1
+        return unit
+
+    def store(self, unit, key):
+        dependencies = fingerprint([x.include.name for x in unit.get_includes()])
+        tmp = self.ast_path(key) + ".tmp{}".format(os.getpid())
+        try:
+            unit.save(tmp)
+        except TranslationUnitSaveError:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            return False
+        os.replace(tmp, self.ast_path(key))
+        manifest = {
+            "version": CACHE_VERSION,
+            "dependencies": dependencies,
+        }
+        tmp = self.manifest_path(key) + ".tmp{}".format(os.getpid())
+        with open(tmp, "w") as fp:
+            json.dump(manifest, fp)
+        os.replace(tmp, self.manifest_path(key))
+        self.evict()
+        return True
+
+    def invalidate(self, key):
+        for path in [self.ast_path(key), self.manifest_path(key), self.prelude_path(key)]:
+            if os.path.exists(path):
+                os.remove(path)
+
+    def evict(self):
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if not name.endswith(AST_SUFFIX):
+                continue
+            key = name[:-len(AST_SUFFIX)]
+            try:
+                size = os.path.getsize(self.ast_path(key))
+                for path in [self.manifest_path(key), self.prelude_path(key)]:
+                    if os.path.exists(path):
+                        size += os.path.getsize(path)
+                mtime = os.path.getmtime(self.ast_path(key))
+            except OSError:
+                # removed by another process
+                continue
+            entries.append((mtime, key, size))
+            total += size
+        # oldest first
+        for mtime, key, size in sorted(entries):
+            if total <= self.max_size:
+                break
+            self.invalidate(key)
+            total -= size
+
+    def _read_manifest(self, key):
+        if not os.path.exists(self.ast_path(key)):
+            return None
+        try:
+            with open(self.manifest_path(key)) as fp:
+                manifest = json.load(fp)
+        except (OSError, ValueError):
+            return None
+        if manifest.get("version") != CACHE_VERSION:
+            return None
+        return manifest
+
+    def _is_fresh(self, manifest):
+        return is_fresh(manifest["dependencies"])
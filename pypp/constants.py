@@ -1,4 +1,4 @@
-import clang.cindex
+from . import decl
 
 
 CPP_OPERATORS = [
@@ -86,9 +86,9 @@ OTHER_OPERATOR_MAP = {
 
 
 NOT_DEFAULT_ARG_KINDS = [
-    clang.cindex.CursorKind.TYPE_REF,
-    clang.cindex.CursorKind.TEMPLATE_REF,
-    clang.cindex.CursorKind.NAMESPACE_REF,
+    decl.CursorKind.TYPE_REF,
+    decl.CursorKind.TEMPLATE_REF,
+    decl.CursorKind.NAMESPACE_REF,
 ]
 
 PYTHON_RESERVED = [
@@ -124,3 +124,27 @@ PYTHON_RESERVED = [
     "lambda",
     "try",
 ]
+
+# canonical spellings (see utils.canonical_type)
+INTEGRAL_TYPES = [
+    "bool",
+    "char",
+    "signed char",
+    "unsigned char",
+    "short",
+    "unsigned short",
+    "int",
+    "unsigned int",
+    "long",
+    "unsigned long",
+    "long long",
+    "unsigned long long",
+    "std::size_t",
+]
+ARITHMETIC_TYPES = INTEGRAL_TYPES + [
+    "float",
+    "double",
+    "long double",
+]
+# elements of NumPy arrays; char is ambiguous (bytes or int8)
+NUMPY_SCALAR_TYPES = [x for x in ARITHMETIC_TYPES if x != "char"]
@@ -0,0 +1,215 @@
+from __future__ import print_function
+
+import argparse
+import contextlib
+import json
+import os
+import signal
+import socket
+import socketserver
+import stat
+import sys
+import tempfile
+import traceback
+from collections import OrderedDict
+
+
+# the AstParsers kept for the most recently used flag sets
+MAX_PARSERS = 8
+
+
+def default_socket_path():
+    """in $XDG_RUNTIME_DIR, else in a per-user directory which only the user can access"""
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    if runtime_dir:
+        return os.path.join(runtime_dir, "pypp.sock")
+    directory = os.path.join(tempfile.gettempdir(), "pypp-{}".format(os.getuid()))
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    info = os.lstat(directory)
+    if not stat.S_ISDIR(info.st_mode) or info.st_uid != os.getuid() or stat.S_IMODE(info.st_mode) & 0o077:
+        raise OSError("{} is not a private directory of the current user".format(directory))
+    return os.path.join(directory, "pypp.sock")
+
+
+def is_owned(path):
+    """whether `path` belongs to the current user; the daemon runs the requests as its own user"""
+    return os.stat(path).st_uid == os.getuid()
+
+
+class Session(object):
+    """
+    state kept warm between requests
+
+    * one clang.cindex.Index per flag set (inside AstParser),
+      whose translation units are refreshed with reparse
+    * the Jinja environments, which keep the compiled templates (see driver.environment)
+    """
+
+    def __init__(self):
+        from . import driver
+        self.driver = driver
+        # LRU of the flag sets
+        self.parsers = OrderedDict()
+
+    def parser(self, args):
+        key = (
+            # the paths of the arguments are relative to the client's directory
+            os.getcwd(),
+            tuple(args.headers),
+            tuple(args.include_path),
+            tuple(args.defines),
+            args.allow_all,
+            args.allow_system_headers,
+            tuple(args.allow_file),
+            tuple(args.allow_dir),
+            tuple(args.deny_file),
+            tuple(args.deny_dir),
+            tuple(args.allow_namespace),
+            tuple(args.deny_namespace),
+            args.using_gcc_version,
+            args.pch,
+            args.precompile_headers,
+        )
+        if key in self.parsers:
+            self.parsers.move_to_end(key)
+            return self.parsers[key]
+        ast_parser = self.driver.create_parser(args)
+        ast_parser.keep_units = True
+        self.parsers[key] = ast_parser
+        while len(self.parsers) > MAX_PARSERS:
+            self.parsers.popitem(last=False)
+        return ast_parser
+
+    def reset(self):
+        """forget the warnings of the previous request"""
+        self.driver.reset_rules()
+
+
+class StreamWriter(object):
+    """file-like object which forwards writes to the client"""
+
+    def __init__(self, wfile, fd):
+        self.wfile = wfile
+        self.fd = fd
+
+    def write(self, data):
+        if data:
+            send(self.wfile, {"fd": self.fd, "data": data})
+        return len(data)
+
+    def flush(self):
+        self.wfile.flush()
+
+
+def send(wfile, message):
+    wfile.write((json.dumps(message) + "\n").encode("utf-8"))
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # closed without a request; e.g. is_listening
+            return
+        request = json.loads(line.decode("utf-8"))
+        stdout = StreamWriter(self.wfile, 1)
+        stderr = StreamWriter(self.wfile, 2)
+        cwd = os.getcwd()
+        code = 1
+        self.server.session.reset()
+        try:
+            os.chdir(request["cwd"])
+            with contextlib.redirect_stdout(stdout), contextlib.redirect_stderr(stderr):
+                code = self.server.run(request["argv"], session=self.server.session)
+        except SystemExit as e:
+            # argparse
+            code = e.code if isinstance(e.code, int) else 1
+        except Exception:
+            stderr.write(traceback.format_exc())
+        finally:
+            os.chdir(cwd)
+        send(self.wfile, {"exit": code})
+
+
+class Server(socketserver.UnixStreamServer):
+    # requests are handled one by one; libclang and os.chdir are not shared safely between threads
+
+    def __init__(self, path, run):
+        self.session = Session()
+        self.run = run
+        super().__init__(path, RequestHandler)
+
+
+def is_listening(path):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(path)
+    except OSError:
+        return False
+    finally:
+        sock.close()
+    return True
+
+
+def serve(argv):
+    parser = argparse.ArgumentParser(prog="pypp serve")
+    parser.add_argument("--socket")
+    args = parser.parse_args(argv)
+    if args.socket is None:
+        args.socket = default_socket_path()
+
+    from .__main__ import run
+
+    if os.path.exists(args.socket):
+        if is_listening(args.socket):
+            print("pypp: a daemon is already listening on {}".format(args.socket), file=sys.stderr)
+            return 1
+        # left by a daemon which didn't exit cleanly
+        os.remove(args.socket)
+    server = Server(args.socket, run)
+    os.chmod(args.socket, 0o600)
+    print("pypp: listening on {}".format(args.socket), file=sys.stderr)
+    # e.g. kill or a service manager; removes the socket like ^C
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if os.path.exists(args.socket):
+            os.remove(args.socket)
+    return 0
+
+
+def client(argv):
+    """forward the arguments of main() to the daemon and stream the result back"""
+    parser = argparse.ArgumentParser(prog="pypp client", allow_abbrev=False)
+    parser.add_argument("--socket")
+    # the other arguments are main()'s, with or without a leading --
+    args, rest = parser.parse_known_args(argv)
+    if rest and rest[0] == "--":
+        rest = rest[1:]
+
+    if args.socket is None:
+        args.socket = default_socket_path()
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        if not is_owned(args.socket):
+            raise OSError("not owned by the current user")
+        sock.connect(args.socket)
+    except OSError as e:
+        sock.close()
+        print("pypp: can't connect to the daemon {}: {}".format(args.socket, e), file=sys.stderr)
+        return 1
+    with sock, sock.makefile("rwb") as fp:
+        send(fp, {"argv": rest, "cwd": os.getcwd()})
+        fp.flush()
+        outputs = {1: sys.stdout, 2: sys.stderr}
+        for line in fp:
+            message = json.loads(line.decode("utf-8"))
+            if "exit" in message:
+                return message["exit"]
+            outputs[message["fd"]].write(message["data"])
+    print("pypp: connection closed by the daemon", file=sys.stderr)
+    return 1
@@ -0,0 +1,280 @@
+"""
+compact pure-Python snapshot of the declarations in a translation unit
+
+`Decl` and `DeclType` provide the subset of the clang.cindex.Cursor/Type
+interface which the generator and the builders use, so a snapshot can be
+consumed in place of live cursors. The types of an extracted snapshot are
+read from the translation unit on first use (see parser.LazyType); those
+of a loaded IR file are not.
+"""
+
+from __future__ import print_function
+
+import enum
+
+
+class ClangEnum(enum.Enum):
+    """
+    enumeration of a subset of a clang.cindex enumeration
+
+    a member also equals the clang.cindex value of the same enumeration and name,
+    so the comparisons of the generator and the builders accept live cursors too
+    """
+
+    def __eq__(self, other):
+        if type(other) is type(self):
+            return self is other
+        try:
+            # a clang.cindex value compared before
+            return _clang_members[other] is self
+        except (KeyError, TypeError):
+            pass
+        if type(other).__name__ == type(self).__name__ and type(other).__module__ == "clang.cindex":
+            return clang_member(type(self), other) is self
+        return NotImplemented
+
+    __hash__ = enum.Enum.__hash__
+
+
+# clang.cindex value -> the ClangEnum member of the same name, or None
+_clang_members = {}
+
+
+def clang_member(enum_type, value):
+    """the member of `enum_type` which equals the clang.cindex `value`, or None"""
+    try:
+        return _clang_members[value]
+    except KeyError:
+        pass
+    result = _clang_members[value] = enum_type.__members__.get(value.name)
+    return result
+
+
+# kinds which the generator distinguishes; any other kind is OTHER
+CursorKind = ClangEnum("CursorKind", [
+    "TRANSLATION_UNIT",
+    "NAMESPACE",
+    "UNEXPOSED_DECL",
+    "CLASS_DECL",
+    "STRUCT_DECL",
+    "UNION_DECL",
+    "CLASS_TEMPLATE",
+    "ENUM_DECL",
+    "ENUM_CONSTANT_DECL",
+    "FUNCTION_DECL",
+    "FUNCTION_TEMPLATE",
+    "CXX_METHOD",
+    "CONSTRUCTOR",
+    "DESTRUCTOR",
+    "CONVERSION_FUNCTION",
+    "FIELD_DECL",
+    "VAR_DECL",
+    "PARM_DECL",
+    "TYPEDEF_DECL",
+    "TYPE_ALIAS_DECL",
+    "CXX_BASE_SPECIFIER",
+    "CXX_ACCESS_SPEC_DECL",
+    "FRIEND_DECL",
+    "USING_DECLARATION",
+    "UNEXPOSED_ATTR",
+    "ANNOTATE_ATTR",
+    "TYPE_REF",
+    "TEMPLATE_REF",
+    "NAMESPACE_REF",
+    "OTHER",
+])
+
+AccessSpecifier = ClangEnum("AccessSpecifier", [
+    "INVALID",
+    "PUBLIC",
+    "PROTECTED",
+    "PRIVATE",
+    "NONE",
+])
+
+TypeKind = ClangEnum("TypeKind", [
+    "INVALID",
+    "VOID",
+    "BOOL",
+    "CHAR_U",
+    "UCHAR",
+    "CHAR16",
+    "CHAR32",
+    "USHORT",
+    "UINT",
+    "ULONG",
+    "ULONGLONG",
+    "CHAR_S",
+    "SCHAR",
+    "WCHAR",
+    "SHORT",
+    "INT",
+    "LONG",
+    "LONGLONG",
+    "FLOAT",
+    "DOUBLE",
+    "LONGDOUBLE",
+    "NULLPTR",
+    "POINTER",
+    "LVALUEREFERENCE",
+    "RVALUEREFERENCE",
+    "RECORD",
+    "ENUM",
+    "TYPEDEF",
+    "ELABORATED",
+    "FUNCTIONPROTO",
+    "CONSTANTARRAY",
+    "OTHER",
+])
+
+
+def convert_kind(enum_type, name):
+    return enum_type.__members__.get(name, enum_type.OTHER)
+
+
+CLANG_ERROR_SEVERITY = [
+    "Ignored",
+    "Note",
+    "Warning",
+    "Error",
+    "Fatal",
+]
+
+
+# Decl.flags
+STATIC_METHOD = 1 << 0
+CONST_METHOD = 1 << 1
+VIRTUAL_METHOD = 1 << 2
+PURE_VIRTUAL_METHOD = 1 << 3
+SCOPED_ENUM = 1 << 4
+# PARM_DECL; the children of a parameter are not kept
+DEFAULT_ARGUMENT = 1 << 5
+
+
+class File(object):
+    __slots__ = ("name",)
+
+    def __init__(self, name):
+        self.name = name
+
+    def __repr__(self):
+        return self.name
+
+
+class Location(object):
+    __slots__ = ("file", "line", "column")
+
+    def __init__(self, file, line, column):
+        self.file = file
+        self.line = line
+        self.column = column
+
+    def __repr__(self):
+        return "<SourceLocation file {!r}, line {!r}, column {!r}>".format(
+            self.file.name if self.file else None, self.line, self.column)
+
+
+class Diagnostic(object):
+    __slots__ = ("severity", "spelling", "location", "text")
+
+    def __init__(self, severity, spelling, location, text):
+        self.severity = severity
+        self.spelling = spelling
+        self.location = location
+        self.text = text
+
+    def __str__(self):
+        return self.text
+
+
+class DeclType(object):
+    __slots__ = ("spelling", "kind", "const", "canonical")
+
+    def __init__(self, spelling, kind, const=False, canonical=None):
+        self.spelling = spelling
+        self.kind = kind
+        self.const = const
+        # None means this type itself is canonical
+        self.canonical = canonical
+
+    def get_canonical(self):
+        if self.canonical is None:
+            return self
+        return self.canonical
+
+    def is_const_qualified(self):
+        return self.const
+
+    def __repr__(self):
+        return "<DeclType {!r}>".format(self.spelling)
+
+
+class Decl(object):
+    __slots__ = (
+        "kind",
+        "spelling",
+        "hash",
+        "access_specifier",
+        "type",
+        "result_type",
+        "arguments",
+        "children",
+        "semantic_parent",
+        "lexical_parent",
+        "location",
+        "flags",
+        # derived data cached by the generator (see generator.Signature)
+        "signature",
+    )
+
+    def __init__(self, kind, spelling, hash=0, access_specifier=AccessSpecifier.INVALID,
+                 type=None, result_type=None, location=None, flags=0):
+        self.kind = kind
+        self.spelling = spelling
+        self.hash = hash
+        self.access_specifier = access_specifier
+        self.type = type
+        self.result_type = result_type
+        self.arguments = []
+        self.children = []
+        self.semantic_parent = None
+        self.lexical_parent = None
+        self.location = location
+        self.flags = flags
+        self.signature = None
+
+    def get_children(self):
+        return self.children
+
+    def get_arguments(self):
+        return self.arguments
+
+    def is_static_method(self):
+        return bool(self.flags & STATIC_METHOD)
+
+    def is_const_method(self):
+        return bool(self.flags & CONST_METHOD)
+
+    def is_virtual_method(self):
+        return bool(self.flags & VIRTUAL_METHOD)
+
+    def is_pure_virtual_method(self):
+        return bool(self.flags & PURE_VIRTUAL_METHOD)
+
+    def is_scoped_enum(self):
+        return bool(self.flags & SCOPED_ENUM)
+
+    def __repr__(self):
+        return "<Decl {} {!r}>".format(self.kind.name, self.spelling)
+
+
+def dump_errors(errors, fileobj):
+    if not errors:
+        print("no errors", file=fileobj)
+        return
+    for error in errors:
+        print("{}: {!r}@{!r}".format(
+            CLANG_ERROR_SEVERITY[error.severity],
+            error.spelling,
+            error.location,
+        ), file=fileobj)
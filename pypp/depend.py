@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+
+
+MANIFEST_VERSION = 1
+MANIFEST_SUFFIX = ".pypp.json"
+DEPFILE_SUFFIX = ".d"
+
+# options which don't change the generated code
+NON_OUTPUT_OPTIONS = [
+    "input",
+    "input_list",
+    "output",
+    "output_dir",
+    "jobs",
+    "build_jobs",
+    "umbrella",
+    "cache_dir",
+    "cache_size",
+    "template_cache",
+    "pch",
+    "precompile_headers",
+    "depfile",
+    "skip_unchanged",
+    "after_shell",
+    "dump_ir",
+    "profile",
+    "profile_format",
+    "profile_output",
+    "cprofile",
+]
+
+
+def digest(*parts):
+    data = json.dumps(list(parts), sort_keys=True)
+    return hashlib.sha1(data.encode("utf-8")).hexdigest()
+
+
+def file_digest(path):
+    h = hashlib.sha1()
+    with open(path, "rb") as fp:
+        for chunk in iter(lambda: fp.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def file_stamp(path):
+    st = os.stat(path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def fingerprint(paths):
+    result = {}
+    for path in paths:
+        if path in result or not os.path.isfile(path):
+            # e.g. <entrypoint>.cpp (unsaved file)
+            continue
+        result[path] = file_stamp(path) + [file_digest(path)]
+    return result
+
+
+def is_fresh(dependencies):
+    """check the fingerprint made by `fingerprint`"""
+    for path, (mtime, size, checksum) in dependencies.items():
+        try:
+            stamp = file_stamp(path)
+        except OSError:
+            return False
+        if stamp == [mtime, size]:
+            continue
+        # touched but maybe not modified
+        if stamp[1] != size or file_digest(path) != checksum:
+            return False
+    return True
+
+
+# see tool_versions
+_tool_versions = None
+
+
+def tool_versions():
+    """the pypp version and the stamp of libclang; upgrading either changes the generated code"""
+    global _tool_versions
+    if _tool_versions is None:
+        from . import __version__
+        libclang = None
+        try:
+            from .parser import libclang_path
+        except ImportError:
+            # e.g. --from-ir without the clang bindings
+            pass
+        else:
+            # the file behind a versionless link (e.g. libclang.so.1)
+            path = os.path.realpath(libclang_path())
+            libclang = [path] + (file_stamp(path) if os.path.isfile(path) else [])
+        _tool_versions = [__version__, libclang]
+    return _tool_versions
+
+
+def flags_digest(args, source):
+    options = {k: v for k, v in vars(args).items() if k not in NON_OUTPUT_OPTIONS}
+    return digest(MANIFEST_VERSION, source, options, tool_versions())
+
+
+def manifest_path(output):
+    return output + MANIFEST_SUFFIX
+
+
+def depfile_path(output):
+    return output + DEPFILE_SUFFIX
+
+
+def is_up_to_date(args, source, output):
+    """True if `output` was generated from the same flags and unchanged inputs"""
+    if not os.path.exists(output):
+        return False
+    try:
+        with open(manifest_path(output)) as fp:
+            manifest = json.load(fp)
+    except (OSError, ValueError):
+        return False
+    if manifest.get("version") != MANIFEST_VERSION:
+        return False
+    if manifest.get("flags") != flags_digest(args, source):
+        return False
+    return is_fresh(manifest["dependencies"])
+
+
+def write_manifest(args, source, output, dependencies):
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "flags": flags_digest(args, source),
+        "dependencies": fingerprint(dependencies),
+    }
+    with open(manifest_path(output), "w") as fp:
+        json.dump(manifest, fp, indent=1)
+
+
+def remove_manifest(output):
+    if os.path.exists(manifest_path(output)):
+        os.remove(manifest_path(output))
+
+
+def remove_depfile(output):
+    if os.path.exists(depfile_path(output)):
+        os.remove(depfile_path(output))
+
+
+def escape_make(path):
+    return path.replace("$", "$$").replace("#", "\\#").replace(" ", "\\ ")
+
+
+def write_depfile(path, target, dependencies):
+    """write a make-style dependency file"""
+    lines = ["{}:".format(escape_make(target))]
+    lines += [" {}".format(escape_make(x)) for x in dependencies]
+    with open(path, "w") as fp:
+        fp.write(" \\\n".join(lines) + "\n")
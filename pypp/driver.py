@@ -0,0 +1,464 @@
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+from collections import OrderedDict
+
+from . import depend
+from . import fragment
+from . import ir
+from . import rules
+from .profiling import NULL_PROFILE
+from .option import GeneratorType
+from . import utils
+from .utils import name2snake
+
+
+BACKENDS = OrderedDict([
+    ("pybind11", GeneratorType.Pybind11),
+    ("boost", GeneratorType.Boost),
+    ("embind", GeneratorType.Embind),
+])
+
+
+FATAL_SEVERITY = 4  # clang.cindex.Diagnostic.Fatal
+
+# AstParser.timings -> --profile phase
+PARSE_PHASES = {
+    "parse": "libclang",
+}
+
+
+def parse_backends(value):
+    """argparse type of --generate; e.g. "pybind11,embind" """
+    result = []
+    for name in value.split(","):
+        name = name.strip()
+        if name not in BACKENDS:
+            raise argparse.ArgumentTypeError("unknown backend {!r} (choose from {})".format(name, ", ".join(BACKENDS)))
+        if name not in result:
+            result.append(name)
+    return result
+
+
+def positive_int(value):
+    """argparse type of the counts (e.g. --jobs)"""
+    try:
+        number = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("invalid int value: {!r}".format(value))
+    if number < 1:
+        raise argparse.ArgumentTypeError("must be at least 1: {}".format(number))
+    return number
+
+
+def generator_types(args):
+    if args.generate:
+        return [BACKENDS[x] for x in args.generate]
+    if args.generate_boost:
+        return [GeneratorType.Boost]
+    elif args.generate_embind:
+        return [GeneratorType.Embind]
+    return [GeneratorType.Pybind11]
+
+
+def generator_type(args):
+    types = generator_types(args)
+    assert len(types) == 1, "{} backends need one output per backend".format(len(types))
+    return types[0]
+
+
+def backend_name(type):
+    for name, value in BACKENDS.items():
+        if value == type:
+            return name
+
+
+def output_paths(args, output):
+    """
+    [(type, path)] generated for `output`
+
+    `output` is used as is for a single backend,
+    otherwise the backend name is inserted; e.g. foo.cpp -> foo.boost.cpp
+    """
+    types = generator_types(args)
+    if len(types) == 1:
+        return [(types[0], output)]
+    root, ext = os.path.splitext(output)
+    return [(x, "{}.{}{}".format(root, backend_name(x), ext)) for x in types]
+
+
+def shard_paths(args, output):
+    """the files of --shards next to `output`; e.g. foo.cpp -> foo.shard0.cpp, ..."""
+    if args.shards <= 1:
+        return []
+    root, ext = os.path.splitext(output)
+    return ["{}.shard{}{}".format(root, i, ext) for i in range(args.shards)]
+
+
+def is_up_to_date(args, source, output):
+    for _, path in output_paths(args, output):
+        if not depend.is_up_to_date(args, source, path):
+            return False
+        # --depfile doesn't change the output (see depend.NON_OUTPUT_OPTIONS) but its file must exist
+        if args.depfile and not os.path.exists(depend.depfile_path(path)):
+            return False
+        if not all(os.path.exists(x) for x in shard_paths(args, path)):
+            return False
+        if args.build_fragment and not os.path.exists(fragment.fragment_path(path, args.build_fragment)):
+            return False
+    return True
+
+
+TEMPLATE_NAMES = {
+    GeneratorType.Pybind11: "pybind11.cpp",
+    GeneratorType.Boost: "boost.cpp",
+    GeneratorType.Embind: "embind.cpp",
+}
+
+# declaration and call of the init function of a shard
+SHARD_FUNCTIONS = {
+    GeneratorType.Pybind11: ("void init_{}(pybind11::module scope);", "init_{}(scope);"),
+    GeneratorType.Boost: ("void init_{}();", "init_{}();"),
+    GeneratorType.Embind: ("void init_{}();", "init_{}();"),
+}
+
+
+# (template_dir, bytecode cache directory) -> Environment; kept for the process (see batch and daemon)
+_environments = {}
+
+
+def create_environment(template_dir=None, cache_dir=None):
+    """
+    Jinja environment of the templates
+
+    the templates in `template_dir` override the built-in ones of the same name.
+    compiled templates are stored in a bytecode cache in `cache_dir` (or in a
+    per-user temporary directory); a template whose source changed is recompiled.
+    """
+    from jinja2 import ChoiceLoader, Environment, FileSystemBytecodeCache, FileSystemLoader, PackageLoader
+
+    loader = PackageLoader("pypp", "templates")
+    if template_dir:
+        loader = ChoiceLoader([FileSystemLoader(template_dir), loader])
+    class BytecodeCache(FileSystemBytecodeCache):
+        def dump_bytecode(self, bucket):
+            try:
+                super(BytecodeCache, self).dump_bytecode(bucket)
+            except OSError:
+                # e.g. an existing directory which can't be written; the template is still compiled
+                pass
+
+    try:
+        if cache_dir:
+            os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = BytecodeCache(cache_dir)
+        else:
+            bytecode_cache = BytecodeCache()
+    except (OSError, RuntimeError):
+        # compiled in memory only
+        bytecode_cache = None
+    return Environment(
+        loader=loader,
+        bytecode_cache=bytecode_cache,
+    )
+
+
+def template_cache_dir(args):
+    if args.template_cache:
+        return args.template_cache
+    if args.cache_dir:
+        return os.path.join(args.cache_dir, "templates")
+    return None
+
+
+def environment(args):
+    """the environment of `args`; created once per process"""
+    key = (args.template_dir, template_cache_dir(args))
+    if key not in _environments:
+        _environments[key] = create_environment(*key)
+    return _environments[key]
+
+
+# (config path, stamp) -> Rules; kept for the process (see batch and daemon)
+_rules = {}
+
+
+def load_rules(args):
+    """the Rules of --config (empty without it); raises ValueError for an invalid file"""
+    if not args.config:
+        return rules.Rules()
+    try:
+        key = (args.config, tuple(depend.file_stamp(args.config)))
+    except OSError as e:
+        raise ValueError(str(e))
+    if key not in _rules:
+        _rules[key] = rules.load(args.config)
+    return _rules[key]
+
+
+def reset_rules():
+    """reset the state of the loaded Rules between the requests of the daemon"""
+    for value in _rules.values():
+        value.reset()
+
+
+def generator_option(args, type):
+    from .option import GeneratorOption
+
+    return GeneratorOption(type=type, rules=load_rules(args))
+
+
+def create_parser(args):
+    # libclang is loaded here; --from-ir and skipped outputs don't need it
+    from .parser import AstParser
+    from .cache import TranslationUnitCache
+    from .scope import ScopeFilter
+
+    include_path = list(args.include_path)
+    if os.name == "posix":
+        include_path.append("/usr/lib/gcc/x86_64-linux-gnu/{}/include/".format(args.using_gcc_version))
+
+    cache = None
+    if args.cache_dir:
+        cache = TranslationUnitCache(args.cache_dir, max_size=args.cache_size * 1024 * 1024)
+
+    scope = ScopeFilter(
+        include_path=include_path,
+        allow_all=args.allow_all,
+        allow_files=args.allow_file,
+        deny_files=args.deny_file,
+        allow_dirs=args.allow_dir,
+        deny_dirs=args.deny_dir,
+        allow_namespaces=args.allow_namespace,
+        deny_namespaces=args.deny_namespace,
+        system_headers=args.allow_system_headers,
+    )
+
+    return AstParser(
+        headers=args.headers,
+        include_path=include_path,
+        defines=args.defines,
+        allow_all=args.allow_all,
+        cache=cache,
+        pch=args.pch,
+        precompile_headers=args.precompile_headers,
+        scope=scope,
+    )
+
+
+def strip_path(args, source):
+    if args.strip_path:
+        if source.startswith(args.strip_path):
+            return source[len(args.strip_path):]
+    return source
+
+
+def init_name(args, source):
+    if args.name is not None:
+        return args.name
+    return name2snake(strip_path(args, source))
+
+
+def visit(args, source, ast_parser=None, err=None, node=None, profile=NULL_PROFILE):
+    """
+    parse `source` and collect its declarations into a Generator
+
+    `node` is an already parsed root of `source` (e.g. AstParser.parse_umbrella)
+    """
+    if err is None:
+        err = sys.stderr
+    if ast_parser is None:
+        ast_parser = create_parser(args)
+
+    if node is None:
+        with profile.phase("parse"):
+            node = ast_parser.parse(source)
+        for phase, elapsed in ast_parser.timings.items():
+            profile.add_time("parse: " + PARSE_PHASES.get(phase, phase), elapsed)
+        for name, value in ast_parser.counters.items():
+            profile.count(name, value)
+
+    if args.dump_ir:
+        ir.dump(args.dump_ir, source, node.ptr, ast_parser.errors)
+
+    if args.verbose:
+        for phase, elapsed in ast_parser.timings.items():
+            print("{}: {:.3f}s".format(phase, elapsed), file=err)
+
+    from .generator import Generator
+
+    generator = Generator(
+        enable_defvisitor=args.install_defvisitor,
+        enable_protected=args.enable_protected,
+        build_jobs=args.build_jobs,
+    )
+    with profile.phase("visit"):
+        generator.visit(node)
+    profile.count_generator(generator)
+    return generator
+
+
+def render(args, source, generator, type, ast_parser, env=None, out=None, profile=NULL_PROFILE):
+    """write the binding code of one backend into `out`"""
+    with profile.phase("render"):
+        _render(args, source, generator, type, ast_parser, env, out, profile)
+
+
+def _render(args, source, generator, type, ast_parser, env, out, profile):
+    option = generator_option(args, type)
+    ctx = context(args, source, generator)
+    ctx["has_decls"] = generator.has_decl_code(opt=option)
+    with profile.timer("render: decl_code"):
+        ctx["decl_code"] = generator.decl_code(option)
+    # the lines are rendered while the template is written
+    ctx["generated"] = utils.CodeLines(profile.timed("render: build", generator.iter_build(option)))
+    build = profile.elapsed("render: build")
+    write_template(args, type, ast_parser, env, ctx, out, profile)
+    # without the builders
+    profile.add_time("render: template", build - profile.elapsed("render: build"))
+
+
+def render_shards(args, source, generator, type, ast_parser, output, env=None, profile=NULL_PROFILE):
+    """
+    write the binding code of one backend into the shard files of `output` (see shard_paths)
+
+    `output` gets the init function, which calls the init functions of the shards in order
+    """
+    with profile.phase("render"):
+        option = generator_option(args, type)
+        with profile.timer("render: build"):
+            shards = generator.shards(option, args.shards)
+        names = ["{}_shard{}".format(init_name(args, source), i) for i in range(len(shards))]
+        declaration, call = SHARD_FUNCTIONS[type]
+        ctx = context(args, source, generator)
+        ctx["has_decls"] = True
+        # e.g. opaque types; the same in every file of the module
+        decls = option.module.decl_code(generator)
+        if decls:
+            decls.append("")
+        decls += [declaration.format(x) for x in names]
+        ctx["decl_code"] = "\n".join(decls.to_code())
+        ctx["generated"] = utils.CodeLines((option.module.make(generator) + [call.format(x) for x in names]).to_code(indent=1))
+        with open(output, "w") as fp:
+            write_template(args, type, ast_parser, env, ctx, fp, profile)
+        for name, path, (entities, lines) in zip(names, shard_paths(args, output), shards):
+            ctx = context(args, source, generator)
+            ctx["init_name"] = name
+            ctx["has_decls"] = generator.has_decl_code(entities, opt=option)
+            with profile.timer("render: decl_code"):
+                ctx["decl_code"] = generator.decl_code(option, entities)
+            ctx["generated"] = utils.CodeLines(lines)
+            with open(path, "w") as fp:
+                # the diagnostics are written into `output` only
+                write_template(args, type, ast_parser, env, ctx, fp, profile, errors=False)
+
+
+def context(args, source, generator):
+    """the template variables shared by the backends"""
+    return {
+        "input": strip_path(args, source),
+        "init_name": init_name(args, source),
+        "class_forward_declarations": generator.class_forward_declarations,
+        "install_common_h": args.install_common_h,
+        "common_h": args.common_h,
+        "install_defvisitor": args.install_defvisitor,
+        "def_visitors": generator.def_visitors(),
+    }
+
+
+def write_template(args, type, ast_parser, env, ctx, out, profile, errors=True):
+    if out is None:
+        out = sys.stdout
+    if env is None:
+        env = environment(args)
+    with profile.timer("render: template"):
+        template = env.get_template(TEMPLATE_NAMES[type])
+
+    if errors and (args.verbose or not args.silence_errors):
+        if args.verbose or ast_parser.errors:
+            print("/*", file=out)
+            ast_parser.dump_errors(out)
+            print(" */", file=out)
+
+    with profile.timer("render: template"):
+        template.stream(ctx).dump(out)
+        print(file=out)
+
+
+def write_build_fragment(args, source, type, output):
+    """write the --build-fragment of `output` (and its shards) and their precompiled header"""
+    fragment.write(
+        args.build_fragment,
+        output,
+        name="{}_{}".format(init_name(args, source), backend_name(type)),
+        type=type,
+        input=strip_path(args, source),
+        sources=[output] + shard_paths(args, output),
+        headers=args.headers,
+        include_path=args.include_path,
+        defines=args.defines,
+    )
+
+
+def generate(args, source, ast_parser=None, env=None, out=None, err=None, node=None, profile=NULL_PROFILE):
+    """parse `source` and write the generated binding code of the single backend into `out`"""
+    if ast_parser is None:
+        ast_parser = create_parser(args)
+    generator = visit(args, source, ast_parser=ast_parser, err=err, node=node, profile=profile)
+    render(args, source, generator, generator_type(args), ast_parser, env=env, out=out, profile=profile)
+    return generator
+
+
+def fatal_errors(ast_parser):
+    return [x for x in ast_parser.errors if x.severity >= FATAL_SEVERITY]
+
+
+def generate_file(args, source, output, ast_parser=None, env=None, err=None, node=None, profile=NULL_PROFILE):
+    """
+    generate `source` into the `output` file (one file per backend, see output_paths)
+
+    returns False if it was skipped by --skip-unchanged
+    """
+    outputs = output_paths(args, output)
+    if args.skip_unchanged and is_up_to_date(args, source, output):
+        return False
+    # stale until this run succeeds
+    for _, path in outputs:
+        depend.remove_manifest(path)
+        depend.remove_depfile(path)
+    if ast_parser is None:
+        # after the up-to-date check; it doesn't need libclang
+        ast_parser = create_parser(args)
+    # one parse and one visit for every backend
+    generator = visit(args, source, ast_parser=ast_parser, err=err, node=node, profile=profile)
+    for type, path in outputs:
+        if args.shards > 1:
+            render_shards(args, source, generator, type, ast_parser, path, env=env, profile=profile)
+            continue
+        with open(path, "w") as fp:
+            render(args, source, generator, type, ast_parser, env=env, out=fp, profile=profile)
+    if args.build_fragment:
+        for type, path in outputs:
+            write_build_fragment(args, source, type, path)
+    if fatal_errors(ast_parser):
+        # regenerate next time; the caller reports the errors
+        return True
+    if args.depfile or args.skip_unchanged:
+        dependencies = ast_parser.dependencies(source)
+        if os.path.normpath(source) not in dependencies:
+            dependencies.insert(0, source)
+        if args.config:
+            dependencies.append(args.config)
+        if args.template_dir:
+            for type, _ in outputs:
+                template = os.path.join(args.template_dir, TEMPLATE_NAMES[type])
+                if os.path.exists(template):
+                    dependencies.append(template)
+        for _, path in outputs:
+            if args.depfile:
+                depend.write_depfile(depend.depfile_path(path), path, dependencies)
+            if args.skip_unchanged:
+                depend.write_manifest(args, source, path, dependencies)
+    return True
@@ -0,0 +1,139 @@
+"""
+build system fragments of the generated files (see --build-fragment)
+
+a fragment lists the generated translation units (the output and its shards),
+the -I/-D flags given to pypp and a precompiled header shared by the units.
+"""
+
+import os
+import shlex
+
+from .option import GeneratorType
+
+
+FORMATS = ["cmake", "ninja"]
+PCH_SUFFIX = ".pch.hpp"
+
+# included by the templates
+BACKEND_HEADERS = {
+    GeneratorType.Pybind11: ["pybind11/pybind11.h", "pybind11/stl.h"],
+    GeneratorType.Boost: ["boost/python.hpp"],
+    GeneratorType.Embind: ["emscripten/bind.h"],
+}
+
+
+def fragment_path(output, format):
+    """e.g. foo.cpp -> foo.cpp.cmake; foo.cpp and foo.cxx don't collide"""
+    return output + "." + format
+
+
+def pch_path(output):
+    """e.g. foo.cpp -> foo.cpp.pch.hpp"""
+    return output + PCH_SUFFIX
+
+
+def object_path(source):
+    return source + ".o"
+
+
+def pch_lines(type, headers, input):
+    """
+    the precompiled header of a backend
+
+    `input` is included as in the generated code, so the header has to be next to the output
+    """
+    lines = ["// generate by pypp", "#pragma once", ""]
+    lines += ["#include <{}>".format(x) for x in BACKEND_HEADERS[type]]
+    lines.append("")
+    lines += ['#include "{}"'.format(os.path.abspath(x) if os.path.exists(x) else x) for x in headers]
+    lines.append('#include "{}"'.format(input))
+    return lines
+
+
+def escape_cmake(value):
+    return '"{}"'.format(value.replace("\\", "\\\\").replace('"', '\\"').replace("$", "\\$"))
+
+
+def escape_ninja(path):
+    return path.replace("$", "$$").replace(" ", "$ ").replace(":", "$:")
+
+
+def cmake_lines(name, input, sources, include_path, defines, pch):
+    prefix = name.upper()
+    lines = [
+        "# generate by pypp",
+        "# original source code: {}".format(input),
+        "#",
+        "#   include({})".format(os.path.basename(fragment_path(sources[0], "cmake"))),
+        "#   target_sources(target PRIVATE ${{{}_SOURCES}})".format(prefix),
+        "#   target_include_directories(target PRIVATE ${{{}_INCLUDE_DIRECTORIES}})".format(prefix),
+        "#   target_compile_definitions(target PRIVATE ${{{}_COMPILE_DEFINITIONS}})".format(prefix),
+        "#   target_precompile_headers(target PRIVATE ${{{}_PRECOMPILE_HEADERS}})".format(prefix),
+    ]
+    for variable, values in [
+        ("SOURCES", sources),
+        ("INCLUDE_DIRECTORIES", include_path),
+        ("COMPILE_DEFINITIONS", defines),
+        ("PRECOMPILE_HEADERS", [pch]),
+    ]:
+        lines.append("")
+        lines.append("set({}_{}".format(prefix, variable))
+        lines += ["    " + escape_cmake(x) for x in values]
+        lines.append(")")
+    return lines
+
+
+def ninja_lines(name, input, sources, include_path, defines, pch):
+    flags = ["-I" + x for x in include_path] + ["-D" + x for x in defines]
+    gch = pch + ".gch"
+    objects = [escape_ninja(object_path(x)) for x in sources]
+    lines = [
+        "# generate by pypp",
+        "# original source code: {}".format(input),
+        "#",
+        "#   subninja {}".format(os.path.basename(fragment_path(sources[0], "ninja"))),
+        "#",
+        "# $cxx and $cxxflags are taken from the including file;",
+        "# the precompiled header is built for gcc ({})".format(os.path.basename(gch)),
+        "",
+        "pypp_flags = {}".format(" ".join(shlex.quote(x) for x in flags).replace("$", "$$")),
+        "pypp_pch = {}".format(shlex.quote(pch).replace("$", "$$")),
+        "",
+        "rule pypp_pch",
+        "  command = $cxx $cxxflags $pypp_flags -x c++-header $in -o $out",
+        "  description = PCH $out",
+        "",
+        "rule pypp_cxx",
+        "  command = $cxx $cxxflags $pypp_flags -include $pypp_pch -c $in -o $out -MD -MF $out.d",
+        "  depfile = $out.d",
+        "  deps = gcc",
+        "  description = CXX $out",
+        "",
+        "build {}: pypp_pch {}".format(escape_ninja(gch), escape_ninja(pch)),
+    ]
+    for source, obj in zip(sources, objects):
+        lines.append("build {}: pypp_cxx {} | {}".format(obj, escape_ninja(source), escape_ninja(gch)))
+    lines.append("build {}: phony {}".format(name, " ".join(objects)))
+    return lines
+
+
+def write(format, output, name, type, input, sources, headers, include_path, defines):
+    """
+    write the fragment of `format` and the precompiled header next to `output`
+
+    the paths are absolute, so the fragment can be used from any build directory
+    """
+    pch = os.path.abspath(pch_path(output))
+    with open(pch, "w") as fp:
+        fp.write("\n".join(pch_lines(type, headers, input)) + "\n")
+    make_lines = cmake_lines if format == "cmake" else ninja_lines
+    lines = make_lines(
+        name,
+        input,
+        [os.path.abspath(x) for x in sources],
+        [os.path.abspath(x) for x in include_path],
+        defines,
+        pch,
+    )
+    with open(fragment_path(output, format), "w") as fp:
+        fp.write("\n".join(lines) + "\n")
@@ -3,20 +3,27 @@ from __future__ import print_function
 import re
 from collections import OrderedDict
 
-import clang.cindex
+from . import decl
 
 from .constants import (
     UNARY_OPERATOR_MAP,
     BINARY_OPERATOR_MAP,
     OTHER_OPERATOR_MAP,
     NOT_DEFAULT_ARG_KINDS,
+    ARITHMETIC_TYPES,
+    INTEGRAL_TYPES,
+    NUMPY_SCALAR_TYPES,
 )
 from .abstract import NodeVisitor
-from .parser import AstNode
+from .node import AstNode
 from . import utils
 
 
 FUNCTION_POINTER_RE = re.compile(r"\w+\s*\(\*\)\([^\)]*\)")
+POINTER_RE = re.compile(r"^(?P<const>const\s+)?(?P<type>[\w:\s]+?)\s*\*$")
+
+# entities and option of Generator.build; inherited by the forked workers
+_build_state = {}
 
 
 class GeneratorBase(NodeVisitor):
@@ -43,6 +50,23 @@ class FunctionEntity(object):
         return Function.has_pointer_arg_ret(self.func)
 
 
+class Signature(object):
+    """types of a function computed once per declaration"""
+    __slots__ = ("result_type", "arg_types", "has_function_pointer", "has_pointer_arg_ret")
+
+    def __init__(self, node):
+        # read once; a live cursor converts them again on each access
+        result_type = node.result_type
+        types = [x.type for x in node.get_arguments()]
+        self.result_type = utils.canonical_type(result_type)
+        self.arg_types = [utils.canonical_type(x) for x in types]
+        self.has_function_pointer = (
+            Function.is_function_pointer(result_type)
+            or any([Function.is_function_pointer(x) for x in types])
+        )
+        self.has_pointer_arg_ret = "*" in self.result_type or any(["*" in x for x in self.arg_types])
+
+
 class Function(object):
     def __init__(self, name, namespaces=[]):
         self.name = name
@@ -59,11 +83,16 @@ class Function(object):
         self.register_overloads(node)
         self.register_return_value(node)
 
-    def has_decl_code(self):
-        return bool(self.decls)
+    def has_decl_code(self, opt=None):
+        if self.decls:
+            return True
+        return opt is not None and bool(self.wrappers(opt))
 
     def decl_code(self, opt):
-        return self.decls
+        return self.decls + self.wrappers(opt)
+
+    def wrappers(self, opt):
+        return opt.function.wrappers(self)
 
     def to_code_block(self, opt):
         return opt.function.make(self)
@@ -72,43 +101,60 @@ class Function(object):
     def is_std_type(cls, type):
         return type.spelling.startswith("std::") or re.match(r"^const\s+std::", type.spelling)
 
+    @classmethod
+    def signature(cls, node):
+        if not isinstance(node, decl.Decl):
+            # kept on the cursor object like clang.cindex keeps its properties;
+            # the overloads in Function.functions are the same objects on each call
+            signature = getattr(node, "_pypp_signature", None)
+            if signature is None:
+                signature = Signature(node)
+                try:
+                    node._pypp_signature = signature
+                except AttributeError:
+                    pass
+            return signature
+        if node.signature is None:
+            node.signature = Signature(node)
+        return node.signature
+
     @classmethod
     def result_type(cls, node):
-        return utils.canonical_type(node.result_type)
+        return cls.signature(node).result_type
 
     @classmethod
     def arg_types(cls, node):
-        args = []
-        for arg in node.get_arguments():
-            args.append(utils.canonical_type(arg.type))
-        return args
+        return list(cls.signature(node).arg_types)
 
     @classmethod
     def has_function_pointer(cls, node):
-        if cls.is_function_pointer(node.result_type):
-            return True
-        return any([cls.is_function_pointer(x.type) for x in node.get_arguments()])
+        return cls.signature(node).has_function_pointer
 
     @classmethod
     def is_function_pointer(cls, type):
-        assert isinstance(type, clang.cindex.Type)
         ctype = type.get_canonical()
-        if ctype.kind == clang.cindex.TypeKind.POINTER:
+        if ctype.kind == decl.TypeKind.POINTER:
             if FUNCTION_POINTER_RE.match(ctype.spelling):
                 return True
         return False
 
+    @classmethod
+    def is_scalar_function(cls, node):
+        """whether the arguments (by value or const reference) and the result are NumPy scalars"""
+        args = [re.sub(r"^const (.*) &$", r"\1", x) for x in cls.arg_types(node)]
+        if not args:
+            return False
+        return all(x in NUMPY_SCALAR_TYPES for x in [cls.result_type(node)] + args)
+
     @classmethod
     def has_pointer_arg_ret(cls, node):
-        if "*" in cls.result_type(node):
-            return True
-        for type in cls.arg_types(node):
-            if "*" in type:
-                return True
-        return False
+        return cls.signature(node).has_pointer_arg_ret
 
     @classmethod
     def has_default_value(cls, arg):
+        if isinstance(arg, decl.Decl):
+            # the children of a parameter are not extracted
+            return bool(arg.flags & decl.DEFAULT_ARGUMENT)
         childs = [x for x in arg.get_children() if x.kind not in NOT_DEFAULT_ARG_KINDS]
         return len(childs) > 0
 
@@ -156,12 +202,24 @@ class Function(object):
             return ", {}".format(overload or policy)
         return ""
 
+    def release_gil(self, suffix, opt):
+        """whether the GIL is released while the `suffix`-th overload is called (see pypp.rules)"""
+        return opt.rules.release_gil(self, self.functions[suffix])
+
     def register_return_value(self, node):
         self.return_values.append(self.result_type(node))
 
     @property
     def cpp_name(self):
         return "::".join(self.namespaces + [self.name])
+
+    @property
+    def qualified_name(self):
+        return self.cpp_name
+
+    @property
+    def class_name(self):
+        return None
 #class Function
 
 
@@ -173,6 +231,17 @@ class Method(Function):
     def to_code_block(self, opt, class_name=None):
         return opt.method.make(self, class_name)
 
+    def wrappers(self, opt):
+        return opt.method.wrappers(self)
+
+    @property
+    def qualified_name(self):
+        return "{}::{}".format(self.parent.full_declaration, self.name)
+
+    @property
+    def class_name(self):
+        return self.parent.full_declaration
+
     def boost_python_overloads(self, node):
         if node.is_static_method():
             return "BOOST_PYTHON_FUNCTION_OVERLOADS"
@@ -242,6 +311,10 @@ class Method(Function):
 
 
 class ProtectedMethod(Method):
+    def release_gil(self, suffix, opt):
+        # bound through the wrapper class
+        return False
+
     def pyname(self):
         if not self.name.startswith("_"):
             return utils.check_reserved("_" + self.name)
@@ -249,7 +322,26 @@ class ProtectedMethod(Method):
 #class ProtectedMethod
 
 
+class BufferLayout(object):
+    """contiguous storage of a class (see Class.buffer_layout)"""
+
+    def __init__(self, type, readonly, shape, row_stride=None):
+        # element type
+        self.type = type
+        self.readonly = readonly
+        # accessors of the extents; e.g. ["rows", "cols"]
+        self.shape = shape
+        # accessor of the elements between the rows
+        self.row_stride = row_stride
+
+
 class Class(object):
+    # extents of a buffer; the first accessors found are used
+    BUFFER_SHAPES = [
+        ["rows", "cols"],
+        ["size"],
+    ]
+
     def __init__(self, name, decl=None, full_declaration=None, enable_defvisitor=False, enable_protected=False, enable_scope=False, namespaces=[]):
         self.name = name
         self.decl = decl if decl else name
@@ -274,7 +366,7 @@ class Class(object):
         return self.decl.replace("::", "_") + "DefVisitor"
 
     def add_bases(self, node):
-        assert node.kind == clang.cindex.CursorKind.CXX_BASE_SPECIFIER
+        assert node.kind == decl.CursorKind.CXX_BASE_SPECIFIER
         self.bases.append(node)
 
     def add_method(self, node):
@@ -282,26 +374,26 @@ class Class(object):
         if not self.is_declaration_part(node):
             return
         assert node.semantic_parent.spelling == self.name
-        if node.kind == clang.cindex.CursorKind.CONSTRUCTOR:
+        if node.kind == decl.CursorKind.CONSTRUCTOR:
             # skip move constructor
             if Function.arg_types(node) == ["{} &&".format(self.decl)]:
                 self.dropped_methods.append(node)
                 return
             self.constructors.append(node)
             return
-        elif node.kind == clang.cindex.CursorKind.DESTRUCTOR:
+        elif node.kind == decl.CursorKind.DESTRUCTOR:
             assert node.is_pure_virtual_method()
             self.virtual_methods.append(node)
             self.set_noncopyable(True)
             return
-        if node.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
+        if node.access_specifier == decl.AccessSpecifier.PRIVATE:
             self.private_methods.append(node)
-        elif node.access_specifier == clang.cindex.AccessSpecifier.PROTECTED:
+        elif node.access_specifier == decl.AccessSpecifier.PROTECTED:
             # init if it is not added
             if node.spelling not in self.protected_methods:
                 self.protected_methods[node.spelling] = ProtectedMethod(self, node.spelling)
             self.protected_methods[node.spelling].add_function(node)
-        elif node.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
+        elif node.access_specifier == decl.AccessSpecifier.PUBLIC:
             # init if it is not added
             if node.spelling not in self.methods:
                 self.methods[node.spelling] = Method(self, node.spelling)
@@ -318,7 +410,7 @@ class Class(object):
             return
         semantic_parent_name = node.semantic_parent.spelling
         assert semantic_parent_name == self.name or semantic_parent_name == ""
-        if node.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
+        if node.access_specifier == decl.AccessSpecifier.PUBLIC:
             # init if it is not added
             if node.spelling not in self.properties:
                 self.properties[node.spelling] = node
@@ -329,7 +421,7 @@ class Class(object):
             return
         semantic_parent_name = node.semantic_parent.spelling
         assert semantic_parent_name == self.name or semantic_parent_name == ""
-        if node.access_specifier == clang.cindex.AccessSpecifier.PUBLIC:
+        if node.access_specifier == decl.AccessSpecifier.PUBLIC:
             # init if it is not added
             if node.spelling not in self.properties:
                 self.static_properties[node.spelling] = node
@@ -346,7 +438,7 @@ class Class(object):
         flag = 0b00
         for init in self.constructors:
             if utils.is_copy_method(init):
-                if init.access_specifier != clang.cindex.AccessSpecifier.PRIVATE:
+                if init.access_specifier != decl.AccessSpecifier.PRIVATE:
                     flag |= 0b10
                     break
         for node in self.private_methods:
@@ -357,8 +449,8 @@ class Class(object):
 
     @classmethod
     def is_declaration_part(cls, node):
-        return node.lexical_parent.kind in [clang.cindex.CursorKind.CLASS_DECL,
-                                            clang.cindex.CursorKind.STRUCT_DECL]
+        return node.lexical_parent.kind in [decl.CursorKind.CLASS_DECL,
+                                            decl.CursorKind.STRUCT_DECL]
 
     def has_virtual_method(self):
         return bool(self.virtual_methods)
@@ -374,13 +466,13 @@ class Class(object):
     def has_wrapper(self):
         return self.has_virtual_method() or self.has_protected_method()
 
-    def has_decl_code(self):
+    def has_decl_code(self, opt=None):
         if self.virtual_methods:
             return True
         if self.enable_protected and self.protected_methods:
             return True
         for item in self.methods.values():
-            if item.decls:
+            if item.has_decl_code(opt):
                 return True
         return False
 
@@ -389,12 +481,45 @@ class Class(object):
         # wrapper
         if self.has_wrapper():
             result += opt.class_.class_wrapper(self)
-        # function overloads
+        # function overloads and GIL release wrappers
         for item in self.methods.values():
-            if item.decls:
-                result += item.decls
+            if item.has_decl_code(opt):
+                result += item.decl_code(opt)
         return result
 
+    def accessors(self, name):
+        """the public non-static overloads of `name` without arguments"""
+        if name not in self.methods:
+            return []
+        return [x for x in self.methods[name].functions if not x.is_static_method() and not x.get_arguments()]
+
+    def integral_accessor(self, name):
+        return any(Function.result_type(x) in INTEGRAL_TYPES for x in self.accessors(name))
+
+    def buffer_layout(self):
+        """
+        the BufferLayout of data() and size(), or of data(), rows(), cols() and stride() (optional)
+
+        data() returns a pointer to arithmetic elements, and the rows are
+        stride() (or cols()) elements apart; None if the class has no such accessors
+        """
+        layouts = []
+        for node in self.accessors("data"):
+            match = POINTER_RE.match(Function.result_type(node))
+            if match and match.group("type") in ARITHMETIC_TYPES:
+                layouts.append((bool(match.group("const")), match.group("type")))
+        if not layouts:
+            return None
+        # the mutable one if data() is overloaded
+        readonly, type = min(layouts)
+        for shape in self.BUFFER_SHAPES:
+            if all(self.integral_accessor(x) for x in shape):
+                row_stride = None
+                if len(shape) == 2 and self.integral_accessor("stride"):
+                    row_stride = "stride"
+                return BufferLayout(type, readonly, shape, row_stride=row_stride)
+        return None
+
     def to_code_block(self, opt):
         return opt.class_.make(self)
 #class Class
@@ -410,13 +535,24 @@ class Enum(object):
     def add_value(self, node):
         self.values.append(node.spelling)
 
+    def has_decl_code(self, opt=None):
+        return False
+
     def to_code_block(self, opt):
         return opt.enum.make(self)
 #class Enum
 
 
 class Generator(GeneratorBase):
-    def __init__(self, enable_defvisitor=False, enable_protected=False):
+    # declarations which are never bound; their children aren't visited
+    prune_kinds = frozenset([
+        "CLASS_TEMPLATE",
+        "FUNCTION_TEMPLATE",
+        "UNION_DECL",
+        "USING_DECLARATION",
+    ])
+
+    def __init__(self, enable_defvisitor=False, enable_protected=False, build_jobs=1):
         self.classes = OrderedDict()
         self.class_forward_declarations = []
         self.functions = OrderedDict()
@@ -424,42 +560,142 @@ class Generator(GeneratorBase):
         self.enable_defvisitor = enable_defvisitor
         self.enable_protected = enable_protected
         self.unnamed_hint = {}
+        # ptr -> full_namespace(ptr)
+        self.namespace_cache = {}
         self.vars = OrderedDict()
+        # worker processes of build()
+        self.build_jobs = build_jobs
 
     def generate(self, node, opt):
         assert isinstance(node, AstNode)
         self.visit(node)
-        block = utils.CodeBlock([])
-        for value in self.classes.values():
-            block += value.to_code_block(opt)
-        for value in self.functions.values():
-            block += value.to_code_block(opt)
-        for value in self.enums.values():
-            block += value.to_code_block(opt)
-        return "\n".join(block.to_code(indent=1))
-
-    def has_decl_code(self):
-        # overloads or virtual methods
-        for value in self.classes.values():
-            if value.has_decl_code():
-                return True
-        # overloads
-        for value in self.functions.values():
-            if value.has_decl_code():
-                return True
-        return False
+        return self.build(opt)
+
+    def build(self, opt):
+        """render the visited declarations with the builders of `opt`; can be called for each backend"""
+        return "\n".join(self.iter_build(opt))
+
+    def entities(self):
+        """the classes, functions and enums in the order of build()"""
+        return list(self.classes.values()) + list(self.functions.values()) + list(self.enums.values())
+
+    def iter_build(self, opt):
+        """the lines of build(), rendered one entity (or one range of entities with build_jobs) at a time"""
+        entities = self.entities()
+        context = None
+        if self.build_jobs > 1 and len(entities) > 1:
+            context = _fork_context()
+        for line in utils.CodeWriter().write(opt.module.make(self), 1).lines():
+            yield line
+        if context is None:
+            for value in entities:
+                for line in utils.CodeWriter().write(value.to_code_block(opt), 1).lines():
+                    yield line
+            return
+        # contiguous ranges, yielded in the same order as the serial build
+        count = min(len(entities), self.build_jobs * 4)
+        ranges = [(len(entities) * i // count, len(entities) * (i + 1) // count) for i in range(count)]
+        from concurrent.futures import ProcessPoolExecutor
+        _build_state.update(entities=entities, option=opt)
+        try:
+            with ProcessPoolExecutor(max_workers=self.build_jobs, mp_context=context) as executor:
+                for chunk in executor.map(_build_range, ranges):
+                    for line in chunk:
+                        yield line
+        finally:
+            _build_state.clear()
+
+    def has_decl_code(self, entities=None, opt=None):
+        """
+        `entities` is a part of entities(); e.g. a shard
 
-    def decl_code(self, opt):
-        block = utils.CodeBlock([])
+        some declarations depend on the backend of `opt` (e.g. GIL release wrappers)
+        """
+        if opt is not None and opt.module.decl_code(self):
+            return True
+        if entities is None:
+            entities = self.entities()
+        # overloads or virtual methods
+        return any(value.has_decl_code(opt) for value in entities)
+
+    def decl_code(self, opt, entities=None):
+        if entities is None:
+            entities = self.entities()
+        writer = utils.CodeWriter()
+        # before any use of the types; every shard has them
+        writer.write(opt.module.decl_code(self))
         # overloads or virtual methods
-        for value in self.classes.values():
-            if value.has_decl_code():
-                block += value.decl_code(opt)
-        # overloads
-        for value in self.functions.values():
-            if value.has_decl_code():
-                block += value.decl_code(opt)
-        return "\n".join(block.to_code())
+        for value in entities:
+            if value.has_decl_code(opt):
+                writer.write(value.decl_code(opt))
+        return "\n".join(writer.lines())
+
+    def shard_groups(self):
+        """
+        the entities grouped and ordered for sharding
+
+        base classes come before the derived ones, and the enums declared in a class
+        are in the group of the class (the builders refer to the class variable)
+        """
+        classes = list(self.classes.values())
+        owners = {}
+        for class_ in classes:
+            owners.setdefault(class_.full_declaration, class_)
+        scoped = {}
+        free_enums = []
+        for enum in self.enums.values():
+            if enum.scope in owners:
+                scoped.setdefault(enum.scope, []).append(enum)
+            else:
+                free_enums.append(enum)
+        groups = [[x] + scoped.get(x.full_declaration, []) for x in bases_first(classes)]
+        groups += [[x] for x in self.functions.values()]
+        groups += [[x] for x in free_enums]
+        return groups
+
+    def shards(self, opt, count):
+        """
+        [(entities, lines)] of `count` contiguous shards of about the same number of lines
+        (with their decl_code)
+
+        calling the shards in order registers the base classes before the derived ones
+        """
+        groups = self.shard_groups()
+        rendered = []
+        weights = []
+        for group in groups:
+            writer = utils.CodeWriter()
+            for value in group:
+                writer.write(value.to_code_block(opt), 1)
+            rendered.append(writer.to_code())
+            decls = utils.CodeWriter()
+            for value in group:
+                if value.has_decl_code(opt):
+                    decls.write(value.decl_code(opt))
+            weights.append(len(rendered[-1]) + len(decls.entries))
+        result = []
+        for start, stop in utils.split_balanced(weights, count):
+            entities = [x for group in groups[start:stop] for x in group]
+            lines = [x for block in rendered[start:stop] for x in block]
+            result.append((entities, lines))
+        return result
+
+    def stl_containers(self):
+        """the vector and map types (see utils.STL_CONTAINERS) of the bound signatures and fields"""
+        result = []
+        functions = list(self.functions.values())
+        for class_ in self.classes.values():
+            functions += class_.methods.values()
+            for node in class_.constructors:
+                for type in Function.arg_types(node):
+                    utils.stl_containers(type, result)
+            for node in list(class_.properties.values()) + list(class_.static_properties.values()):
+                utils.stl_containers(utils.canonical_type(node.type), result)
+        for func in functions:
+            for node in func.functions:
+                for type in [Function.result_type(node)] + Function.arg_types(node):
+                    utils.stl_containers(type, result)
+        return result
 
     def def_visitors(self):
         result = []
@@ -469,10 +705,17 @@ class Generator(GeneratorBase):
         return result
 
     def full_namespace(self, ptr, name=None):
+        if name is None and ptr is not None:
+            if ptr not in self.namespace_cache:
+                self.namespace_cache[ptr] = self._full_namespace(ptr)
+            return list(self.namespace_cache[ptr])
+        return self._full_namespace(ptr, name=name)
+
+    def _full_namespace(self, ptr, name=None):
+        if ptr is None or ptr.kind in [decl.CursorKind.TRANSLATION_UNIT, decl.CursorKind.UNEXPOSED_DECL]:
+            return []
         if ptr.hash in self.unnamed_hint:
             return self.unnamed_hint[ptr.hash]
-        if ptr is None or ptr.kind in [clang.cindex.CursorKind.TRANSLATION_UNIT, clang.cindex.CursorKind.UNEXPOSED_DECL]:
-            return []
         if name is None:
             if ptr.spelling == "":
                 # unnamed typedef special case
@@ -490,17 +733,14 @@ class Generator(GeneratorBase):
         return self.full_namespace(ptr.semantic_parent)
 
     def visit_TRANSLATION_UNIT(self, node):
-        for child in node:
-            self.visit(child)
+        return node
 
     def visit_UNEXPOSED_DECL(self, node):
         # extern "C" {}
-        for child in node:
-            self.visit(child)
+        return node
 
     def visit_NAMESPACE(self, node):
-        for child in node:
-            self.visit(child)
+        return node
 
     def visit_FUNCTION_DECL(self, node):
         function_name = node.ptr.spelling
@@ -510,12 +750,13 @@ class Generator(GeneratorBase):
         self.functions[func_id].add_function(node.ptr)
 
     def visit_CLASS_DECL(self, node, name=None):
-        self._class_decl(node, name=name)
+        return self._class_decl(node, name=name)
 
     def visit_STRUCT_DECL(self, node, name=None):
-        self._class_decl(node, name=name, struct=True)
+        return self._class_decl(node, name=name, struct=True)
 
     def _class_decl(self, node, name=None, struct=False):
+        """register the class and return the members to visit"""
         # unnamed special case
         if name is None:
             # pure class/struct definition
@@ -526,7 +767,7 @@ class Generator(GeneratorBase):
                 #     ...
                 # TYPEDEF_DECL : typedef_name
                 #     STRUCT_DECL : <- name=typedef_name (see visit_TYPEDEF_DECL)
-                return
+                return None
             # pure named class/struct definition
             name = node.ptr.spelling
         class_id = self.scope_id(node.ptr, name=name)
@@ -541,33 +782,34 @@ class Generator(GeneratorBase):
         pure_virtual_destructor = False
         disable_copy_constructor = False
         disable_copy_operator = False
+        members = []
         i = -1
         for i, child in enumerate(node):
-            if child.ptr.access_specifier == clang.cindex.AccessSpecifier.INVALID:
+            if child.ptr.access_specifier == decl.AccessSpecifier.INVALID:
                 i = -1
                 continue
 
-            if child.ptr.kind == clang.cindex.CursorKind.CXX_ACCESS_SPEC_DECL:
+            if child.ptr.kind == decl.CursorKind.CXX_ACCESS_SPEC_DECL:
                 continue
-            elif child.ptr.kind == clang.cindex.CursorKind.CXX_BASE_SPECIFIER:
+            elif child.ptr.kind == decl.CursorKind.CXX_BASE_SPECIFIER:
                 self.classes[class_id].add_bases(child.ptr)
                 continue
-            elif child.ptr.kind == clang.cindex.CursorKind.DESTRUCTOR:
+            elif child.ptr.kind == decl.CursorKind.DESTRUCTOR:
                 if not child.ptr.is_pure_virtual_method():
                     continue
                 pure_virtual_destructor = True
-            if child.ptr.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
+            if child.ptr.access_specifier == decl.AccessSpecifier.PRIVATE:
                 # check lvalue constructor
-                if child.ptr.kind == clang.cindex.CursorKind.CONSTRUCTOR:
+                if child.ptr.kind == decl.CursorKind.CONSTRUCTOR:
                     if utils.is_copy_method(child.ptr):
                         disable_copy_constructor = True
                 # check lvalue operator
                 elif child.ptr.spelling == "operator=":
                     if utils.is_copy_method(child.ptr):
                         disable_copy_operator = True
-            if child.ptr.access_specifier == clang.cindex.AccessSpecifier.PRIVATE:
+            if child.ptr.access_specifier == decl.AccessSpecifier.PRIVATE:
                 continue
-            self.visit(child)
+            members.append(child)
 
         # check force noncopyable
         self.classes[class_id].set_noncopyable(
@@ -581,9 +823,12 @@ class Generator(GeneratorBase):
         if i < 0:
             del self.classes[class_id]
             self.class_forward_declarations.append(name)
+            # the members would refer to the removed class
+            return []
         else:
             if class_id in self.class_forward_declarations:
                 self.class_forward_declarations.remove(class_id)
+        return members
 
     def visit_CONSTRUCTOR(self, node):
         class_name = node.ptr.semantic_parent.spelling
@@ -614,7 +859,7 @@ class Generator(GeneratorBase):
         self.classes[class_id].add_property(node.ptr)
 
     def visit_VAR_DECL(self, node):
-        if node.ptr.semantic_parent.kind == clang.cindex.CursorKind.NAMESPACE:
+        if node.ptr.semantic_parent.kind == decl.CursorKind.NAMESPACE:
             name = node.ptr.spelling
             self.vars[name] = node.ptr
         else:
@@ -630,15 +875,15 @@ class Generator(GeneratorBase):
                 return
             name = node.ptr.spelling
         scope = None
-        if node.ptr.semantic_parent.kind == clang.cindex.CursorKind.CLASS_DECL:
+        if node.ptr.semantic_parent.kind == decl.CursorKind.CLASS_DECL:
             scope = self.scope_id(node.ptr.semantic_parent)
             self.classes[scope].set_enable_scope(True)
         # TODO: namespace wrapped case; e.g. namespace ns { enum en { a, b, c }; }
         self.enums[name] = Enum(name, scoped_enum=node.ptr.is_scoped_enum(), scope="::".join(self.namespaces(node.ptr)))
         for child in node:
-            if child.ptr.kind == clang.cindex.CursorKind.UNEXPOSED_ATTR:
+            if child.ptr.kind == decl.CursorKind.UNEXPOSED_ATTR:
                 continue
-            assert child.ptr.kind == clang.cindex.CursorKind.ENUM_CONSTANT_DECL, "{!r}".format(child.ptr.kind)
+            assert child.ptr.kind == decl.CursorKind.ENUM_CONSTANT_DECL, "{!r}".format(child.ptr.kind)
             self.enums[name].add_value(child.ptr)
 
     def visit_TYPEDEF_DECL(self, node):
@@ -653,14 +898,58 @@ class Generator(GeneratorBase):
                 ENUM_CONSTANT_DECL : Item1
                 ENUM_CONSTANT_DECL : Item2
         """
+        members = []
         for child in node:
             if child.ptr.spelling:
                 continue
             self.unnamed_hint[child.ptr.hash] = self.full_namespace(node.ptr)
-            if child.ptr.kind == clang.cindex.CursorKind.ENUM_DECL:
+            # the hint changes the namespace of the unnamed declaration and its members
+            self.namespace_cache.clear()
+            if child.ptr.kind == decl.CursorKind.ENUM_DECL:
                 self.visit_ENUM_DECL(child, name=node.ptr.spelling)
-            elif child.ptr.kind == clang.cindex.CursorKind.CLASS_DECL:
-                self.visit_CLASS_DECL(child, name=node.ptr.spelling)
-            elif child.ptr.kind == clang.cindex.CursorKind.STRUCT_DECL:
-                self.visit_STRUCT_DECL(child, name=node.ptr.spelling)
+            elif child.ptr.kind == decl.CursorKind.CLASS_DECL:
+                members += self.visit_CLASS_DECL(child, name=node.ptr.spelling) or []
+            elif child.ptr.kind == decl.CursorKind.STRUCT_DECL:
+                members += self.visit_STRUCT_DECL(child, name=node.ptr.spelling) or []
+        return members
 #class Generator
+
+
+def bases_first(classes):
+    """`classes` in a stable order where each base class comes before its derived classes"""
+    names = {}
+    for class_ in classes:
+        names.setdefault(class_.decl, class_)
+        names.setdefault(class_.full_declaration, class_)
+    result = []
+    done = set()
+
+    def add(class_):
+        if id(class_) in done:
+            return
+        done.add(id(class_))
+        for base in class_.bases:
+            found = names.get(base.type.get_canonical().spelling)
+            if found is not None:
+                add(found)
+        result.append(class_)
+
+    for class_ in classes:
+        add(class_)
+    return result
+
+
+def _fork_context():
+    # imported only for parallel builds
+    import multiprocessing
+    if "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork")
+
+
+def _build_range(bounds):
+    start, stop = bounds
+    writer = utils.CodeWriter()
+    for value in _build_state["entities"][start:stop]:
+        writer.write(value.to_code_block(_build_state["option"]), 1)
+    return writer.to_code()
@@ -36,6 +36,8 @@ def main(argv):
 
     ast_parser = AstParser(headers=args.headers, include_path=include_path, defines=args.defines, allow_all=args.allow_all)
     ast_parser.skip_function_bodies = False
+    # the interpreter reads extents and function bodies from live cursors
+    ast_parser.snapshot = False
     node = ast_parser.parse(args.input)
 
     if args.verbose or not args.silence_errors:
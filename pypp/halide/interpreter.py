@@ -189,6 +189,19 @@ class CallExpr:
 
 
 class Interpreter(NodeVisitor):
+    # unused nodes
+    prune_kinds = frozenset([
+        "RETURN_STMT",
+        "NAMESPACE",
+        "CLASS_DECL",
+        "STRUCT_DECL",
+        "CONSTRUCTOR",
+        "DESTRUCTOR",
+        "CXX_METHOD",
+        "FIELD_DECL",
+        "ENUM_DECL",
+    ])
+
     def __init__(self):
         super().__init__()
         self.functions = OrderedDict()
@@ -235,13 +248,11 @@ class Interpreter(NodeVisitor):
         return self.full_namespace(ptr.semantic_parent)
 
     def visit_TRANSLATION_UNIT(self, node):
-        for child in node:
-            self.visit(child)
+        return node
 
     def visit_UNEXPOSED_DECL(self, node):
         # extern "C" {}
-        for child in node:
-            self.visit(child)
+        return node
 
     def visit_FUNCTION_DECL(self, node):
         function_name = node.ptr.spelling
@@ -250,10 +261,9 @@ class Interpreter(NodeVisitor):
         func = Function(function_name)
         self.functions[func_id] = func
         self.function_queue.append(func)
-        for child in node:
-            if child.ptr.kind == clang.cindex.CursorKind.PARM_DECL:
-                continue
-            self.visit(child)
+        return [x for x in node if x.ptr.kind != clang.cindex.CursorKind.PARM_DECL]
+
+    def leave_FUNCTION_DECL(self, node):
         self.function_queue.pop()
 
     def build_func_id(self, node):
@@ -263,7 +273,7 @@ class Interpreter(NodeVisitor):
 
     def visit_DECL_STMT(self, node):
         for child in node:
-            self.visit(child)
+            self.dispatch(child)
 
     def visit_VAR_DECL(self, node):
         name = node.ptr.spelling
@@ -283,14 +293,14 @@ class Interpreter(NodeVisitor):
             child = children[2]
         else:
             assert False, "{!r}".format([x.ptr.kind for x in children])
-        tree = self.visit(child)
+        tree = self.dispatch(child)
         func.add_decl(name, tree, node)
         self.in_var_decl = False
 
     def visit_UNEXPOSED_EXPR(self, node):
         children = list(node)
         assert len(children) == 1
-        return self.visit(children[0])
+        return self.dispatch(children[0])
 
     def visit_CXX_NULL_PTR_LITERAL_EXPR(self, node):
         return Nullptr()
@@ -298,18 +308,18 @@ class Interpreter(NodeVisitor):
     def visit_PAREN_EXPR(self, node):
         children = list(node)
         assert len(children) == 1
-        child = self.visit(children[0])
+        child = self.dispatch(children[0])
         return Parenthesis(child)
 
     def visit_CSTYLE_CAST_EXPR(self, node):
         children = list(node)
         count = len(children)
         if count == 1:
-            child = self.visit(children[0])
+            child = self.dispatch(children[0])
             return CStyleCastExpr(None, child)
         elif count == 2:
             type = children[0].ptr.type.spelling
-            child = self.visit(children[1])
+            child = self.dispatch(children[1])
             return CStyleCastExpr(type, child)
         else:
             assert False, "{!r}".format([x.ptr.kind] for x in children)
@@ -317,7 +327,7 @@ class Interpreter(NodeVisitor):
     def visit_INIT_LIST_EXPR(self, node):
         exprs = []
         for child in node:
-            exprs.append(self.visit(child))
+            exprs.append(self.dispatch(child))
         return InitializerListExpr(exprs)
 
     def visit_DECL_REF_EXPR(self, node):
@@ -332,15 +342,15 @@ class Interpreter(NodeVisitor):
     def visit_BINARY_OPERATOR(self, node):
         children = list(node)
         assert len(children) == 2
-        lhs = self.visit(children[0])
-        rhs = self.visit(children[1])
+        lhs = self.dispatch(children[0])
+        rhs = self.dispatch(children[1])
         op = "TODO_BINOP"
         return BinaryOperator(op, lhs, rhs)
 
     def visit_CALL_EXPR(self, node):
         args = []
         for child in node:
-            ret = self.visit(child)
+            ret = self.dispatch(child)
             if ret is not None:
                 args.append(ret)
             else:
@@ -350,49 +360,20 @@ class Interpreter(NodeVisitor):
 
     def visit_COMPOUND_STMT(self, node):
         for child in node:
-            self.visit(child)
+            self.dispatch(child)
 
     def visit_IF_STMT(self, node):
         children = list(node)
         assert len(children) == 2
         # skip if condition : node[0]
-        self.visit(children[1])
+        self.dispatch(children[1])
 
     def visit_FOR_STMT(self, node):
         children = list(node)
         count = len(children)
         # TODO: C++11 range-based-for
         for child in children:
-            self.visit(child)
-
-    # unused nodes
-
-    def visit_RETURN_STMT(self, node):
-        pass
-
-    def visit_NAMESPACE(self, node):
-        pass
-
-    def visit_CLASS_DECL(self, node, name=None):
-        pass
-
-    def visit_STRUCT_DECL(self, node, name=None):
-        pass
-
-    def visit_CONSTRUCTOR(self, node):
-        pass
-
-    def visit_DESTRUCTOR(self, node):
-        pass
-
-    def visit_CXX_METHOD(self, node):
-        pass
-
-    def visit_FIELD_DECL(self, node):
-        pass
-
-    def visit_ENUM_DECL(self, node, name=None):
-        pass
+            self.dispatch(child)
 
     def visit_TYPEDEF_DECL(self, node):
         """
@@ -409,10 +390,5 @@ class Interpreter(NodeVisitor):
         for child in node:
             if child.ptr.spelling:
                 continue
+            # the unnamed enum/class/struct itself is pruned
             self.unnamed_hint[child.ptr.hash] = self.full_namespace(node.ptr)
-            if child.ptr.kind == clang.cindex.CursorKind.ENUM_DECL:
-                self.visit_ENUM_DECL(child, name=node.ptr.spelling)
-            elif child.ptr.kind == clang.cindex.CursorKind.CLASS_DECL:
-                self.visit_CLASS_DECL(child, name=node.ptr.spelling)
-            elif child.ptr.kind == clang.cindex.CursorKind.STRUCT_DECL:
-                self.visit_STRUCT_DECL(child, name=node.ptr.spelling)
@@ -0,0 +1,189 @@
+"""
+versioned on-disk form of a declaration snapshot (see pypp.decl)
+
+the declarations, the types and the files are stored in flat tables
+and referenced by index, so shared objects (semantic parents, interned types)
+stay shared after loading.
+this module doesn't import clang.
+"""
+
+from __future__ import print_function
+
+import json
+
+from . import decl
+from .node import AstNodeRoot
+
+
+# 2: the children of a PARM_DECL are replaced by decl.DEFAULT_ARGUMENT
+IR_VERSION = 2
+
+
+class IrWriter(object):
+    def __init__(self):
+        self.decls = []
+        self.types = []
+        self.files = []
+        self.decl_ids = {}
+        self.type_ids = {}
+        self.type_records = {}
+        self.file_ids = {}
+
+    def decl(self, node):
+        if node is None:
+            return None
+        if id(node) in self.decl_ids:
+            return self.decl_ids[id(node)]
+        index = len(self.decls)
+        self.decl_ids[id(node)] = index
+        record = []
+        self.decls.append(record)
+        # parents and children may refer back to this decl
+        record.extend([
+            node.kind.name,
+            node.spelling,
+            node.hash,
+            node.access_specifier.name,
+            self.type(node.type),
+            self.type(node.result_type),
+            [self.decl(x) for x in node.arguments],
+            [self.decl(x) for x in node.children],
+            self.decl(node.semantic_parent),
+            self.decl(node.lexical_parent),
+            self.location(node.location),
+            node.flags,
+        ])
+        return index
+
+    def type(self, type):
+        if type is None:
+            return None
+        if id(type) in self.type_ids:
+            return self.type_ids[id(type)]
+        canonical = None if type.canonical is None else self.type(type.canonical)
+        # the extracted types aren't shared (see parser.LazyType); equal ones are stored once
+        record = (type.spelling, type.kind.name, type.const, canonical)
+        if record not in self.type_records:
+            self.type_records[record] = len(self.types)
+            self.types.append(list(record))
+        self.type_ids[id(type)] = self.type_records[record]
+        return self.type_ids[id(type)]
+
+    def location(self, location):
+        if location is None:
+            return None
+        return [self.file(location.file), location.line, location.column]
+
+    def file(self, file):
+        if file is None:
+            return None
+        if file.name not in self.file_ids:
+            self.file_ids[file.name] = len(self.files)
+            self.files.append(file.name)
+        return self.file_ids[file.name]
+
+    def diagnostic(self, diagnostic):
+        return [diagnostic.severity, diagnostic.spelling, self.location(diagnostic.location), diagnostic.text]
+
+
+class IrReader(object):
+    def __init__(self, data):
+        self.data = data
+        self.files = [decl.File(x) for x in data["files"]]
+        self.types = [None] * len(data["types"])
+        self.decls = [None] * len(data["decls"])
+
+    def decl(self, index):
+        if index is None:
+            return None
+        if self.decls[index] is not None:
+            return self.decls[index]
+        record = self.data["decls"][index]
+        kind, spelling, hash, access, type, result_type, arguments, children, semantic_parent, lexical_parent, location, flags = record
+        node = decl.Decl(
+            decl.CursorKind[kind],
+            spelling,
+            hash=hash,
+            access_specifier=decl.AccessSpecifier[access],
+            type=self.type(type),
+            result_type=self.type(result_type),
+            location=self.location(location),
+            flags=flags,
+        )
+        self.decls[index] = node
+        node.arguments = [self.decl(x) for x in arguments]
+        node.children = [self.decl(x) for x in children]
+        node.semantic_parent = self.decl(semantic_parent)
+        node.lexical_parent = self.decl(lexical_parent)
+        return node
+
+    def type(self, index):
+        if index is None:
+            return None
+        if self.types[index] is None:
+            spelling, kind, const, canonical = self.data["types"][index]
+            self.types[index] = decl.DeclType(spelling, decl.TypeKind[kind], const=const, canonical=self.type(canonical))
+        return self.types[index]
+
+    def location(self, location):
+        if location is None:
+            return None
+        file, line, column = location
+        return decl.Location(None if file is None else self.files[file], line, column)
+
+    def diagnostic(self, record):
+        severity, spelling, location, text = record
+        return decl.Diagnostic(severity, spelling, self.location(location), text)
+
+
+class IrUnit(object):
+    """
+    a loaded IR file
+
+    provides the part of the AstParser interface used by pypp.driver.generate
+    """
+
+    def __init__(self, path, source, root, errors):
+        self.path = path
+        self.source = source
+        self.root = root
+        self.errors = errors
+        self.timings = {}
+        self.counters = {}
+
+    def parse(self, source):
+        return AstNodeRoot(self, self.root, self.source, children=self.root.children)
+
+    def dump_errors(self, fileobj):
+        decl.dump_errors(self.errors, fileobj)
+
+    def dependencies(self, source):
+        return [self.path]
+
+
+def dump(path, source, root, errors):
+    """write the root Decl of `source` and its diagnostics into `path`"""
+    writer = IrWriter()
+    top = writer.decl(root)
+    data = {
+        "version": IR_VERSION,
+        "source": source,
+        "root": top,
+        "errors": [writer.diagnostic(x) for x in errors],
+        "files": writer.files,
+        "types": writer.types,
+        "decls": writer.decls,
+    }
+    with open(path, "w") as fp:
+        json.dump(data, fp, separators=(",", ":"))
+
+
+def load(path):
+    with open(path) as fp:
+        data = json.load(fp)
+    if data.get("version") != IR_VERSION:
+        raise ValueError("unsupported IR version {!r} (expected {})".format(data.get("version"), IR_VERSION))
+    reader = IrReader(data)
+    root = reader.decl(data["root"])
+    errors = [reader.diagnostic(x) for x in data["errors"]]
+    return IrUnit(path, data["source"], root, errors)
@@ -0,0 +1,30 @@
+class AstNode(object):
+    def __init__(self, node, parent=None):
+        self.ptr = node
+        self.parent = parent
+        self._children = None
+
+    def __iter__(self):
+        if self._children is None:
+            self._children = [AstNode(x, self) for x in self.ptr.get_children()]
+        return iter(self._children)
+
+    @property
+    def _fields(self):
+        return []
+
+
+class AstNodeRoot(AstNode):
+    def __init__(self, parser, node, source, children=None, errors=None):
+        super(AstNodeRoot, self).__init__(node)
+        self.parser = parser
+        self.source = source
+        # top-level declarations in scope (see AstParser.parse and parse_umbrella)
+        self.children = children
+        # diagnostics of this source in an umbrella unit; None for all the diagnostics of the parser
+        self.errors = errors
+
+    def __iter__(self):
+        children = self.children if self.children is not None else self.ptr.get_children()
+        for child in children:
+            yield AstNode(child)
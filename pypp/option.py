@@ -1,5 +1,4 @@
 import enum
-from .builder import boost, pybind11, embind
 
 
 class GeneratorType(enum.Enum):
@@ -10,24 +9,36 @@ class GeneratorType(enum.Enum):
 
 
 class GeneratorOption:
-    def __init__(self, type=GeneratorType.Boost):
+    def __init__(self, type=GeneratorType.Boost, rules=None):
+        from .rules import Rules
+
         self.type = type
+        # see pypp.rules
+        self.rules = rules if rules is not None else Rules()
         self.init()
 
     def init(self):
+        from .builder import base
+
+        self.module = base.ModuleBuilder(self)
+        # only the selected backend is imported
         if self.type == GeneratorType.Boost:
+            from .builder import boost
             self.option = boost.BoostPythonOptionBuilder(self)
             self.function = boost.BoostPythonFunctionBuilder(self)
             self.method = boost.BoostPythonMethodBuilder(self)
             self.class_ = boost.BoostPythonClassBuilder(self)
             self.enum = boost.BoostPythonEnumBuilder(self)
         elif self.type == GeneratorType.Pybind11:
+            from .builder import pybind11
             self.option = pybind11.Pybind11OptionBuilder(self)
             self.function = pybind11.Pybind11FunctionBuilder(self)
             self.method = pybind11.Pybind11MethodBuilder(self)
             self.class_ = pybind11.Pybind11ClassBuilder(self)
             self.enum = pybind11.Pybind11EnumBuilder(self)
+            self.module = pybind11.Pybind11ModuleBuilder(self)
         elif self.type == GeneratorType.Embind:
+            from .builder import embind
             self.option = embind.EmbindOptionBuilder(self)
             self.function = embind.EmbindFunctionBuilder(self)
             self.method = embind.EmbindMethodBuilder(self)
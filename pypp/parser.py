@@ -4,38 +4,59 @@ except ImportError:
     # for python2
     import ConfigParser as configparser
 import os
+from collections import OrderedDict
+import time
 
 import clang.cindex
 from clang.cindex import TranslationUnit
 
+from .depend import digest
+from . import decl
+from .constants import NOT_DEFAULT_ARG_KINDS
+from .decl import CLANG_ERROR_SEVERITY
+from .node import AstNode, AstNodeRoot
+from .scope import ScopeFilter
+from . import scope as scopes
+
 LIBCLANG_PATH = None
+# the unsaved file which includes the sources
+ENTRYPOINT = "<entrypoint>.cpp"
 LIBCLANG_PATH_DEFAULT = {
     "posix": "/usr/lib/llvm-11/lib/libclang.so.1",  # Ubuntu 20.04
     "nt": r"C:\Program Files\LLVM\bin\libclang.dll",
 }
 
 def __load_config(path):
-    global LIBCLANG_PATH
     config = configparser.ConfigParser()
     config.read(path)
-    LIBCLANG_PATH = config.get("llvm", "libclang")
-if not LIBCLANG_PATH and os.path.exists(".PYPP_LIBCLANG_PATH"):
-    __load_config(".PYPP_LIBCLANG_PATH")
-if not LIBCLANG_PATH and os.path.exists(os.path.expanduser("~/.config/pypp.conf")):
-    __load_config(os.path.expanduser("~/.config/pypp.conf"))
-if not LIBCLANG_PATH:
-    LIBCLANG_PATH = os.getenv("PYPP_LIBCLANG_PATH", LIBCLANG_PATH_DEFAULT[os.name])
+    return config.get("llvm", "libclang")
 
-clang.cindex.Config.set_library_file(LIBCLANG_PATH)
+def libclang_path():
+    """the configured libclang; nothing is loaded"""
+    if LIBCLANG_PATH:
+        return LIBCLANG_PATH
+    path = None
+    if os.path.exists(".PYPP_LIBCLANG_PATH"):
+        path = __load_config(".PYPP_LIBCLANG_PATH")
+    if not path and os.path.exists(os.path.expanduser("~/.config/pypp.conf")):
+        path = __load_config(os.path.expanduser("~/.config/pypp.conf"))
+    if not path:
+        path = os.getenv("PYPP_LIBCLANG_PATH", LIBCLANG_PATH_DEFAULT[os.name])
+    return path
 
+def load_libclang():
+    """
+    set the configured libclang to clang.cindex once
 
-CLANG_ERROR_SEVERITY = [
-    "Ignored",
-    "Note",
-    "Warning",
-    "Error",
-    "Fatal",
-]
+    called by AstParser; the library itself is opened by the first Index
+    """
+    global LIBCLANG_PATH
+    if LIBCLANG_PATH:
+        return LIBCLANG_PATH
+    path = libclang_path()
+    clang.cindex.Config.set_library_file(path)
+    LIBCLANG_PATH = path
+    return path
 
 
 class AstParser(object):
@@ -44,72 +65,595 @@ class AstParser(object):
         "-std=c++17",
     ]
 
-    def __init__(self, headers=[], include_path=[], lib_path=[], defines=[], allow_all=False):
+    def __init__(self, headers=[], include_path=[], lib_path=[], defines=[], allow_all=False, cache=None, pch=None, precompile_headers=False, scope=None):
+        load_libclang()
         self.index = clang.cindex.Index.create()
         self.headers = headers
         self.include_path = include_path
         self.lib_path = lib_path
         self.defines = defines
         self.errors = []
+        self.includes = []
+        # (includer, included) of every #include directive; only recorded by parse_umbrella
+        self.inclusions = None
+        # the files included by ENTRYPOINT, one per line
+        self.entrypoint_includes = []
         self.allow_all = allow_all
+        if scope is None:
+            scope = ScopeFilter(include_path=include_path, allow_all=allow_all)
+        self.scope = scope
         self.skip_function_bodies = True
+        # extract a pure-Python snapshot (pypp.decl) instead of live cursors
+        self.snapshot = True
+        self.cache = cache
+        # precompiled header of `headers`
+        self.pch = pch
+        self.precompile_headers = precompile_headers
+        self.pch_used = None
+        # the cache key of the pch built by build_pch
+        self.pch_key = None
+        self.timings = {}
+        self.counters = {}
+        # keep the parsed units and refresh them with reparse (see pypp.daemon)
+        self.keep_units = False
+        # the most recently used units last; at most max_units are kept
+        self.units = OrderedDict()
+        self.max_units = 16
 
-    def parse(self, source):
-        #assert source.endswith(".h") or source.endswith(".hpp")
+    def build_clang_args(self):
         clang_args = list(self.clang_args)  # copy
         clang_args += ["-I"+x for x in self.include_path]
         clang_args += ["-L"+x for x in self.lib_path]
         clang_args += ["-D"+x for x in self.defines]
+        return clang_args
+
+    def parse_options(self):
+        options = 0
+        if self.skip_function_bodies:
+            options |= TranslationUnit.PARSE_SKIP_FUNCTION_BODIES
+        return options
+
+    def parse(self, source):
+        #assert source.endswith(".h") or source.endswith(".hpp")
+        unit = self.parse_unit([source])
+        start = time.perf_counter()
+        children = []
+        count = 0
+        for child in unit.cursor.get_children():
+            count += 1
+            location = child.location
+            name = location.file.name if location.file else None
+            if self.find_source(name, [source]) is not None:
+                if not self.scope.is_denied(name):
+                    children.append(child)
+            elif self.scope.accepts_file(name, lambda: self.is_in_system_header(location)):
+                children.append(child)
+        self.counters["top-level cursors"] = count
+        self.counters["dropped by scope"] = count - len(children)
+        if not self.snapshot:
+            self.timings["extract"] = time.perf_counter() - start
+            return AstNodeRoot(self, unit.cursor, source, children=children)
+        extractor = DeclExtractor(self.scope)
+        root = extractor.extract_root(unit.cursor, children)
+        self.counters["cursors extracted"] = len(extractor.extracted)
+        self.timings["extract"] = time.perf_counter() - start
+        return AstNodeRoot(self, root, source, children=root.children)
+
+    def parse_umbrella(self, sources):
+        """
+        parse one translation unit which includes every source once
+
+        the top-level cursors are partitioned by their file,
+        and one root is returned for each source in the given order.
+        """
+        # the include tree of a source isn't complete in get_includes() when an earlier source
+        # included the same header; the #include directives are recorded instead
+        unit = self.parse_unit(sources, detailed=True)
+        partitions = OrderedDict((x, []) for x in sources)
+        owners = {}
+        inclusions = []
+        for child in unit.cursor.get_children():
+            name = child.location.file.name if child.location.file else None
+            if child.kind == clang.cindex.CursorKind.INCLUSION_DIRECTIVE:
+                try:
+                    included = child.get_included_file()
+                except AssertionError:
+                    # not found; the bindings assert on the null file
+                    continue
+                inclusions.append((name, included.name))
+                continue
+            if child.kind.is_preprocessing():
+                continue
+            if name not in owners:
+                owners[name] = self.find_source(name, sources)
+                if owners[name] is not None and self.scope.is_denied(name):
+                    owners[name] = None
+            if owners[name] is not None:
+                partitions[owners[name]].append(child)
+        self.inclusions = inclusions
+        errors = self.partition_errors(sources)
+        if not self.snapshot:
+            return [AstNodeRoot(self, unit.cursor, x, children=partitions[x], errors=errors[x]) for x in sources]
+        extractor = DeclExtractor(self.scope)
+        roots = []
+        for source in sources:
+            root = extractor.extract_root(unit.cursor, partitions[source])
+            roots.append(AstNodeRoot(self, root, source, children=root.children, errors=errors[source]))
+        return roots
 
-        includes = self.headers + [source]
+    def partition_errors(self, sources):
+        """
+        source -> the diagnostics of the umbrella unit located in the include tree of the source
+
+        a diagnostic of a shared header goes to every source including it,
+        and one without a location (or of --headers) to every source
+        """
+        trees = OrderedDict((x, set(self.dependencies(x))) for x in sources)
+        result = OrderedDict((x, []) for x in sources)
+        for error in self.errors:
+            owners = list(sources)
+            name = error.location.file.name if error.location.file else None
+            if name == ENTRYPOINT:
+                # e.g. a source which isn't found
+                line = error.location.line
+                if 0 < line <= len(self.entrypoint_includes) and self.entrypoint_includes[line - 1] in result:
+                    owners = [self.entrypoint_includes[line - 1]]
+            elif name is not None:
+                name = os.path.normpath(name)
+                owners = [x for x in sources if name in trees[x]] or owners
+            for source in owners:
+                result[source].append(error)
+        return result
+
+    def find_source(self, filename, sources):
+        return self.scope.match_source(filename, sources)
+
+    @classmethod
+    def is_in_system_header(cls, location):
+        try:
+            return location.is_in_system_header
+        except AttributeError:
+            # older bindings
+            return False
+
+    def parse_unit(self, sources, detailed=False):
+        clang_args = self.build_clang_args()
+
+        includes = self.headers + sources
+        cache = self.cache
+        self.pch_used = None
+        if self.headers and (self.pch or self.precompile_headers):
+            pch = self.pch or self.build_pch()
+            if pch is not None:
+                clang_args += ["-include-pch", pch]
+                includes = list(sources)
+                self.pch_used = pch
+                # libclang can't reload an AST file which was built on top of a pch
+                cache = None
         lines = ['#include "{}"'.format(x) for x in includes]
+        self.entrypoint_includes = includes
         src = [
-            ("<entrypoint>.cpp", "\n".join(lines)),
+            (ENTRYPOINT, "\n".join(lines)),
         ]
-        args = []
-        if self.skip_function_bodies:
-            args.append(TranslationUnit.PARSE_SKIP_FUNCTION_BODIES)
-        unit = self.index.parse("<entrypoint>.cpp", clang_args, src, *args)
-        self.errors = list(unit.diagnostics)
-        return AstNodeRoot(self, unit.cursor, source)
+        options = self.parse_options()
+        if detailed:
+            options |= TranslationUnit.PARSE_DETAILED_PROCESSING_RECORD
+        self.inclusions = None
+        start = time.perf_counter()
+        unit = None
+        if self.keep_units:
+            # in-memory units are reused instead of the on-disk cache
+            cache = None
+            # the includes and the -I paths may be relative to the client's directory
+            key = (os.getcwd(), tuple(clang_args), src[0][1], options)
+            unit = self.units.get(key)
+            if unit is not None:
+                self.units.move_to_end(key)
+                unit.reparse(src)
+            else:
+                options |= TranslationUnit.PARSE_PRECOMPILED_PREAMBLE
+        if cache is not None:
+            key = cache.key(src, clang_args, options, LIBCLANG_PATH)
+            unit = cache.load(self.index, key)
+        if unit is None:
+            unit = self.index.parse(ENTRYPOINT, clang_args, src, options)
+            if cache is not None:
+                cache.store(unit, key)
+            if self.keep_units:
+                self.units[key] = unit
+                while len(self.units) > self.max_units:
+                    self.units.popitem(last=False)
+        self.timings["parse"] = time.perf_counter() - start
+        start = time.perf_counter()
+        # copied; the unit can be released as soon as the caller is done with it
+        self.errors = [self.convert_diagnostic(x) for x in unit.diagnostics]
+        self.includes = [(x.source.name, x.include.name, x.depth) for x in unit.get_includes()]
+        self.timings["diagnostics"] = time.perf_counter() - start
+        return unit
+
+    @classmethod
+    def convert_diagnostic(cls, diagnostic):
+        location = diagnostic.location
+        file = decl.File(location.file.name) if location.file else None
+        return decl.Diagnostic(
+            diagnostic.severity,
+            diagnostic.spelling,
+            decl.Location(file, location.line, location.column),
+            str(diagnostic),
+        )
+
+    def dependencies(self, source):
+        """files which the declarations of `source` (and `headers`) depend on"""
+        graph = OrderedDict()
+        roots = []
+        edges = self.inclusions
+        if edges is None:
+            edges = [(includer, included) for includer, included, _ in self.includes]
+        for includer, included in edges:
+            name = os.path.normpath(included)
+            if includer == ENTRYPOINT:
+                if self.find_source(included, self.headers + [source]) is not None:
+                    roots.append(name)
+                continue
+            graph.setdefault(os.path.normpath(includer), []).append(name)
+        result = []
+        queue = list(roots)
+        visited = set(queue)
+        while queue:
+            name = queue.pop(0)
+            result.append(name)
+            for child in graph.get(name, []):
+                if child not in visited:
+                    visited.add(child)
+                    queue.append(child)
+        if self.pch_used:
+            result += [x for x in self.pch_dependencies() if x not in visited]
+        return result
+
+    def pch_dependencies(self):
+        """the --headers (and their includes) inside the pch; the pch itself if it is given by --pch"""
+        if self.pch_used == self.pch or self.cache is None:
+            return [self.pch_used]
+        return [os.path.normpath(x) for x in self.cache.dependencies(self.pch_key)]
+
+    def build_pch(self):
+        """
+        build the precompiled header of `headers` once per flag set
+
+        the pch is stored in the translation unit cache, so later runs reuse it;
+        without the cache the headers are included as usual.
+        """
+        if self.cache is None:
+            return None
+        clang_args = self.build_clang_args() + ["-x", "c++-header"]
+        # quoted includes are resolved from the prelude location
+        headers = [os.path.abspath(x) if os.path.exists(x) else x for x in self.headers]
+        lines = ['#include "{}"'.format(x) for x in headers]
+        options = self.parse_options()
+        key = digest("pch", lines, clang_args, options, LIBCLANG_PATH)
+        path = self.cache.ast_path(key)
+        self.pch_key = key
+        if self.cache.lookup(key):
+            return path
+
+        start = time.perf_counter()
+        prelude = self.cache.prelude_path(key)
+        with open(prelude, "w") as fp:
+            fp.write("\n".join(lines) + "\n")
+        unit = self.index.parse(prelude, clang_args, None, options)
+        saved = self.cache.store(unit, key)
+        self.timings["pch"] = time.perf_counter() - start
+        if not saved:
+            self.cache.invalidate(key)
+            # fallback to plain #include
+            return None
+        return path
 
     def dump_errors(self, fileobj):
-        if not self.errors:
-            print("no errors", file=fileobj)
-            return
-        for error in self.errors:
-            print("{}: {!r}@{!r}".format(
-                CLANG_ERROR_SEVERITY[error.severity],
-                error.spelling,
-                error.location,
-            ))
+        decl.dump_errors(self.errors, fileobj)
+
+
+# CXChildVisitResult
+CHILD_VISIT_BREAK = 0
+CHILD_VISIT_CONTINUE = 1
 
 
-class AstNode(object):
-    def __init__(self, node, parent=None):
-        self.ptr = node
-        self.parent = parent
+class DeclExtractor(object):
+    """
+    copy the declarations which the generator uses into pypp.decl objects
 
-    def __iter__(self):
-        for child in self.ptr.get_children():
-            yield AstNode(child, self)
+    one extractor is used per translation unit;
+    a cursor reached twice (e.g. as a semantic parent) maps to the same Decl.
+    """
 
-    @property
-    def _fields(self):
-        return []
+    # descended; the children of any other kind are not copied
+    CONTAINER_KINDS = frozenset([
+        decl.CursorKind.TRANSLATION_UNIT,
+        decl.CursorKind.NAMESPACE,
+        decl.CursorKind.UNEXPOSED_DECL,
+        decl.CursorKind.CLASS_DECL,
+        decl.CursorKind.STRUCT_DECL,
+        decl.CursorKind.ENUM_DECL,
+        decl.CursorKind.TYPEDEF_DECL,
+    ])
+    # their children are filtered by the namespace lists
+    NAMESPACE_SCOPE_KINDS = frozenset([
+        decl.CursorKind.TRANSLATION_UNIT,
+        decl.CursorKind.UNEXPOSED_DECL,
+    ])
+    FUNCTION_KINDS = frozenset([
+        decl.CursorKind.FUNCTION_DECL,
+        decl.CursorKind.CXX_METHOD,
+        decl.CursorKind.CONSTRUCTOR,
+        decl.CursorKind.DESTRUCTOR,
+        decl.CursorKind.CONVERSION_FUNCTION,
+    ])
+    METHOD_KINDS = frozenset([
+        decl.CursorKind.CXX_METHOD,
+        decl.CursorKind.CONSTRUCTOR,
+        decl.CursorKind.DESTRUCTOR,
+        decl.CursorKind.CONVERSION_FUNCTION,
+    ])
+    # see Class.is_declaration_part
+    LEXICAL_KINDS = METHOD_KINDS | frozenset([
+        decl.CursorKind.FIELD_DECL,
+        decl.CursorKind.VAR_DECL,
+    ])
+    TYPED_KINDS = frozenset([
+        decl.CursorKind.CLASS_DECL,
+        decl.CursorKind.STRUCT_DECL,
+        decl.CursorKind.FIELD_DECL,
+        decl.CursorKind.VAR_DECL,
+        decl.CursorKind.PARM_DECL,
+        decl.CursorKind.CXX_BASE_SPECIFIER,
+        decl.CursorKind.TYPEDEF_DECL,
+    ])
+    # references, attributes, ...; no parent, type nor location
+    LEAF_KINDS = frozenset([
+        decl.CursorKind.ENUM_CONSTANT_DECL,
+        decl.CursorKind.PARM_DECL,
+        decl.CursorKind.CXX_BASE_SPECIFIER,
+        decl.CursorKind.CXX_ACCESS_SPEC_DECL,
+        decl.CursorKind.UNEXPOSED_ATTR,
+        decl.CursorKind.ANNOTATE_ATTR,
+        decl.CursorKind.TYPE_REF,
+        decl.CursorKind.TEMPLATE_REF,
+        decl.CursorKind.NAMESPACE_REF,
+        decl.CursorKind.OTHER,
+    ])
 
+    # members of their bodies; the semantic parent of a member is its lexical parent
+    CLASS_KINDS = frozenset([
+        decl.CursorKind.CLASS_DECL,
+        decl.CursorKind.STRUCT_DECL,
+    ])
 
-class AstNodeRoot(AstNode):
-    def __init__(self, parser, node, source):
-        super(AstNodeRoot, self).__init__(node)
-        self.parser = parser
-        self.source = source
+    def __init__(self, scope=None):
+        self.scope = scope if scope is not None else ScopeFilter()
+        # cursor_key -> Decl
+        self.decls = {}
+        # Type.data[0] (the clang QualType) -> LazyType
+        self.types = {}
+        self.files = {}
+        self.extracted = set()
+        # one visitor for the children of every argument; get_children creates one per call
+        self.visit_argument_child = clang.cindex.callbacks["cursor_visit"](self.argument_child)
+        self.default_argument = False
 
-    def __iter__(self):
-        for child in self.ptr.get_children():
-            if not self.parser.allow_all and not child.location.file.name.endswith(self.source):
+    def extract_root(self, cursor, children):
+        """TRANSLATION_UNIT Decl with the given top-level cursors only"""
+        root = decl.Decl(decl.CursorKind.TRANSLATION_UNIT, cursor.spelling, hash=cursor.hash)
+        self.remember(cursor, root)
+        root.children = self.extract_children(children, ())
+        return root
+
+    def extract_children(self, children, namespaces):
+        """extract the cursors which are in the namespace scope (see ScopeFilter.namespace_state)"""
+        state = self.scope.namespace_state(namespaces)
+        result = []
+        for child in children:
+            if state == scopes.INSIDE and not self.scope.deny_namespaces:
+                result.append(self.extract_declaration(child, namespaces))
+                continue
+            if self.convert_cursor_kind(child) != decl.CursorKind.NAMESPACE:
+                if state == scopes.INSIDE:
+                    result.append(self.extract_declaration(child, namespaces))
+                # ANCESTOR; the declarations between the allowed namespaces are not bound
                 continue
-            yield AstNode(child)
+            if self.scope.namespace_state(namespaces + (child.spelling,)) != scopes.OUTSIDE:
+                result.append(self.extract_declaration(child, namespaces))
+        return result
+
+    def extract_declaration(self, cursor, namespaces):
+        """a declaration of the namespace scope; only these have a location"""
+        result = self.extract(cursor, namespaces)
+        if result.location is None and result.kind not in self.LEAF_KINDS:
+            result.location = self.convert_location(cursor.location)
+        return result
+
+    def extract(self, cursor, namespaces=(), lexical=None):
+        """
+        `lexical` is the (cursor, Decl) of the class which `cursor` is a child of;
+        its parents are taken from it instead of libclang
+        """
+        result = self.decl(cursor, lexical)
+        if id(result) in self.extracted:
+            return result
+        self.extracted.add(id(result))
+        kind = result.kind
+        if kind in self.FUNCTION_KINDS:
+            result.result_type = self.convert_type(cursor.result_type)
+            result.arguments = [self.argument(x) for x in cursor.get_arguments()]
+            # e.g. __attribute__((annotate("pypp::release_gil"))); see pypp.rules
+            if self.has_attributes(cursor):
+                result.children = [
+                    decl.Decl(decl.CursorKind.ANNOTATE_ATTR, x.spelling) for x in cursor.get_children()
+                    if self.convert_cursor_kind(x) == decl.CursorKind.ANNOTATE_ATTR
+                ]
+        if kind in self.LEXICAL_KINDS:
+            if lexical is not None:
+                result.lexical_parent = lexical[1]
+            else:
+                result.lexical_parent = self.decl(cursor.lexical_parent)
+        if kind == decl.CursorKind.NAMESPACE:
+            namespaces = namespaces + (cursor.spelling,)
+            result.children = self.extract_children(cursor.get_children(), namespaces)
+        elif kind in self.NAMESPACE_SCOPE_KINDS:
+            result.children = self.extract_children(cursor.get_children(), namespaces)
+        elif kind in self.CLASS_KINDS:
+            members = (cursor, result)
+            result.children = [self.extract(x, lexical=members) for x in cursor.get_children()]
+        elif kind in self.CONTAINER_KINDS:
+            result.children = [self.extract(x) for x in cursor.get_children()]
+        return result
+
+    def argument(self, cursor):
+        # neither looked up nor a parent; only the default argument is kept of its children
+        result = decl.Decl(decl.CursorKind.PARM_DECL, cursor.spelling, type=self.convert_type(cursor.type))
+        self.default_argument = False
+        clang.cindex.conf.lib.clang_visitChildren(cursor, self.visit_argument_child, None)
+        if self.default_argument:
+            result.flags |= decl.DEFAULT_ARGUMENT
+        return result
+
+    def argument_child(self, child, parent, data):
+        # the first child which isn't a reference of the type is the default argument (see Function.has_default_value)
+        if self.convert_cursor_kind(child) in NOT_DEFAULT_ARG_KINDS:
+            return CHILD_VISIT_CONTINUE
+        self.default_argument = True
+        return CHILD_VISIT_BREAK
+
+    @classmethod
+    def has_attributes(cls, cursor):
+        """False if `cursor` has no attribute children; clang_Cursor_hasAttrs isn't in older bindings"""
+        has_attrs = getattr(clang.cindex.conf.lib, "clang_Cursor_hasAttrs", None)
+        if has_attrs is None:
+            return True
+        return bool(has_attrs(cursor))
+
+    def decl(self, cursor, lexical=None):
+        if cursor is None:
+            return None
+        found = self.lookup(cursor)
+        if found is not None:
+            return found
+        kind = self.convert_cursor_kind(cursor)
+        result = decl.Decl(
+            kind,
+            cursor.spelling,
+            hash=cursor.hash,
+            access_specifier=self.convert_access_specifier(cursor),
+        )
+        self.remember(cursor, result)
+        if kind in self.TYPED_KINDS:
+            result.type = self.convert_type(cursor.type)
+        if kind in self.METHOD_KINDS:
+            result.flags |= decl.STATIC_METHOD if cursor.is_static_method() else 0
+            result.flags |= decl.CONST_METHOD if cursor.is_const_method() else 0
+            result.flags |= decl.VIRTUAL_METHOD if cursor.is_virtual_method() else 0
+            result.flags |= decl.PURE_VIRTUAL_METHOD if cursor.is_pure_virtual_method() else 0
+        elif kind == decl.CursorKind.ENUM_DECL:
+            result.flags |= decl.SCOPED_ENUM if cursor.is_scoped_enum() else 0
+        if kind not in self.LEAF_KINDS and kind != decl.CursorKind.TRANSLATION_UNIT:
+            if lexical is not None:
+                result.semantic_parent = lexical[1]
+            else:
+                result.semantic_parent = self.decl(cursor.semantic_parent)
+        return result
+
+    def lookup(self, cursor):
+        return self.decls.get(self.cursor_key(cursor))
+
+    def remember(self, cursor, result):
+        self.decls[self.cursor_key(cursor)] = result
+
+    @classmethod
+    def cursor_key(cls, cursor):
+        """
+        the fields which clang_equalCursors compares, without calling it;
+        like there, data[1] of a declaration (the first in its group) is ignored
+        """
+        try:
+            declaration = cursor.kind.is_declaration()
+        except ValueError:
+            declaration = False
+        data = cursor.data
+        return (cursor._kind_id, cursor.xdata, data[0], None if declaration else data[1], data[2])
+
+    @classmethod
+    def convert_cursor_kind(cls, cursor):
+        try:
+            kind = cursor.kind
+        except ValueError:
+            # unknown to these bindings
+            return decl.CursorKind.OTHER
+        return decl.clang_member(decl.CursorKind, kind) or decl.CursorKind.OTHER
+
+    @classmethod
+    def convert_access_specifier(cls, cursor):
+        return decl.clang_member(decl.AccessSpecifier, cursor.access_specifier)
+
+    def convert_type(self, type):
+        # equal types are one QualType in the unit
+        result = self.types.get(type.data[0])
+        if result is None:
+            result = self.types[type.data[0]] = LazyType(type, self.types)
+        return result
+
+    def convert_location(self, location):
+        file = location.file
+        if file is not None:
+            if file.name not in self.files:
+                self.files[file.name] = decl.File(file.name)
+            file = self.files[file.name]
+        return decl.Location(file, location.line, location.column)
+
+
+class LazyType(decl.DeclType):
+    """
+    DeclType of a clang.cindex.Type whose attributes are converted when they are read first
+
+    the generator reads few of the types of a unit besides the spellings of the signatures;
+    the type references its translation unit
+    """
+
+    __slots__ = ("clang_type", "types")
+
+    def __init__(self, clang_type, types):
+        # the slots of DeclType are unset until __getattr__
+        self.clang_type = clang_type
+        # shared by the types of the unit; see DeclExtractor.convert_type
+        self.types = types
+
+    def __getattr__(self, name):
+        type = self.clang_type
+        if name == "spelling":
+            value = type.spelling
+        elif name == "kind":
+            value = self.convert_kind(type)
+        elif name == "const":
+            value = type.is_const_qualified()
+        elif name == "canonical":
+            canonical = type.get_canonical()
+            key = canonical.data[0]
+            if key == type.data[0]:
+                value = None
+            elif key in self.types:
+                value = self.types[key]
+            else:
+                value = self.types[key] = LazyType(canonical, self.types)
+        else:
+            raise AttributeError(name)
+        setattr(self, name, value)
+        return value
+
+    @classmethod
+    def convert_kind(cls, type):
+        try:
+            kind = type.kind
+        except ValueError:
+            return decl.TypeKind.OTHER
+        return decl.clang_member(decl.TypeKind, kind) or decl.TypeKind.OTHER
 
 
 def parse(source, *args, **kwargs):
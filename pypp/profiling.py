@@ -0,0 +1,181 @@
+"""
+wall time, peak memory and counters of one run (see --profile)
+
+the peak memory is the peak of the Python allocations traced by tracemalloc;
+the memory allocated inside libclang isn't included.
+"""
+
+from __future__ import print_function
+
+import json
+import time
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+
+
+class Profile(object):
+    def __init__(self, memory=True):
+        # name -> [seconds, peak bytes or None]
+        self.phases = OrderedDict()
+        self.counters = OrderedDict()
+        self.memory = memory
+        self._tracing = False
+        self._libclang = {}
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+
+    @contextmanager
+    def phase(self, name):
+        """measure the block as the phase `name`; the phases of a name are summed up"""
+        # listed before its parts
+        self.add_time(name, 0.0)
+        if self.memory:
+            tracemalloc.reset_peak()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1] if self.memory else None
+            self.add_time(name, elapsed, peak)
+
+    @contextmanager
+    def timer(self, name):
+        """measure the time of a part of a phase; the peak memory isn't reset"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name, elapsed, peak=None):
+        if name not in self.phases:
+            self.phases[name] = [0.0, None]
+        self.phases[name][0] += elapsed
+        if peak is not None:
+            self.phases[name][1] = max(peak, self.phases[name][1] or 0)
+
+    def elapsed(self, name):
+        return self.phases[name][0] if name in self.phases else 0.0
+
+    def timed(self, name, iterable):
+        """yield the items of `iterable`; the time spent in producing them is the phase `name`"""
+        iterator = iter(iterable)
+        elapsed = 0.0
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    break
+                finally:
+                    elapsed += time.perf_counter() - start
+                yield item
+        finally:
+            self.add_time(name, elapsed)
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def count_generator(self, generator):
+        """the declarations collected by a visited pypp.generator.Generator"""
+        methods = [x for class_ in generator.classes.values() for x in class_.methods.values()]
+        functions = list(generator.functions.values())
+        self.count("classes", len(generator.classes))
+        self.count("methods", sum(len(x.functions) for x in methods))
+        self.count("functions", sum(len(x.functions) for x in functions))
+        self.count("overloads", sum(len(x.functions) for x in methods + functions if len(x.functions) > 1))
+        self.count("enums", len(generator.enums))
+        self.count("dropped methods", sum(len(x.dropped_methods) for x in generator.classes.values()))
+        self.count("pruned declarations", generator.pruned)
+
+    def count_libclang_calls(self):
+        """count the calls into libclang (the ctypes functions behind the cursor and type properties)"""
+        from clang import cindex
+        from .parser import load_libclang
+
+        load_libclang()
+        lib = cindex.conf.lib
+        for item in cindex.functionList:
+            name = item[0]
+            function = lib.__dict__.get(name)
+            if function is None or name in self._libclang:
+                continue
+            self._libclang[name] = function
+            setattr(lib, name, self._counted(function))
+
+    def _counted(self, function):
+        def counted(*args):
+            self.counters["libclang calls"] = self.counters.get("libclang calls", 0) + 1
+            return function(*args)
+        return counted
+
+    def stop(self):
+        """stop tracing and restore the libclang functions"""
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+        if self._libclang:
+            from clang import cindex
+
+            lib = cindex.conf.lib
+            for name, function in self._libclang.items():
+                setattr(lib, name, function)
+            self._libclang = {}
+
+    def to_dict(self):
+        return {
+            "phases": OrderedDict(
+                (name, {"seconds": elapsed, "peak_bytes": peak}) for name, (elapsed, peak) in self.phases.items()
+            ),
+            "counters": self.counters,
+        }
+
+    def dump_json(self, fileobj):
+        json.dump(self.to_dict(), fileobj, indent=2)
+        print(file=fileobj)
+
+    def dump_text(self, fileobj):
+        print("{:<24}{:>10}{:>12}".format("phase", "time", "peak"), file=fileobj)
+        for name, (elapsed, peak) in self.phases.items():
+            peak = "-" if peak is None else "{:.1f}MiB".format(peak / 1024.0 / 1024.0)
+            print("{:<24}{:>9.3f}s{:>12}".format(name, elapsed, peak), file=fileobj)
+        for name, value in self.counters.items():
+            print("{:<24}{:>10}".format(name, value), file=fileobj)
+
+    def dump(self, fileobj, format="text"):
+        if format == "json":
+            self.dump_json(fileobj)
+        else:
+            self.dump_text(fileobj)
+
+
+class NullProfile(object):
+    """the interface of Profile without measuring anything"""
+
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    timer = phase
+
+    def add_time(self, name, elapsed, peak=None):
+        pass
+
+    def elapsed(self, name):
+        return 0.0
+
+    def timed(self, name, iterable):
+        return iterable
+
+    def count(self, name, value=1):
+        pass
+
+    def count_generator(self, generator):
+        pass
+
+
+NULL_PROFILE = NullProfile()
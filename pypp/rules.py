@@ -0,0 +1,204 @@
+"""
+binding rules of the --config file
+
+    [release_gil]
+    names = solve*, mylib::Solver::run
+    namespaces = mylib::compute
+    classes = mylib::Integrator
+
+    [buffer_protocol]
+    names = mylib::Image, Tensor*
+
+    [opaque_containers]
+    types = std::vector<double>, std::map<std::string, *>
+
+    [vectorize]
+    namespaces = mylib::math
+
+the names are fnmatch patterns of qualified (mylib::solve) or plain (solve) names,
+and the classes match their methods. a function or a method can also be annotated:
+
+    __attribute__((annotate("pypp::release_gil"))) double solve(const Problem & problem);
+"""
+
+import fnmatch
+import re
+
+from . import decl
+from .utils import log, split_template_args
+
+
+RELEASE_GIL_SECTION = "release_gil"
+RELEASE_GIL_ANNOTATION = "pypp::release_gil"
+BUFFER_PROTOCOL_SECTION = "buffer_protocol"
+OPAQUE_CONTAINERS_SECTION = "opaque_containers"
+VECTORIZE_SECTION = "vectorize"
+SECTIONS = [RELEASE_GIL_SECTION, BUFFER_PROTOCOL_SECTION, OPAQUE_CONTAINERS_SECTION, VECTORIZE_SECTION]
+
+# arguments and results which need the GIL
+PYTHON_TYPE_RE = re.compile(r"\b(?:std::function\s*<|pybind11::|boost::python::|PyObject\b|_object\b)")
+
+
+class NameRule(object):
+    """functions and methods selected by name, namespace or class"""
+
+    KEYS = ["names", "namespaces", "classes"]
+
+    def __init__(self, names=(), namespaces=(), classes=()):
+        self.names = list(names)
+        self.namespaces = list(namespaces)
+        self.classes = list(classes)
+
+    def __bool__(self):
+        return bool(self.names or self.namespaces or self.classes)
+
+    def matches(self, qualified_name, class_name=None):
+        plain_name = qualified_name.rsplit("::", 1)[-1]
+        for pattern in self.names:
+            if fnmatch.fnmatchcase(qualified_name, pattern) or fnmatch.fnmatchcase(plain_name, pattern):
+                return True
+        for namespace in self.namespaces:
+            if qualified_name.startswith(namespace + "::"):
+                return True
+        if class_name is not None:
+            return any(fnmatch.fnmatchcase(class_name, x) for x in self.classes)
+        return False
+
+    @classmethod
+    def from_section(cls, section):
+        unknown = [x for x in section if x not in cls.KEYS]
+        if unknown:
+            raise ValueError("unknown key {!r} in [{}] (choose from {})".format(unknown[0], section.name, ", ".join(cls.KEYS)))
+        return cls(**{key: split_list(value) for key, value in section.items()})
+
+
+class ClassRule(NameRule):
+    """classes (or free functions) selected by name or namespace"""
+
+    KEYS = ["names", "namespaces"]
+
+
+class TypeRule(NameRule):
+    """types selected by their canonical spelling (see utils.stl_containers); e.g. std::vector<*>"""
+
+    KEYS = ["types"]
+
+    def __init__(self, types=()):
+        super(TypeRule, self).__init__()
+        self.types = list(types)
+
+    def __bool__(self):
+        return bool(self.types)
+
+    def matches(self, spelling, class_name=None):
+        return any(fnmatch.fnmatchcase(spelling, x) for x in self.types)
+
+
+def split_list(value):
+    """comma or newline separated values; the commas of template arguments don't separate"""
+    return [x for line in value.splitlines() for x in split_template_args(line) if x]
+
+
+def annotations(node):
+    return [x.spelling for x in node.get_children() if x.kind == decl.CursorKind.ANNOTATE_ATTR]
+
+
+class Rules(object):
+    def __init__(self, release_gil=None, buffer_protocol=None, opaque_containers=None, vectorize=None):
+        self.release_gil_rule = release_gil if release_gil is not None else NameRule()
+        self.buffer_protocol_rule = buffer_protocol if buffer_protocol is not None else ClassRule()
+        self.opaque_containers_rule = opaque_containers if opaque_containers is not None else TypeRule()
+        self.vectorize_rule = vectorize if vectorize is not None else ClassRule()
+        self.reset()
+
+    def reset(self):
+        """forget the refusals and warnings of the previous run (see pypp.daemon)"""
+        # qualified name -> reason
+        self.refused = {}
+        self.warned = set()
+
+    def release_gil(self, func, node):
+        """whether the GIL is released while `node` (an overload of the Function `func`) is called"""
+        # get_children() of a live cursor is an iterator, which is always true
+        if RELEASE_GIL_ANNOTATION not in annotations(node):
+            if not self.release_gil_rule or not self.release_gil_rule.matches(func.qualified_name, func.class_name):
+                return False
+        reason = self.release_gil_refusal(func, node)
+        if reason:
+            self.refuse(func.qualified_name, reason)
+            return False
+        return True
+
+    @classmethod
+    def release_gil_refusal(cls, func, node):
+        if func.has_function_pointer(node):
+            return "it takes or returns a function pointer"
+        if any(PYTHON_TYPE_RE.search(x) for x in [func.result_type(node)] + func.arg_types(node)):
+            return "it takes or returns Python objects or callbacks"
+        if node.is_virtual_method():
+            return "it can be overridden in Python"
+        return None
+
+    def refuse(self, name, reason):
+        self.refused[name] = reason
+        self.warn("the GIL isn't released in {}: {}".format(name, reason))
+
+    def buffer_layout(self, class_):
+        """the generator.BufferLayout of `class_` if it is exposed through the buffer protocol"""
+        rule = self.buffer_protocol_rule
+        if not rule or not rule.matches(class_.full_declaration):
+            return None
+        layout = class_.buffer_layout()
+        if layout is None and (class_.full_declaration in rule.names or class_.name in rule.names):
+            self.warn("{} has no data() and size() (or rows() and cols()) accessors of arithmetic elements".format(
+                class_.full_declaration))
+        return layout
+
+    def opaque_containers(self, containers):
+        """the `containers` which are bound by reference instead of converted to lists and dicts"""
+        return [x for x in containers if self.opaque_containers_rule.matches(x)]
+
+    def vectorize(self, func, node):
+        """whether the free function overload `node` of `func` also takes NumPy arrays (pybind11::vectorize)"""
+        if not self.vectorize_rule or not self.vectorize_rule.matches(func.qualified_name):
+            return False
+        return not func.name.startswith("operator") and func.is_scalar_function(node)
+
+    def warn(self, message):
+        """log `message` once"""
+        if message not in self.warned:
+            self.warned.add(message)
+            log.warning(message)
+
+
+def load(path):
+    """Rules of the config file; raises ValueError for an invalid file"""
+    import configparser
+
+    parser = configparser.ConfigParser(interpolation=None)
+    try:
+        with open(path) as fp:
+            parser.read_file(fp)
+    except configparser.Error as e:
+        raise ValueError(str(e))
+    unknown = [x for x in parser.sections() if x not in SECTIONS]
+    if unknown:
+        raise ValueError("unknown section [{}] (choose from {})".format(unknown[0], ", ".join(SECTIONS)))
+    release_gil = None
+    if parser.has_section(RELEASE_GIL_SECTION):
+        release_gil = NameRule.from_section(parser[RELEASE_GIL_SECTION])
+    buffer_protocol = None
+    if parser.has_section(BUFFER_PROTOCOL_SECTION):
+        buffer_protocol = ClassRule.from_section(parser[BUFFER_PROTOCOL_SECTION])
+    opaque_containers = None
+    if parser.has_section(OPAQUE_CONTAINERS_SECTION):
+        opaque_containers = TypeRule.from_section(parser[OPAQUE_CONTAINERS_SECTION])
+    vectorize = None
+    if parser.has_section(VECTORIZE_SECTION):
+        vectorize = ClassRule.from_section(parser[VECTORIZE_SECTION])
+    return Rules(
+        release_gil=release_gil,
+        buffer_protocol=buffer_protocol,
+        opaque_containers=opaque_containers,
+        vectorize=vectorize,
+    )
@@ -0,0 +1,114 @@
+"""
+which declarations are bound
+
+files are compared by identity (resolved real paths), not by name suffix;
+the results are cached per file name, so a translation unit with thousands of
+top-level declarations resolves each file only once.
+"""
+
+import os
+
+
+# ScopeFilter.namespace_state
+OUTSIDE = 0
+ANCESTOR = 1  # only the namespaces on the way to an allowed one are entered
+INSIDE = 2
+
+
+class ScopeFilter(object):
+    def __init__(self, include_path=[], allow_all=False, allow_files=[], deny_files=[],
+                 allow_dirs=[], deny_dirs=[], allow_namespaces=[], deny_namespaces=[], system_headers=False):
+        self._identities = {}
+        self._resolved = {}
+        self._denied = {}
+        self._files = {}
+        self.include_path = include_path
+        self.allow_all = allow_all
+        self.allow_files = set(filter(None, map(self.resolve, allow_files)))
+        self.deny_files = set(filter(None, map(self.resolve, deny_files)))
+        self.allow_dirs = [self.directory(x) for x in allow_dirs]
+        self.deny_dirs = [self.directory(x) for x in deny_dirs]
+        self.allow_namespaces = [tuple(x.strip(":").split("::")) for x in allow_namespaces]
+        self.deny_namespaces = [tuple(x.strip(":").split("::")) for x in deny_namespaces]
+        self.system_headers = system_headers
+
+    @classmethod
+    def directory(cls, path):
+        return os.path.join(os.path.realpath(path), "")
+
+    def identity(self, filename):
+        """real path of a file name reported by libclang"""
+        if filename not in self._identities:
+            self._identities[filename] = os.path.realpath(filename)
+        return self._identities[filename]
+
+    def resolve(self, source):
+        """real path of `source` as `#include "source"` finds it, or None"""
+        if source not in self._resolved:
+            path = None
+            for directory in [""] + list(self.include_path):
+                candidate = os.path.join(directory, source)
+                if os.path.isfile(candidate):
+                    path = os.path.realpath(candidate)
+                    break
+            self._resolved[source] = path
+        return self._resolved[source]
+
+    def match_source(self, filename, sources):
+        """the source which `filename` is, or None"""
+        if filename is None:
+            return None
+        path = self.identity(filename)
+        for source in sources:
+            resolved = self.resolve(source)
+            if resolved is not None:
+                if resolved == path:
+                    return source
+            elif filename.endswith(source):
+                # not on the disk; e.g. an unsaved file
+                return source
+        return None
+
+    def is_denied(self, filename):
+        if filename not in self._denied:
+            path = self.identity(filename)
+            self._denied[filename] = path in self.deny_files or any(path.startswith(x) for x in self.deny_dirs)
+        return self._denied[filename]
+
+    def accepts_file(self, filename, is_system):
+        """
+        whether declarations of a file other than the sources are bound
+
+        `is_system` is called at most once per file
+        """
+        if filename is None:
+            return False
+        if filename not in self._files:
+            self._files[filename] = self._accepts_file(filename, is_system)
+        return self._files[filename]
+
+    def _accepts_file(self, filename, is_system):
+        if self.is_denied(filename):
+            return False
+        path = self.identity(filename)
+        if path in self.allow_files or any(path.startswith(x) for x in self.allow_dirs):
+            return True
+        if not self.allow_all:
+            return False
+        return self.system_headers or not is_system()
+
+    def namespace_state(self, path):
+        """OUTSIDE, ANCESTOR or INSIDE for the namespace names `path` (() is the global scope)"""
+        path = tuple(path)
+        for deny in self.deny_namespaces:
+            if path[:len(deny)] == deny:
+                return OUTSIDE
+        if not self.allow_namespaces:
+            return INSIDE
+        state = OUTSIDE
+        for allow in self.allow_namespaces:
+            if path[:len(allow)] == allow:
+                return INSIDE
+            if allow[:len(path)] == path:
+                state = ANCESTOR
+        return state
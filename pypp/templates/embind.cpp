@@ -17,5 +17,6 @@
 {{ decl_code }}
 {% endif %}
 void init_{{ init_name }}() {
-{{ generated }}
+{% for line in generated %}{% if not loop.first %}
+{% endif %}{{ line }}{% endfor %}
 }
@@ -18,5 +18,6 @@
 {{ decl_code }}
 {% endif %}
 void init_{{ init_name }}(pybind11::module scope) {
-{{ generated }}
+{% for line in generated %}{% if not loop.first %}
+{% endif %}{{ line }}{% endfor %}
 }
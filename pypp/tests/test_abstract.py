@@ -0,0 +1,51 @@
+from .. import decl
+from ..abstract import NodeVisitor
+from ..node import AstNode
+
+
+def make_decl(kind, spelling, children=()):
+    node = decl.Decl(kind, spelling)
+    node.children = list(children)
+    return node
+
+
+class Recorder(NodeVisitor):
+    prune_kinds = frozenset(["CLASS_TEMPLATE"])
+
+    def __init__(self):
+        self.events = []
+
+    def visit_NAMESPACE(self, node):
+        self.events.append("enter " + node.ptr.spelling)
+        return node
+
+    def leave_NAMESPACE(self, node):
+        self.events.append("leave " + node.ptr.spelling)
+
+    def visit_FUNCTION_DECL(self, node):
+        self.events.append(node.ptr.spelling)
+
+    def visit_CLASS_TEMPLATE(self, node):
+        assert False, "pruned"
+
+
+class TestNodeVisitor:
+    def test_order(self):
+        tree = make_decl(decl.CursorKind.NAMESPACE, "a", [
+            make_decl(decl.CursorKind.FUNCTION_DECL, "f"),
+            make_decl(decl.CursorKind.NAMESPACE, "b", [make_decl(decl.CursorKind.FUNCTION_DECL, "g")]),
+            make_decl(decl.CursorKind.CLASS_TEMPLATE, "T", [make_decl(decl.CursorKind.FUNCTION_DECL, "h")]),
+            make_decl(decl.CursorKind.ENUM_DECL, "E", [make_decl(decl.CursorKind.FUNCTION_DECL, "i")]),
+            make_decl(decl.CursorKind.FUNCTION_DECL, "j"),
+        ])
+        visitor = Recorder()
+        visitor.visit(AstNode(tree))
+        assert visitor.events == ["enter a", "f", "enter b", "g", "leave b", "j", "leave a"]
+
+    def test_deep(self):
+        tree = make_decl(decl.CursorKind.FUNCTION_DECL, "leaf")
+        for i in range(5000):
+            tree = make_decl(decl.CursorKind.NAMESPACE, str(i), [tree])
+        visitor = Recorder()
+        visitor.visit(AstNode(tree))
+        assert visitor.events[5000] == "leaf"
@@ -0,0 +1,30 @@
+import contextlib
+import io
+
+from ..__main__ import create_argument_parser
+from ..batch import collect_inputs, run
+
+
+class TestCollectInputs:
+    def test_order(self):
+        assert collect_inputs(["b.hpp", "a.hpp", "b.hpp"]) == ["b.hpp", "a.hpp"]
+
+    def test_glob(self, tmp_path):
+        for name in ["b.hpp", "a.hpp", "c.cpp"]:
+            (tmp_path / name).write_text("")
+        assert collect_inputs([str(tmp_path / "*.hpp")]) == [str(tmp_path / "a.hpp"), str(tmp_path / "b.hpp")]
+
+    def test_input_list(self, tmp_path):
+        listing = tmp_path / "inputs.txt"
+        listing.write_text("# comment\nx.hpp\n\ny.hpp\n")
+        assert collect_inputs(["w.hpp"], str(listing)) == ["w.hpp", "x.hpp", "y.hpp"]
+
+
+class TestRun:
+    def test_err_at_call_time(self, tmp_path):
+        args = create_argument_parser().parse_args(["x.hpp", "--output-dir", str(tmp_path)])
+        err = io.StringIO()
+        # e.g. the daemon redirecting to the client
+        with contextlib.redirect_stderr(err):
+            assert run(args, ["x.hpp", "x_hpp"]) == 1
+        assert "are generated into the same file" in err.getvalue()
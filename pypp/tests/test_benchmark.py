@@ -0,0 +1,47 @@
+from .. import driver
+from ..benchmark import suite
+from ..benchmark import synthetic
+
+
+class TestSynthetic:
+    def test_shape(self):
+        shape = synthetic.HeaderShape(classes=3, methods=10, overloads=0.5, default_args=0.2, virtuals=0.0,
+                                      enums=2, namespaces=3)
+        source = synthetic.generate(shape)
+        assert source.count("\nclass ") == 3
+        assert source.count("std::vector<std::string> method") == 3 * 5
+        assert source.count("double b = 1.0") == 3 * 2
+        assert "virtual" not in source
+        assert source.count("namespace bench") == 3 * 2
+        assert "enum class Enum1" in source
+        assert "#include <map>" not in source
+        assert synthetic.generate(shape) == source
+
+    def test_spread(self):
+        assert [synthetic.spread(i, 0.25) for i in range(8)].count(True) == 2
+        assert not any(synthetic.spread(i, 0.0) for i in range(8))
+
+
+class TestCompare:
+    def test_threshold(self):
+        baseline = {
+            "parse": {"seconds": 1.0, "peak_bytes": 1000},
+            "visit": {"seconds": 0.001, "peak_bytes": None},
+        }
+        current = {
+            "parse": {"seconds": 1.1, "peak_bytes": 1500},
+            "visit": {"seconds": 0.004, "peak_bytes": None},
+        }
+        assert suite.compare(baseline, current, 0.2) == ["parse peak: 1000 -> 1500 bytes"]
+        assert suite.compare(baseline, current, 0.05) == ["parse: 1.000s -> 1.100s", "parse peak: 1000 -> 1500 bytes"]
+
+
+class TestBaseline:
+    def test_packaged(self):
+        # measured with the default options of `python -m pypp.benchmark`
+        baseline = suite.load(suite.DEFAULT_BASELINE)
+        shape = synthetic.HeaderShape().to_dict()
+        shape["backends"] = list(driver.BACKENDS)
+        shape["arguments"] = []
+        assert baseline["shape"] == shape
+        assert set(baseline["phases"]) == {"cold start", "parse", "visit"} | {"render " + x for x in driver.BACKENDS}
@@ -0,0 +1,62 @@
+import json
+import os
+
+from ..cache import CACHE_VERSION, TranslationUnitCache
+from ..depend import fingerprint
+
+
+def make_manifest(path):
+    return {"dependencies": fingerprint([str(path)])}
+
+
+class TestTranslationUnitCache:
+    def test_key(self, tmp_path):
+        cache = TranslationUnitCache(str(tmp_path))
+        assert cache.key("a.hpp", ["-Ifoo"]) == cache.key("a.hpp", ["-Ifoo"])
+        assert cache.key("a.hpp", ["-Ifoo"]) != cache.key("a.hpp", ["-Ibar"])
+
+    def test_fresh(self, tmp_path):
+        header = tmp_path / "a.hpp"
+        header.write_text("int a();")
+        cache = TranslationUnitCache(str(tmp_path / "cache"))
+        manifest = make_manifest(header)
+        assert cache._is_fresh(manifest)
+        # touched only
+        os.utime(str(header), ns=(0, 0))
+        assert cache._is_fresh(manifest)
+        header.write_text("int b();")
+        assert not cache._is_fresh(manifest)
+        header.unlink()
+        assert not cache._is_fresh(manifest)
+
+    def test_evict(self, tmp_path):
+        cache = TranslationUnitCache(str(tmp_path), max_size=10)
+        for i, key in enumerate(["old", "new"]):
+            with open(cache.ast_path(key), "w") as fp:
+                fp.write("x" * 8)
+            os.utime(cache.ast_path(key), (i, i))
+        cache.evict()
+        assert not os.path.exists(cache.ast_path("old"))
+        assert os.path.exists(cache.ast_path("new"))
+
+    def test_evict_prelude(self, tmp_path):
+        cache = TranslationUnitCache(str(tmp_path), max_size=10)
+        for i, key in enumerate(["old", "new"]):
+            for path in [cache.ast_path(key), cache.prelude_path(key)]:
+                with open(path, "w") as fp:
+                    fp.write("x" * 4)
+            os.utime(cache.ast_path(key), (i, i))
+        # 16 bytes with the preludes
+        cache.evict()
+        assert not os.path.exists(cache.prelude_path("old"))
+        assert os.path.exists(cache.prelude_path("new"))
+
+    def test_dependencies(self, tmp_path):
+        header = tmp_path / "a.hpp"
+        header.write_text("int a();")
+        cache = TranslationUnitCache(str(tmp_path / "cache"))
+        assert cache.dependencies("key") == []
+        open(cache.ast_path("key"), "w").close()
+        with open(cache.manifest_path("key"), "w") as fp:
+            json.dump(dict(make_manifest(header), version=CACHE_VERSION), fp)
+        assert cache.dependencies("key") == [str(header)]
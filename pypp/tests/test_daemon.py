@@ -0,0 +1,81 @@
+import argparse
+import os
+import socket
+import stat
+import tempfile
+from collections import OrderedDict
+
+import pytest
+
+from ..daemon import MAX_PARSERS, Session, default_socket_path, is_listening
+
+
+class TestSocket:
+    def test_is_listening(self, tmp_path):
+        path = str(tmp_path / "pypp.sock")
+        assert not is_listening(path)
+        server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            server.bind(path)
+            # a stale socket file
+            assert not is_listening(path)
+            server.listen(1)
+            assert is_listening(path)
+        finally:
+            server.close()
+
+    def test_default_path(self, tmp_path, monkeypatch):
+        monkeypatch.setenv("XDG_RUNTIME_DIR", str(tmp_path))
+        assert default_socket_path() == str(tmp_path / "pypp.sock")
+        monkeypatch.delenv("XDG_RUNTIME_DIR")
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+        path = default_socket_path()
+        assert os.path.dirname(path) == str(tmp_path / "pypp-{}".format(os.getuid()))
+        assert stat.S_IMODE(os.stat(os.path.dirname(path)).st_mode) == 0o700
+        # shared with other users
+        os.chmod(os.path.dirname(path), 0o777)
+        with pytest.raises(OSError):
+            default_socket_path()
+
+
+class Driver(object):
+    def __init__(self):
+        self.resets = 0
+
+    def create_parser(self, args):
+        return argparse.Namespace(args=args)
+
+    def reset_rules(self):
+        self.resets += 1
+
+
+def parser_args(include_path):
+    return argparse.Namespace(
+        headers=[], include_path=include_path, defines=[], allow_all=False, allow_system_headers=False,
+        allow_file=[], allow_dir=[], deny_file=[], deny_dir=[], allow_namespace=[], deny_namespace=[],
+        using_gcc_version=None, pch=None, precompile_headers=False)
+
+
+class TestSession:
+    def make_session(self):
+        session = Session.__new__(Session)
+        session.driver = Driver()
+        session.parsers = OrderedDict()
+        return session
+
+    def test_parsers_lru(self):
+        session = self.make_session()
+        first = session.parser(parser_args(["0"]))
+        for i in range(1, MAX_PARSERS):
+            session.parser(parser_args([str(i)]))
+        # used again; the second is the least recently used one
+        assert session.parser(parser_args(["0"])) is first
+        session.parser(parser_args(["new"]))
+        assert len(session.parsers) == MAX_PARSERS
+        assert session.parser(parser_args(["0"])) is first
+        assert not any(key[2] == ("1",) for key in session.parsers)
+
+    def test_reset(self):
+        session = self.make_session()
+        session.reset()
+        assert session.driver.resets == 1
@@ -0,0 +1,45 @@
+from clang import cindex
+
+from .. import decl
+from ..constants import NOT_DEFAULT_ARG_KINDS
+
+
+class TestDecl:
+    def test_convert_kind(self):
+        assert decl.convert_kind(decl.CursorKind, "CXX_METHOD") == decl.CursorKind.CXX_METHOD
+        assert decl.convert_kind(decl.CursorKind, "LAMBDA_EXPR") == decl.CursorKind.OTHER
+
+    def test_canonical(self):
+        canonical = decl.DeclType("unsigned long", decl.TypeKind.ULONG)
+        type = decl.DeclType("std::size_t", decl.TypeKind.TYPEDEF, canonical=canonical)
+        assert type.get_canonical() is canonical
+        assert canonical.get_canonical() is canonical
+
+    def test_flags(self):
+        node = decl.Decl(decl.CursorKind.CXX_METHOD, "f", flags=decl.STATIC_METHOD | decl.CONST_METHOD)
+        assert node.is_static_method()
+        assert node.is_const_method()
+        assert not node.is_virtual_method()
+        assert not node.is_pure_virtual_method()
+
+    def test_live_enums(self):
+        # the values of live cursors
+        assert cindex.CursorKind.CXX_METHOD == decl.CursorKind.CXX_METHOD
+        assert decl.CursorKind.CXX_METHOD == cindex.CursorKind.CXX_METHOD
+        assert cindex.CursorKind.CXX_METHOD != decl.CursorKind.FUNCTION_DECL
+        assert cindex.TypeKind.POINTER == decl.TypeKind.POINTER
+        assert cindex.AccessSpecifier.PRIVATE == decl.AccessSpecifier.PRIVATE
+        assert cindex.CursorKind.TYPE_REF in NOT_DEFAULT_ARG_KINDS
+        assert cindex.CursorKind.CALL_EXPR not in NOT_DEFAULT_ARG_KINDS
+        # same name, other enumeration
+        assert decl.CursorKind.OTHER != decl.TypeKind.OTHER
+        assert cindex.TypeKind.INVALID != decl.AccessSpecifier.INVALID
+
+    def test_clang_member(self):
+        for _ in range(2):
+            # converted once, then looked up
+            assert decl.clang_member(decl.CursorKind, cindex.CursorKind.CXX_METHOD) is decl.CursorKind.CXX_METHOD
+            assert decl.CursorKind.CXX_METHOD == cindex.CursorKind.CXX_METHOD
+            assert decl.CursorKind.FUNCTION_DECL != cindex.CursorKind.CXX_METHOD
+            assert decl.clang_member(decl.CursorKind, cindex.CursorKind.LAMBDA_EXPR) is None
+            assert decl.CursorKind.OTHER != cindex.CursorKind.LAMBDA_EXPR
@@ -0,0 +1,43 @@
+import argparse
+
+from .. import depend
+from ..depend import escape_make, write_depfile, write_manifest, is_up_to_date
+
+
+class TestDepfile:
+    def test_escape(self):
+        assert escape_make("a b/$x#.h") == "a\\ b/$$x\\#.h"
+
+    def test_write(self, tmp_path):
+        path = tmp_path / "out.cpp.d"
+        write_depfile(str(path), "out.cpp", ["a.hpp", "b.hpp"])
+        assert path.read_text() == "out.cpp: \\\n a.hpp \\\n b.hpp\n"
+
+
+class TestManifest:
+    def test_up_to_date(self, tmp_path):
+        header = tmp_path / "a.hpp"
+        header.write_text("int a();")
+        output = tmp_path / "a.cpp"
+        output.write_text("")
+        args = argparse.Namespace(generate_boost=False, jobs=1)
+        write_manifest(args, str(header), str(output), [str(header)])
+        assert is_up_to_date(args, str(header), str(output))
+        # options which don't change the output
+        assert is_up_to_date(argparse.Namespace(generate_boost=False, jobs=4), str(header), str(output))
+        assert not is_up_to_date(argparse.Namespace(generate_boost=True, jobs=1), str(header), str(output))
+        header.write_text("int b();")
+        assert not is_up_to_date(args, str(header), str(output))
+
+    def test_tool_versions(self, tmp_path, monkeypatch):
+        header = tmp_path / "a.hpp"
+        header.write_text("int a();")
+        output = tmp_path / "a.cpp"
+        output.write_text("")
+        args = argparse.Namespace(generate_boost=False, jobs=1)
+        monkeypatch.setattr(depend, "_tool_versions", ["1.0.0", ["/usr/lib/libclang.so.11", 1, 2]])
+        write_manifest(args, str(header), str(output), [str(header)])
+        assert is_up_to_date(args, str(header), str(output))
+        # an upgraded libclang
+        monkeypatch.setattr(depend, "_tool_versions", ["1.0.0", ["/usr/lib/libclang.so.12", 1, 2]])
+        assert not is_up_to_date(args, str(header), str(output))
@@ -0,0 +1,80 @@
+import argparse
+
+import pytest
+
+from ..depend import depfile_path, write_manifest
+from ..driver import create_environment, is_up_to_date, output_paths, parse_backends, positive_int
+from ..option import GeneratorType
+
+
+def make_args(**kwargs):
+    options = dict(generate=None, generate_boost=False, generate_embind=False)
+    options.update(kwargs)
+    return argparse.Namespace(**options)
+
+
+class TestOutputPaths:
+    def test_single(self):
+        assert output_paths(make_args(generate_boost=True), "out/a.cpp") == [(GeneratorType.Boost, "out/a.cpp")]
+        assert output_paths(make_args(generate=["embind"]), "out/a.cpp") == [(GeneratorType.Embind, "out/a.cpp")]
+
+    def test_several(self):
+        args = make_args(generate=parse_backends("boost,pybind11,boost"))
+        assert output_paths(args, "out/a.cpp") == [
+            (GeneratorType.Boost, "out/a.boost.cpp"),
+            (GeneratorType.Pybind11, "out/a.pybind11.cpp"),
+        ]
+
+    def test_unknown(self):
+        with pytest.raises(argparse.ArgumentTypeError):
+            parse_backends("pybind11,swig")
+
+
+class TestIsUpToDate:
+    def test_depfile(self, tmp_path):
+        header = tmp_path / "a.hpp"
+        header.write_text("int a();")
+        output = tmp_path / "a.cpp"
+        output.write_text("")
+        args = make_args(shards=1, build_fragment=None, depfile=False)
+        write_manifest(args, str(header), str(output), [str(header)])
+        assert is_up_to_date(args, str(header), str(output))
+        # --depfile added since the last run
+        args.depfile = True
+        assert not is_up_to_date(args, str(header), str(output))
+        open(depfile_path(str(output)), "w").close()
+        assert is_up_to_date(args, str(header), str(output))
+
+
+class TestPositiveInt:
+    def test_values(self):
+        assert positive_int("4") == 4
+        for value in ["0", "-1", "x"]:
+            with pytest.raises(argparse.ArgumentTypeError):
+                positive_int(value)
+
+
+class TestEnvironment:
+    def test_template_dir(self, tmp_path):
+        templates = tmp_path / "templates"
+        templates.mkdir()
+        (templates / "boost.cpp").write_text("custom {{ input }}")
+        env = create_environment(template_dir=str(templates), cache_dir=str(tmp_path / "cache"))
+        assert env.get_template("boost.cpp").render(input="a.hpp") == "custom a.hpp"
+        # falls back to the built-in templates
+        assert "pybind11" in env.get_template("pybind11.cpp").render(input="a.hpp")
+
+    def test_bytecode_cache(self, tmp_path):
+        cache = tmp_path / "cache"
+        create_environment(cache_dir=str(cache)).get_template("embind.cpp")
+        assert len(list(cache.iterdir())) == 1
+        template = create_environment(cache_dir=str(cache)).get_template("embind.cpp")
+        assert "emscripten" in template.render(input="a.hpp")
+
+    def test_unwritable_cache(self, tmp_path):
+        cache = tmp_path / "cache"
+        env = create_environment(cache_dir=str(cache))
+        # the bytecode can't be written any more (like a read-only directory)
+        cache.rmdir()
+        template = env.get_template("embind.cpp")
+        assert "emscripten" in template.render(input="a.hpp")
@@ -0,0 +1,45 @@
+from .. import fragment
+from ..option import GeneratorType
+
+
+class TestEscape:
+    def test_cmake(self):
+        assert fragment.escape_cmake('a "b" ${c}\\') == '"a \\"b\\" \\${c}\\\\"'
+
+    def test_ninja(self):
+        assert fragment.escape_ninja("c:/a b/$x.cpp") == "c$:/a$ b/$$x.cpp"
+
+
+class TestWrite:
+    def write(self, tmp_path, format):
+        output = str(tmp_path / "a.cpp")
+        fragment.write(
+            format,
+            output,
+            name="a_hpp_boost",
+            type=GeneratorType.Boost,
+            input="a.hpp",
+            sources=[output, str(tmp_path / "a.shard0.cpp")],
+            headers=[],
+            include_path=[str(tmp_path / "include")],
+            defines=["X=1"],
+        )
+        return (tmp_path / ("a.cpp." + format)).read_text()
+
+    def test_pch(self, tmp_path):
+        self.write(tmp_path, "cmake")
+        lines = (tmp_path / "a.cpp.pch.hpp").read_text().splitlines()
+        assert "#include <boost/python.hpp>" in lines
+        assert lines[-1] == '#include "a.hpp"'
+
+    def test_cmake(self, tmp_path):
+        text = self.write(tmp_path, "cmake")
+        assert 'set(A_HPP_BOOST_SOURCES\n    "{0}/a.cpp"\n    "{0}/a.shard0.cpp"\n)'.format(tmp_path) in text
+        assert 'set(A_HPP_BOOST_COMPILE_DEFINITIONS\n    "X=1"\n)' in text
+        assert 'set(A_HPP_BOOST_PRECOMPILE_HEADERS\n    "{}/a.cpp.pch.hpp"\n)'.format(tmp_path) in text
+
+    def test_ninja(self, tmp_path):
+        text = self.write(tmp_path, "ninja")
+        assert "pypp_flags = -I{}/include -DX=1\n".format(tmp_path) in text
+        assert "build {0}/a.shard0.cpp.o: pypp_cxx {0}/a.shard0.cpp | {0}/a.cpp.pch.hpp.gch\n".format(tmp_path) in text
+        assert "build a_hpp_boost: phony {0}/a.cpp.o {0}/a.shard0.cpp.o\n".format(tmp_path) in text
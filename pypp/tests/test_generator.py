@@ -0,0 +1,151 @@
+from .. import decl
+from .. import utils
+from ..builder.base import ModuleBuilder
+from ..generator import Function, Generator, bases_first
+from ..node import AstNode
+
+
+class Option(object):
+    """GeneratorOption of the entities below"""
+
+    def __init__(self, name):
+        self.name = name
+        self.module = ModuleBuilder(self)
+
+    def __str__(self):
+        return self.name
+
+
+class Entity(object):
+    def __init__(self, name):
+        self.name = name
+
+    def to_code_block(self, opt):
+        return utils.CodeBlock([
+            "{}.def({});".format(opt, self.name),
+            utils.CodeBlock(["// " + self.name, ""]),
+        ])
+
+
+def make_generator(build_jobs):
+    generator = Generator(build_jobs=build_jobs)
+    for i in range(7):
+        generator.classes["C{}".format(i)] = Entity("C{}".format(i))
+    for i in range(5):
+        generator.functions["f{}".format(i)] = Entity("f{}".format(i))
+    generator.enums["E"] = Entity("E")
+    return generator
+
+
+class TestBuild:
+    def test_parallel_order(self):
+        serial = make_generator(1).build(Option("m"))
+        assert serial.startswith("    m.def(C0);\n        // C0\n\n")
+        assert serial.endswith("    m.def(E);\n        // E\n")
+        assert make_generator(3).build(Option("m")) == serial
+        assert make_generator(32).build(Option("m")) == serial
+
+    def test_iter_build(self):
+        generator = make_generator(1)
+        assert "\n".join(generator.iter_build(Option("m"))) == generator.build(Option("m"))
+        assert list(Generator().iter_build(Option("m"))) == []
+
+
+def make_struct():
+    """struct A { int x; static_assert(sizeof(int) == 4, "x"); };"""
+    root = decl.Decl(decl.CursorKind.TRANSLATION_UNIT, "a.hpp")
+    struct = decl.Decl(decl.CursorKind.STRUCT_DECL, "A", type=decl.DeclType("A", decl.TypeKind.RECORD))
+    struct.semantic_parent = root
+    field = decl.Decl(decl.CursorKind.FIELD_DECL, "x", access_specifier=decl.AccessSpecifier.PUBLIC,
+                      type=decl.DeclType("int", decl.TypeKind.INT))
+    field.semantic_parent = struct
+    # static_assert has no access specifier
+    assertion = decl.Decl(decl.CursorKind.OTHER, "")
+    assertion.semantic_parent = struct
+    struct.children = [field, assertion]
+    root.children = [struct]
+    return root
+
+
+class TestVisit:
+    def test_trailing_static_assert(self):
+        generator = Generator()
+        generator.visit(AstNode(make_struct()))
+        # handled as a forward declaration, without visiting the members
+        assert list(generator.classes) == []
+        assert generator.class_forward_declarations == ["A"]
+
+
+class Cursor(object):
+    """a live cursor, which has no signature slot"""
+    __slots__ = ("result_type", "arguments")
+
+    def __init__(self, result_type, arg_types):
+        self.result_type = decl.DeclType(result_type, decl.TypeKind.OTHER)
+        self.arguments = [decl.Decl(decl.CursorKind.PARM_DECL, "a", type=decl.DeclType(x, decl.TypeKind.OTHER))
+                          for x in arg_types]
+
+    def get_arguments(self):
+        return self.arguments
+
+
+class TestSignature:
+    def test_live_cursor(self):
+        cursor = Cursor("std::size_t", ["const std::basic_string<char> &"])
+        assert Function.result_type(cursor) == "std::size_t"
+        assert Function.arg_types(cursor) == ["const std::string &"]
+        assert not Function.has_pointer_arg_ret(cursor)
+
+    def test_default_argument(self):
+        arg = decl.Decl(decl.CursorKind.PARM_DECL, "x", flags=decl.DEFAULT_ARGUMENT)
+        assert Function.has_default_value(arg)
+        arg.flags = 0
+        assert not Function.has_default_value(arg)
+
+
+class Type(object):
+    def __init__(self, spelling):
+        self.spelling = spelling
+
+    def get_canonical(self):
+        return self
+
+
+class Base(object):
+    def __init__(self, spelling):
+        self.type = Type(spelling)
+
+
+class Class(Entity):
+    def __init__(self, name, bases=()):
+        super(Class, self).__init__(name)
+        self.decl = self.full_declaration = "ns::" + name
+        self.bases = [Base("ns::" + x) for x in bases]
+
+
+class Enum(Entity):
+    def __init__(self, name, scope):
+        super(Enum, self).__init__(name)
+        self.scope = scope
+
+    def has_decl_code(self, opt=None):
+        return False
+
+
+class TestShards:
+    def make_generator(self):
+        generator = Generator()
+        for class_ in [Class("D", ["B", "A"]), Class("A"), Class("B", ["A"]), Class("C")]:
+            generator.classes[class_.name] = class_
+        generator.functions["f"] = Entity("f")
+        generator.enums["E"] = Enum("E", "ns")
+        generator.enums["D::Mode"] = Enum("Mode", "ns::D")
+        return generator
+
+    def test_bases_first(self):
+        classes = list(self.make_generator().classes.values())
+        assert [x.name for x in bases_first(classes)] == ["A", "B", "D", "C"]
+
+    def test_groups(self):
+        groups = self.make_generator().shard_groups()
+        assert [[x.name for x in group] for group in groups] == [["A"], ["B"], ["D", "Mode"], ["C"], ["f"], ["E"]]
@@ -0,0 +1,56 @@
+import pytest
+
+from .. import decl
+from .. import ir
+
+
+def make_root():
+    root = decl.Decl(decl.CursorKind.TRANSLATION_UNIT, "<entrypoint>.cpp")
+    canonical = decl.DeclType("int", decl.TypeKind.INT)
+    alias = decl.DeclType("my_int", decl.TypeKind.TYPEDEF, canonical=canonical)
+    clss = decl.Decl(decl.CursorKind.CLASS_DECL, "Calc", hash=7, type=decl.DeclType("Calc", decl.TypeKind.RECORD))
+    clss.semantic_parent = root
+    method = decl.Decl(decl.CursorKind.CXX_METHOD, "add", access_specifier=decl.AccessSpecifier.PUBLIC,
+                       result_type=alias, flags=decl.STATIC_METHOD,
+                       location=decl.Location(decl.File("calc.hpp"), 3, 5))
+    method.semantic_parent = clss
+    method.lexical_parent = clss
+    method.arguments = [
+        decl.Decl(decl.CursorKind.PARM_DECL, "x", type=alias),
+        # equal to alias
+        decl.Decl(decl.CursorKind.PARM_DECL, "y", type=decl.DeclType("my_int", decl.TypeKind.TYPEDEF, canonical=canonical),
+                  flags=decl.DEFAULT_ARGUMENT),
+    ]
+    clss.children = [method]
+    root.children = [clss]
+    return root
+
+
+class TestIr:
+    def test_roundtrip(self, tmp_path):
+        path = str(tmp_path / "calc.ir.json")
+        error = decl.Diagnostic(3, "oops", decl.Location(decl.File("calc.hpp"), 1, 2), "calc.hpp:1:2: error: oops")
+        ir.dump(path, "calc.hpp", make_root(), [error])
+
+        unit = ir.load(path)
+        assert unit.source == "calc.hpp"
+        assert str(unit.errors[0]) == "calc.hpp:1:2: error: oops"
+        clss = unit.root.children[0]
+        method = clss.children[0]
+        assert clss.hash == 7
+        assert method.semantic_parent is clss
+        assert method.is_static_method()
+        assert method.access_specifier == decl.AccessSpecifier.PUBLIC
+        assert method.result_type.get_canonical().spelling == "int"
+        # interned types stay shared
+        assert method.arguments[0].type is method.result_type
+        assert method.arguments[1].type is method.result_type
+        assert method.arguments[1].flags == decl.DEFAULT_ARGUMENT
+        assert method.location.file.name == "calc.hpp"
+        assert [x.ptr.spelling for x in unit.parse("calc.hpp")] == ["Calc"]
+
+    def test_version(self, tmp_path):
+        path = tmp_path / "old.ir.json"
+        path.write_text('{"version": 0}')
+        with pytest.raises(ValueError):
+            ir.load(str(path))
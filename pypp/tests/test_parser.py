@@ -0,0 +1,34 @@
+from .. import decl
+from ..parser import ENTRYPOINT, AstParser
+
+
+class UmbrellaParser(object):
+    """the state of AstParser after parse_umbrella of a.hpp, b.hpp and c.hpp"""
+
+    partition_errors = AstParser.partition_errors
+
+    def __init__(self, errors):
+        self.errors = errors
+        self.entrypoint_includes = ["a.hpp", "b.hpp", "c.hpp"]
+
+    def dependencies(self, source):
+        return {"a.hpp": ["a.hpp", "common.hpp"], "b.hpp": ["b.hpp", "common.hpp"], "c.hpp": ["c.hpp"]}[source]
+
+
+def make_error(name, line=1):
+    location = decl.Location(decl.File(name) if name else None, line, 1)
+    return decl.Diagnostic(4, "error", location, "{}:{}:1: error".format(name, line))
+
+
+class TestUmbrellaErrors:
+    def test_partition(self):
+        own, shared, missing, unknown = [
+            make_error("./b.hpp"),
+            make_error("common.hpp"),
+            make_error(ENTRYPOINT, line=3),
+            make_error(None),
+        ]
+        errors = UmbrellaParser([own, shared, missing, unknown]).partition_errors(["a.hpp", "b.hpp", "c.hpp"])
+        assert errors["a.hpp"] == [shared, unknown]
+        assert errors["b.hpp"] == [own, shared, unknown]
+        assert errors["c.hpp"] == [missing, unknown]
@@ -0,0 +1,43 @@
+import io
+import json
+
+from ..profiling import Profile, NULL_PROFILE
+
+
+class TestProfile:
+    def test_phases(self):
+        profile = Profile(memory=False)
+        with profile.phase("render"):
+            with profile.timer("render: decl_code"):
+                pass
+            assert list(profile.timed("render: build", [1, 2, 3])) == [1, 2, 3]
+        profile.count("classes", 2)
+        profile.count("classes")
+        assert list(profile.phases) == ["render", "render: decl_code", "render: build"]
+        assert profile.phases["render"][1] is None
+        assert profile.counters["classes"] == 3
+
+    def test_memory(self):
+        profile = Profile()
+        try:
+            with profile.phase("parse"):
+                data = [0] * 100000
+            assert profile.phases["parse"][1] >= len(data) * 8
+        finally:
+            profile.stop()
+
+    def test_json(self):
+        profile = Profile(memory=False)
+        profile.add_time("visit", 0.5)
+        profile.count("enums", 1)
+        fp = io.StringIO()
+        profile.dump(fp, "json")
+        data = json.loads(fp.getvalue())
+        assert data["phases"]["visit"] == {"seconds": 0.5, "peak_bytes": None}
+        assert data["counters"] == {"enums": 1}
+
+    def test_null(self):
+        with NULL_PROFILE.phase("parse"):
+            pass
+        items = [1]
+        assert NULL_PROFILE.timed("build", items) is items
@@ -0,0 +1,175 @@
+import pytest
+
+from .. import decl
+from ..generator import Class, Function, Generator
+from ..option import GeneratorOption, GeneratorType
+from ..rules import ClassRule, NameRule, Rules, TypeRule, RELEASE_GIL_ANNOTATION, load
+
+
+def make_function(name, arg_types=("int",), annotations=(), result_type="int"):
+    node = decl.Decl(decl.CursorKind.FUNCTION_DECL, name, result_type=decl.DeclType(result_type, decl.TypeKind.OTHER))
+    node.arguments = [
+        decl.Decl(decl.CursorKind.PARM_DECL, "a{}".format(i), type=decl.DeclType(x, decl.TypeKind.OTHER))
+        for i, x in enumerate(arg_types)
+    ]
+    node.children = [decl.Decl(decl.CursorKind.ANNOTATE_ATTR, x) for x in annotations]
+    func = Function(name, namespaces=["lib"])
+    func.add_function(node)
+    return func
+
+
+class TestNameRule:
+    def test_matches(self):
+        rule = NameRule(names=["solve*", "lib::Solver::run"], namespaces=["lib::compute"], classes=["lib::Integrator"])
+        assert rule.matches("lib::solve_all")
+        assert rule.matches("solve")
+        assert rule.matches("lib::Solver::run")
+        assert not rule.matches("lib::Solver::reset")
+        assert rule.matches("lib::compute::step")
+        assert not rule.matches("lib::computer::step")
+        assert rule.matches("lib::Integrator::reset", class_name="lib::Integrator")
+
+    def test_load(self, tmp_path):
+        path = tmp_path / "pypp.ini"
+        path.write_text("[release_gil]\nnames = solve, lib::Solver::*\nnamespaces =\n    lib::compute\n")
+        rule = load(str(path)).release_gil_rule
+        assert rule.names == ["solve", "lib::Solver::*"]
+        assert rule.namespaces == ["lib::compute"]
+        path.write_text("[release_gil]\nfunctions = solve\n")
+        with pytest.raises(ValueError):
+            load(str(path))
+        path.write_text("[release-gil]\n")
+        with pytest.raises(ValueError):
+            load(str(path))
+
+
+class TestReleaseGil:
+    def test_rule(self):
+        rules = Rules(release_gil=NameRule(names=["solve"]))
+        assert rules.release_gil(make_function("solve"), make_function("solve").functions[0])
+        func = make_function("other")
+        assert not rules.release_gil(func, func.functions[0])
+
+    def test_annotation(self):
+        func = make_function("other", annotations=[RELEASE_GIL_ANNOTATION])
+        assert Rules().release_gil(func, func.functions[0])
+
+    def test_live_cursor(self):
+        class Cursor(object):
+            # get_children() of clang.cindex is a generator
+            def __init__(self, node):
+                self.node = node
+
+            def get_children(self):
+                return iter(self.node.children)
+
+            def __getattr__(self, name):
+                return getattr(self.node, name)
+
+        func = make_function("other", annotations=[RELEASE_GIL_ANNOTATION])
+        assert Rules().release_gil(func, Cursor(func.functions[0]))
+        func = make_function("other")
+        assert not Rules().release_gil(func, Cursor(func.functions[0]))
+
+    def test_refused(self):
+        rules = Rules(release_gil=NameRule(names=["*"]))
+        for arg_type in ["std::function<void (int)>", "pybind11::object", "_object *"]:
+            func = make_function("callback", arg_types=[arg_type])
+            assert not rules.release_gil(func, func.functions[0])
+        assert "lib::callback" in rules.refused
+        # the next daemon request warns again
+        rules.reset()
+        assert not rules.refused and not rules.warned
+
+    def test_builders(self):
+        rules = Rules(release_gil=NameRule(names=["solve"]))
+        func = make_function("solve")
+        option = GeneratorOption(type=GeneratorType.Pybind11, rules=rules)
+        assert func.to_code_block(option) == [
+            'scope.def("solve", &lib::solve, pybind11::call_guard<pybind11::gil_scoped_release>());',
+        ]
+        assert not func.has_decl_code(option)
+        option = GeneratorOption(type=GeneratorType.Boost, rules=rules)
+        assert func.to_code_block(option) == ['boost::python::def("solve", &lib_solve_release_gil0);']
+        assert func.has_decl_code(option)
+        assert func.decl_code(option).to_code()[0] == "static int lib_solve_release_gil0(int a0) {"
+
+
+def make_class(name, accessors):
+    """a class of methods without arguments; `accessors` is [(name, result type)]"""
+    class_ = Class(name, full_declaration="lib::" + name)
+    parent = decl.Decl(decl.CursorKind.CLASS_DECL, name, type=decl.DeclType(name, decl.TypeKind.RECORD))
+    for method, result_type in accessors:
+        node = decl.Decl(decl.CursorKind.CXX_METHOD, method, access_specifier=decl.AccessSpecifier.PUBLIC,
+                         result_type=decl.DeclType(result_type, decl.TypeKind.OTHER))
+        node.semantic_parent = node.lexical_parent = parent
+        class_.add_method(node)
+    return class_
+
+
+class TestBufferProtocol:
+    def test_layout(self):
+        layout = make_class("Image", [("data", "float *"), ("data", "const float *"), ("rows", "int"), ("cols", "int")]).buffer_layout()
+        assert (layout.type, layout.readonly, layout.shape, layout.row_stride) == ("float", False, ["rows", "cols"], None)
+        layout = make_class("Signal", [("data", "const short *"), ("size", "std::size_t")]).buffer_layout()
+        assert (layout.type, layout.readonly, layout.shape) == ("short", True, ["size"])
+        assert make_class("Names", [("data", "const char **"), ("size", "std::size_t")]).buffer_layout() is None
+        assert make_class("Data", [("data", "float *")]).buffer_layout() is None
+
+    def test_rule(self):
+        image = make_class("Image", [("data", "float *"), ("rows", "int"), ("cols", "int"), ("stride", "long")])
+        assert Rules().buffer_layout(image) is None
+        rules = Rules(buffer_protocol=ClassRule(names=["Image"]))
+        assert rules.buffer_layout(image).row_stride == "stride"
+        lines = image.to_code_block(GeneratorOption(type=GeneratorType.Pybind11, rules=rules)).to_code()
+        assert lines[0] == 'pybind11::class_<Image, std::shared_ptr<Image>>(scope, "Image", pybind11::buffer_protocol())'
+        assert lines[1] == "    .def_buffer([](Image & self) {"
+
+
+class TestOpaqueContainers:
+    def test_load(self, tmp_path):
+        path = tmp_path / "pypp.ini"
+        path.write_text("[opaque_containers]\ntypes = std::vector<double>, std::map<std::string, *>\n")
+        rules = load(str(path))
+        assert rules.opaque_containers_rule.types == ["std::vector<double>", "std::map<std::string, *>"]
+        containers = ["std::vector<int>", "std::vector<double>", "std::map<std::string, std::vector<int>>"]
+        assert rules.opaque_containers(containers) == containers[1:]
+
+    def test_module(self):
+        rules = Rules(opaque_containers=TypeRule(types=["std::vector<double>"]))
+        option = GeneratorOption(type=GeneratorType.Pybind11, rules=rules)
+        generator = Generator()
+        generator.functions["solve"] = make_function("solve", arg_types=["const std::vector<double> &"])
+        assert generator.stl_containers() == ["std::vector<double>"]
+        assert generator.has_decl_code(opt=option)
+        assert option.module.decl_code(generator)[-1] == "PYBIND11_MAKE_OPAQUE(std::vector<double>)"
+        lines = list(generator.iter_build(option))
+        # registered once when several headers share the container
+        assert lines[:5] == [
+            "    if (pybind11::detail::get_type_info(typeid(std::vector<double>))) {",
+            '        scope.attr("VectorDouble") = pybind11::type::of<std::vector<double>>();',
+            "    } else {",
+            '        pybind11::bind_vector<std::vector<double>>(scope, "VectorDouble");',
+            "    }",
+        ]
+
+
+class TestVectorize:
+    def test_scalar_function(self):
+        assert Function.is_scalar_function(make_function("f", ["double", "const float &"], result_type="double").functions[0])
+        assert not Function.is_scalar_function(make_function("f", ["double *"], result_type="double").functions[0])
+        assert not Function.is_scalar_function(make_function("f", ["int"], result_type="char").functions[0])
+        assert not Function.is_scalar_function(make_function("f", [], result_type="double").functions[0])
+
+    def test_builder(self):
+        rules = Rules(vectorize=ClassRule(namespaces=["lib"]))
+        option = GeneratorOption(type=GeneratorType.Pybind11, rules=rules)
+        func = make_function("hypot", ["double", "double"], result_type="double")
+        assert func.to_code_block(option) == [
+            'scope.def("hypot", &lib::hypot);',
+            'scope.def("hypot", pybind11::vectorize(&lib::hypot));',
+        ]
+        generator = Generator()
+        generator.functions["hypot"] = func
+        assert option.module.decl_code(generator) == ["#include <pybind11/numpy.h>"]
+        assert len(make_function("other", ["const std::vector<double> &"]).to_code_block(option)) == 1
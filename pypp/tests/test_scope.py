@@ -0,0 +1,45 @@
+import os
+
+from .. import scope
+from ..scope import ScopeFilter
+
+
+def make_files(tmp_path, *names):
+    for name in names:
+        path = tmp_path / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("")
+    return [str(tmp_path / x) for x in names]
+
+
+class TestScopeFilter:
+    def test_identity(self, tmp_path):
+        enum, scoped_enum = make_files(tmp_path, "enum.hpp", "scoped_enum.hpp")
+        filter_ = ScopeFilter(include_path=[str(tmp_path)])
+        assert filter_.match_source(scoped_enum, ["enum.hpp"]) is None
+        assert filter_.match_source(enum, ["enum.hpp"]) == "enum.hpp"
+        assert filter_.match_source(os.path.join(str(tmp_path), ".", "enum.hpp"), ["enum.hpp"]) == "enum.hpp"
+
+    def test_files(self, tmp_path):
+        a, b, c = make_files(tmp_path, "a.hpp", "lib/b.hpp", "lib/c.hpp")
+        filter_ = ScopeFilter(allow_files=[a], allow_dirs=[str(tmp_path / "lib")], deny_files=[c])
+        is_system = lambda: False
+        assert filter_.accepts_file(a, is_system)
+        assert filter_.accepts_file(b, is_system)
+        assert not filter_.accepts_file(c, is_system)
+
+    def test_system_headers(self, tmp_path):
+        a, = make_files(tmp_path, "a.hpp")
+        assert not ScopeFilter(allow_all=True).accepts_file(a, lambda: True)
+        assert ScopeFilter(allow_all=True, system_headers=True).accepts_file(a, lambda: True)
+        assert not ScopeFilter().accepts_file(a, lambda: False)
+
+    def test_namespaces(self):
+        filter_ = ScopeFilter(allow_namespaces=["ns::api"], deny_namespaces=["ns::api::detail"])
+        assert filter_.namespace_state(()) == scope.ANCESTOR
+        assert filter_.namespace_state(("ns",)) == scope.ANCESTOR
+        assert filter_.namespace_state(("ns", "api")) == scope.INSIDE
+        assert filter_.namespace_state(("ns", "api", "sub")) == scope.INSIDE
+        assert filter_.namespace_state(("ns", "api", "detail")) == scope.OUTSIDE
+        assert filter_.namespace_state(("other",)) == scope.OUTSIDE
+        assert ScopeFilter().namespace_state(()) == scope.INSIDE
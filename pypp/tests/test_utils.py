@@ -1,4 +1,5 @@
-from ..utils import name2snake
+from .. import decl
+from ..utils import name2snake, canonical_type, split_balanced, stl_containers, container_pyname, CodeBlock, CodeWriter, CodeLines
 
 
 class TestName2Snake:
@@ -15,3 +16,110 @@ class TestName2Snake:
 
     def test_lead_char(self):
         assert name2snake("./hoge/fuga") == "hoge_fuga"
+
+
+class TestCanonicalType:
+    def test_size_t(self):
+        canonical = decl.DeclType("unsigned long", decl.TypeKind.ULONG)
+        size_t = decl.DeclType("std::size_t", decl.TypeKind.TYPEDEF, canonical=canonical)
+        assert canonical_type(size_t) == "std::size_t"
+        # same canonical spelling, cached separately
+        assert canonical_type(canonical) == "unsigned long"
+
+    def test_vector(self):
+        type = decl.DeclType("std::vector<int, std::allocator<int> >", decl.TypeKind.RECORD)
+        assert canonical_type(type) == "std::vector<int>"
+        assert canonical_type(type) == "std::vector<int>"
+
+
+class TestCodeBlock:
+    def make_block(self):
+        return CodeBlock([
+            "a {",
+            CodeBlock(["b;", "", CodeBlock(["c;"])]),
+            "}",
+        ])
+
+    def test_to_code(self):
+        block = self.make_block()
+        assert block.to_code() == ["a {", "    b;", "", "        c;", "}"]
+        assert block.to_code(indent=1) == ["    a {", "        b;", "", "            c;", "    }"]
+
+    def test_writer(self):
+        writer = CodeWriter()
+        writer.write(self.make_block(), 1)
+        writer.write(["d;"])
+        assert writer.to_code() == self.make_block().to_code(indent=1) + ["d;"]
+
+    def test_writer_skips_none(self, capsys):
+        writer = CodeWriter()
+        writer.write(["a;", None, "b;"])
+        assert writer.to_code() == ["a;", "b;"]
+        # stdout may be the generated code
+        assert capsys.readouterr().out == ""
+
+    def test_wrap_inline_comment(self):
+        block = CodeBlock.wrap_inline_comment(self.make_block())
+        assert block.to_code() == ["//a {", "    //b;", "    //", "        //c;", "//}"]
+
+    def test_wrap_block_comment(self):
+        block = CodeBlock.wrap_block_comment(self.make_block())
+        assert isinstance(block, CodeBlock)
+        assert block.to_code() == ["/*", "a {", "    b;", "", "        c;", "}", "*/"]
+        assert CodeBlock.check_block_comment(CodeBlock(["x", block]))
+        assert not CodeBlock.check_block_comment(self.make_block())
+        # warns, but still wraps
+        assert CodeBlock.wrap_block_comment(block).to_code()[0] == "/*"
+
+
+class TestCodeLines:
+    def test_iterate_twice(self):
+        produced = []
+
+        def lines():
+            for x in ["a", "b"]:
+                produced.append(x)
+                yield x
+        code = CodeLines(lines())
+        # lazily
+        assert next(iter(code)) == "a"
+        assert produced == ["a"]
+        assert list(code) == ["a", "b"]
+        assert list(code) == ["a", "b"]
+        assert produced == ["a", "b"]
+
+    def test_str(self):
+        import jinja2
+        # a template written for the former string
+        template = jinja2.Template("{\n{{ generated }}\n}")
+        assert template.render(generated=CodeLines(iter(["  a();", "  b();"]))) == "{\n  a();\n  b();\n}"
+
+
+class TestSplitBalanced:
+    def test_even(self):
+        assert split_balanced([1] * 6, 3) == [(0, 2), (2, 4), (4, 6)]
+
+    def test_uneven(self):
+        assert split_balanced([10, 1, 1, 1, 1, 10], 2) == [(0, 3), (3, 6)]
+        assert split_balanced([1, 1, 8], 2) == [(0, 2), (2, 3)]
+
+    def test_more_ranges_than_items(self):
+        assert split_balanced([5, 5], 4) == [(0, 1), (1, 1), (1, 2), (2, 2)]
+        assert split_balanced([], 2) == [(0, 0), (0, 0)]
+
+
+class TestStlContainers:
+    def test_nested(self):
+        assert stl_containers("const std::map<std::string, std::vector<int>> &") == [
+            "std::vector<int>",
+            "std::map<std::string, std::vector<int>>",
+        ]
+        assert stl_containers("int") == []
+
+    def test_default_arguments(self):
+        spelling = "std::shared_ptr<std::__1::map<int, double, std::less<int>, std::allocator<std::pair<const int, double> > > >"
+        assert stl_containers(spelling) == ["std::map<int, double>"]
+
+    def test_pyname(self):
+        assert container_pyname("std::map<std::string, std::vector<int>>") == "MapStringVectorInt"
+        assert container_pyname("std::vector<unsigned long>") == "VectorUnsignedLong"
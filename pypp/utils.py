@@ -1,6 +1,8 @@
+import functools
+import logging
 import re
 
-import clang.cindex
+from . import decl
 
 from .constants import (
     UNARY_OPERATOR_MAP,
@@ -9,6 +11,9 @@ from .constants import (
     PYTHON_RESERVED,
 )
 
+log = logging.getLogger(__name__)
+
+
 def name2snake(name):
     ret = re.sub(r"\W+", "_", name)
     if ret and ret.startswith("_"):
@@ -51,27 +56,23 @@ def check_reserved(word):
 
 def is_copy_method(func):
     args = list(func.get_arguments())
-    return len(args) == 1 and args[0].type.kind == clang.cindex.TypeKind.LVALUEREFERENCE
+    return len(args) == 1 and args[0].type.kind == decl.TypeKind.LVALUEREFERENCE
 
 
 class CodeBlock(list):
+    """
+    lines (str) and nested blocks, which are indented one more level
+
+    blocks are emitted by a CodeWriter
+    """
 
     indent_base = " " * 4
 
+    def __add__(self, other):
+        return CodeBlock(list.__add__(self, other))
+
     def to_code(self, indent=0):
-        tmp = []
-        for x in self:
-            if x is None:
-                print("debug: skip block")
-            elif isinstance(x, CodeBlock):
-                tmp.extend(x.to_code(indent+1))
-            else:
-                if x:
-                    tmp.append(self.indent_base*indent + x)
-                # empty case
-                else:
-                    tmp.append(x)
-        return tmp
+        return CodeWriter(self.indent_base).write(self, indent).to_code()
 
     @classmethod
     def wrap_inline_comment(cls, block):
@@ -92,7 +93,7 @@ class CodeBlock(list):
     @classmethod
     def check_block_comment(cls, block):
         for line in block:
-            if isinstnce(line, str):
+            if isinstance(line, str):
                 if line == "*/":
                     return True
             else:
@@ -101,6 +102,98 @@ class CodeBlock(list):
         return False
 
 
+class CodeWriter(object):
+    """
+    append-only buffer of (indent, line) entries
+
+    nested blocks are flattened in one pass with an explicit stack, and the
+    written blocks are neither copied nor concatenated
+    """
+
+    def __init__(self, indent_base=CodeBlock.indent_base):
+        self.indent_base = indent_base
+        self.entries = []
+
+    def write(self, block, indent=0):
+        entries = self.entries
+        stack = [(iter(block), indent)]
+        while stack:
+            lines, level = stack[-1]
+            for x in lines:
+                if x is None:
+                    log.debug("skip block")
+                elif isinstance(x, CodeBlock):
+                    stack.append((iter(x), level + 1))
+                    break
+                else:
+                    entries.append((level, x))
+            else:
+                stack.pop()
+        return self
+
+    def lines(self):
+        prefixes = {}
+        for level, line in self.entries:
+            # empty lines aren't indented
+            if not line:
+                yield line
+                continue
+            if level not in prefixes:
+                prefixes[level] = self.indent_base * level
+            yield prefixes[level] + line
+
+    def to_code(self):
+        return list(self.lines())
+
+
+class CodeLines(object):
+    """
+    the lines of an iterable, produced on the first iteration and kept for the next ones
+
+    str() joins them into one string, like the `generated` of older templates
+    """
+
+    def __init__(self, lines):
+        self.iterator = iter(lines)
+        self.lines = []
+
+    def __iter__(self):
+        index = 0
+        while True:
+            if index < len(self.lines):
+                yield self.lines[index]
+                index += 1
+                continue
+            if self.iterator is None:
+                return
+            try:
+                line = next(self.iterator)
+            except StopIteration:
+                self.iterator = None
+                return
+            self.lines.append(line)
+
+    def __str__(self):
+        return "\n".join(self)
+
+
+def split_balanced(weights, count):
+    """[(start, stop)] of `count` contiguous ranges of `weights` with about the same sums; ranges may be empty"""
+    total = float(sum(weights))
+    bounds = [0]
+    index = 0
+    acc = 0.0
+    for k in range(1, count):
+        target = total * k / count
+        # an item goes into the range which contains its middle
+        while index < len(weights) and acc + weights[index] / 2.0 <= target:
+            acc += weights[index]
+            index += 1
+        bounds.append(index)
+    bounds.append(len(weights))
+    return [(bounds[k], bounds[k + 1]) for k in range(count)]
+
+
 RE_VECTOR = re.compile(r"^(const\s+)?std::vector\<(?P<T>.+?), std::allocator\<(?P=T)\s*\>\s*\>(\s*&)?")
 RE_STD_BASIC = re.compile(r"std(?:::__cxx11)?::basic_(\w+)\<(char|wchar_t)\>")
 def std_basic_repl(m):
@@ -109,6 +202,11 @@ def std_basic_repl(m):
 
 STD_SIZE_T = "unsigned long"  # libclang 32bit
 
+# distinct spellings memoized by type_simplify and canonical_type; bounded for long-lived processes (the daemon)
+CACHE_SIZE = 4096
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
 def type_simplify(type_str):
     type_str = RE_STD_BASIC.sub(std_basic_repl, type_str)
     if "std::vector" in type_str:
@@ -120,9 +218,94 @@ def type_simplify(type_str):
             return const + "std::vector<{}>".format(m.group(2)) + ref
     return type_str
 
+# containers of pybind11/stl_bind.h -> number of template arguments which aren't defaults (allocators, ...)
+STL_CONTAINERS = {
+    "std::vector": 1,
+    "std::map": 2,
+    "std::unordered_map": 2,
+}
+RE_TEMPLATE_NAME = re.compile(r"(?P<name>[A-Za-z_][\w:]*)\s*<")
+RE_STD_INLINE = re.compile(r"^std::__\w+::")
+
+
+def split_template_args(text):
+    """"K, std::vector<V>" -> ["K", "std::vector<V>"]"""
+    result = []
+    depth = 0
+    start = 0
+    for i, c in enumerate(text):
+        if c in "<(":
+            depth += 1
+        elif c in ">)":
+            depth -= 1
+        elif c == "," and depth == 0:
+            result.append(text[start:i].strip())
+            start = i + 1
+    result.append(text[start:].strip())
+    return result
+
+
+def closing_bracket(text, start):
+    """the index of the ">" which closes the "<" at `start`"""
+    depth = 0
+    for i in range(start, len(text)):
+        if text[i] == "<":
+            depth += 1
+        elif text[i] == ">":
+            depth -= 1
+            if depth == 0:
+                return i
+    return len(text)
+
+
+def stl_containers(spelling, result=None):
+    """
+    the containers of STL_CONTAINERS in a canonical_type spelling, the inner ones first
+
+    e.g. "const std::map<std::string, std::vector<int>> &" -> ["std::vector<int>", "std::map<std::string, std::vector<int>>"]
+    """
+    if result is None:
+        result = []
+    _stl_containers(spelling, result)
+    return result
+
+
+def _stl_containers(text, result):
+    # `text` without the default arguments of the containers
+    output = []
+    pos = 0
+    while True:
+        m = RE_TEMPLATE_NAME.search(text, pos)
+        if m is None:
+            output.append(text[pos:])
+            break
+        end = closing_bracket(text, m.end() - 1)
+        args = [_stl_containers(x, result) for x in split_template_args(text[m.end():end])]
+        name = RE_STD_INLINE.sub("std::", m.group("name"))
+        if name in STL_CONTAINERS:
+            args = args[:STL_CONTAINERS[name]]
+        spelled = "{}<{}>".format(name, ", ".join(args))
+        if name in STL_CONTAINERS and spelled not in result:
+            result.append(spelled)
+        output.append(text[pos:m.start()] + spelled)
+        pos = end + 1
+    return "".join(output)
+
+
+def container_pyname(spelling):
+    """e.g. std::map<std::string, std::vector<int>> -> MapStringVectorInt"""
+    words = re.findall(r"[A-Za-z0-9]+", spelling.replace("std::", ""))
+    return "".join(x[:1].upper() + x[1:] for x in words)
+
+
 def canonical_type(type):
-    spelling = type.spelling
-    simple = type_simplify(type.get_canonical().spelling)
+    return _canonical_type(type.spelling, type.get_canonical().spelling)
+
+
+@functools.lru_cache(maxsize=CACHE_SIZE)
+def _canonical_type(spelling, canonical):
+    # the result only depends on the two spellings
+    simple = type_simplify(canonical)
     if "std::size_t" in spelling:
         simple = simple.replace(STD_SIZE_T, "std::size_t")
     return simple
@@ -1,10 +1,15 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import re
+
 from setuptools import setup, find_packages
 
+with open("pypp/__init__.py") as fp:
+    version = re.search(r'__version__ = "(.+)"', fp.read()).group(1)
+
 setup(name="pypp",
-    version="1.0.0",
+    version=version,
     description="libclang boost.python generator",
     url="https://github.com/mugwort-rc/pypp",
     license="GPL3",
@@ -22,6 +27,6 @@ setup(name="pypp",
     packages=find_packages(),
     include_package_data=True,
     package_data={
-        "pypp": ["templates/*"],
+        "pypp": ["templates/*", "benchmark/baseline.json"],
     },
 )